@@ -0,0 +1,263 @@
+"""
+Microbenchmark harness for the per-request CPU paths.
+
+The `bench` fixture times a callable (best of several rounds, each long
+enough to swamp timer noise) and measures its peak traced memory per call
+with tracemalloc, then compares both against `thresholds.json`. A benchmark
+fails when either grows by more than the tolerance (BENCH_TOLERANCE percent,
+default 25, or --bench-tolerance). Allocations are deterministic and fail
+on the first measurement. A time over the limit is re-measured
+BENCH_REMEASURES times and judged on the median; wall-clock timings still
+depend on what else the machine is doing, so a time regression only fails
+the run with BENCH_STRICT=1 (CI on a quiet runner) and is otherwise
+reported as a warning.
+
+Times are compared relative to a fixed pure-Python calibration workload
+re-timed alongside each re-measurement, so a slower or busier machine does
+not read as a regression.
+
+    pytest benchmarks                       # gate against stored thresholds
+    pytest benchmarks --update-thresholds   # record new and changed benchmarks
+
+A gating run never writes thresholds.json and fails on a benchmark that
+has no threshold yet. Record after adding a benchmark or an intentional
+change to a benchmarked path.
+"""
+
+import gc
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import warnings
+from typing import Any, Callable, Dict, Optional
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+THRESHOLDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+
+BENCH_ROUNDS = int(os.getenv("BENCH_ROUNDS", "7"))
+BENCH_MIN_ROUND_SECONDS = float(os.getenv("BENCH_MIN_ROUND_SECONDS", "0.02"))
+# Re-measurements of a benchmark over its time limit, judged by their median
+BENCH_REMEASURES = int(os.getenv("BENCH_REMEASURES", "5"))
+# Fail on time regressions (allocation regressions always fail)
+BENCH_STRICT = os.getenv("BENCH_STRICT", "false").lower() in ("1", "true", "yes")
+
+# Absolute growth that never fails, so sub-microsecond and tiny-allocation
+# benchmarks are not gated on timer and interpreter noise
+TIME_US_SLACK = 1.0
+PEAK_KB_SLACK = 2.0
+
+CALIBRATION_KEY = "_calibration"
+
+sys.path.insert(0, os.path.join(BACKEND_DIR, "orchestrator"))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "mcp_servers"))
+
+
+class BenchmarkRegressionWarning(UserWarning):
+    """A benchmark slower than its threshold outside BENCH_STRICT runs."""
+
+
+def load_mcp_server(name: str) -> Any:
+    """Import mcp_servers/<name>/server.py under a unique module name."""
+    directory = os.path.join(BACKEND_DIR, "mcp_servers", name)
+    # Sibling modules resolve as they do when the server runs as a script
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    path = os.path.join(directory, "server.py")
+    spec = importlib.util.spec_from_file_location(f"{name}_server", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks")
+    group.addoption("--update-thresholds", action="store_true",
+                    help="Record measured values as the new thresholds")
+    group.addoption("--bench-tolerance", type=float, default=float(os.getenv("BENCH_TOLERANCE", "25")),
+                    help="Allowed regression in percent before a benchmark fails")
+
+
+def calibration_workload() -> int:
+    """Dict, string and list churn resembling the benchmarked paths."""
+    data = {f"key_{i}": [i, str(i), {"value": i * 2}] for i in range(200)}
+    return len(",".join(f"{key}={value[1]}" for key, value in sorted(data.items())))
+
+
+def measure(fn: Callable[[], Any]) -> Dict[str, float]:
+    """Best per-call time (microseconds) and peak traced memory per call (KB)."""
+    fn()
+
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - started >= BENCH_MIN_ROUND_SECONDS or loops >= 1 << 20:
+            break
+        loops *= 2
+
+    best = float("inf")
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(BENCH_ROUNDS):
+            started = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            best = min(best, (time.perf_counter() - started) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"time_us": round(best * 1e6, 2), "peak_kb": round((peak - baseline) / 1024, 2)}
+
+
+class BenchmarkSession:
+    """
+    Stored thresholds plus everything measured in this pytest session.
+    """
+
+    def __init__(self, update: bool, tolerance: float):
+        self.update = update
+        self.tolerance = tolerance
+        self.measured: Dict[str, Dict[str, float]] = {}
+        try:
+            with open(THRESHOLDS_PATH, "r", encoding="utf-8") as f:
+                self.thresholds: Dict[str, Dict[str, float]] = json.load(f)
+        except (OSError, ValueError):
+            self.thresholds = {}
+        self.calibration_us = measure(calibration_workload)["time_us"]
+        stored = self.thresholds.get(CALIBRATION_KEY)
+        # >1 when this run is slower than the one that recorded the thresholds
+        self.speed_factor = self.calibration_us / stored["time_us"] if stored else 1.0
+
+    def recalibrate(self) -> None:
+        stored = self.thresholds.get(CALIBRATION_KEY)
+        if stored:
+            current = measure(calibration_workload)["time_us"]
+            self.speed_factor = current / stored["time_us"]
+
+    def time_regression(self, stored: Dict[str, float], time_us: float) -> Optional[str]:
+        limit = 1 + self.tolerance / 100
+        allowed_us = stored["time_us"] * self.speed_factor
+        if time_us > max(allowed_us * limit, allowed_us + TIME_US_SLACK):
+            return f"time {allowed_us:.2f}us (calibrated) -> {time_us}us"
+        return None
+
+    def memory_regression(self, stored: Dict[str, float], peak_kb: float) -> Optional[str]:
+        limit = 1 + self.tolerance / 100
+        if peak_kb > max(stored["peak_kb"] * limit, stored["peak_kb"] + PEAK_KB_SLACK):
+            return f"peak memory {stored['peak_kb']}KB -> {peak_kb}KB"
+        return None
+
+    def check(self, name: str, fn: Callable[[], Any]) -> Dict[str, float]:
+        stored = self.thresholds.get(name)
+        if stored is None and not self.update:
+            pytest.fail(f"{name} has no threshold in thresholds.json; record it with --update-thresholds")
+        result = measure(fn)
+        self.measured[name] = result
+        if self.update:
+            return result
+
+        failure = self.memory_regression(stored, result["peak_kb"])
+        if failure:
+            pytest.fail(f"{name} regressed more than {self.tolerance}%: {failure}")
+
+        if self.time_regression(stored, result["time_us"]):
+            # A noisy measurement is not a regression; the median of several,
+            # each against freshly measured machine speed, is
+            normalized = []
+            for _ in range(BENCH_REMEASURES):
+                self.recalibrate()
+                normalized.append(measure(fn)["time_us"] / self.speed_factor)
+            result = {**result, "time_us": round(statistics.median(normalized) * self.speed_factor, 2)}
+            self.measured[name] = result
+            failure = self.time_regression(stored, result["time_us"])
+            if failure:
+                message = (f"{name} regressed more than {self.tolerance}% "
+                           f"(median of {BENCH_REMEASURES} re-measurements): {failure}")
+                if BENCH_STRICT:
+                    pytest.fail(message)
+                warnings.warn(message, BenchmarkRegressionWarning)
+        return result
+
+    def save(self) -> None:
+        stored = self.thresholds.get(CALIBRATION_KEY)
+        merged = dict(self.thresholds)
+        if stored is None:
+            merged.update(self.measured)
+            merged[CALIBRATION_KEY] = {"time_us": self.calibration_us, "peak_kb": 0.0}
+        else:
+            # Record at the speed of the stored calibration, so entries not
+            # re-measured in this run stay comparable
+            for name, result in self.measured.items():
+                merged[name] = {**result, "time_us": round(result["time_us"] / self.speed_factor, 2)}
+        with open(THRESHOLDS_PATH, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(merged.items())), f, indent=2)
+            f.write("\n")
+
+
+@pytest.fixture(scope="session")
+def bench_session(request) -> BenchmarkSession:
+    session = BenchmarkSession(
+        request.config.getoption("--update-thresholds"),
+        request.config.getoption("--bench-tolerance")
+    )
+    request.config._bench_session = session
+    return session
+
+
+@pytest.fixture
+def bench(bench_session) -> Callable[..., Dict[str, float]]:
+    """bench(name, fn, *args, **kwargs) -> {"time_us", "peak_kb"}"""
+    def run(name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Dict[str, float]:
+        return bench_session.check(name, lambda: fn(*args, **kwargs))
+    return run
+
+
+@pytest.fixture(scope="session")
+def mcp_payloads() -> Dict[str, Dict[str, dict]]:
+    """Real MCP payloads per emergency type, as the orchestrator receives them."""
+    handlers = {
+        "weather": load_mcp_server("weather").get_weather,
+        "maps": load_mcp_server("maps").get_location_info,
+        "news": load_mcp_server("news").get_news,
+        "social": load_mcp_server("social").get_social_data,
+        "resource": load_mcp_server("resource").get_resources
+    }
+    return {
+        emergency_type: {
+            name: handler(location="Santa Clara University Library", emergency_type=emergency_type)
+            for name, handler in handlers.items()
+        }
+        for emergency_type in ("fire", "hurricane", "flood", "none")
+    }
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    session = getattr(config, "_bench_session", None)
+    if session is None or not session.measured:
+        return
+    terminalreporter.section("microbenchmarks")
+    terminalreporter.write_line(f"calibration {session.calibration_us}us (speed factor {session.speed_factor:.2f})")
+    for name, result in sorted(session.measured.items()):
+        stored = session.thresholds.get(name)
+        reference = f"(threshold {stored['time_us']}us, {stored['peak_kb']}KB)" if stored else "(new)"
+        terminalreporter.write_line(f"{name:<45} {result['time_us']:>10}us {result['peak_kb']:>9}KB  {reference}")
+    if session.update:
+        session.save()
+        terminalreporter.write_line(f"Thresholds written to {THRESHOLDS_PATH}")
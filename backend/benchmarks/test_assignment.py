@@ -0,0 +1,47 @@
+"""
+Evacuee-to-shelter assignment with tight capacity.
+"""
+
+import random
+import pytest
+from conftest import load_mcp_server
+
+EVACUEES = 2000
+SHELTERS = 20
+# Total capacity over total demand
+SLACK = 1.05
+
+
+@pytest.fixture(scope="module")
+def resource():
+    return load_mcp_server("resource")
+
+
+@pytest.fixture(scope="module")
+def problem(resource):
+    from assignment import cost_rows
+    rng = random.Random(11)
+    origins = [(37.30 + rng.random() * 0.1, -121.98 + rng.random() * 0.1) for _ in range(EVACUEES)]
+    shelters = [(37.30 + rng.random() * 0.1, -121.98 + rng.random() * 0.1) for _ in range(SHELTERS)]
+    capacity = [0] * SHELTERS
+    for _ in range(int(EVACUEES * SLACK)):
+        capacity[rng.randrange(SHELTERS)] += 1
+    rows = cost_rows(origins, shelters, [range(SHELTERS)] * EVACUEES)
+    return rows, [1] * EVACUEES, capacity
+
+
+def test_assignment_solve(bench, problem):
+    from assignment import solve
+    bench(f"assignment_solve[{EVACUEES}x{SHELTERS}]", solve, *problem)
+
+
+def test_assign_evacuees(bench, resource):
+    # Request handling around the solver: grouping, candidates, cost rows, response
+    rng = random.Random(12)
+    request = resource.AssignmentRequest(
+        emergency_type="fire",
+        evacuees=[{"lat": 37.345 + rng.random() * 0.01, "lng": -121.944 + rng.random() * 0.01,
+                   "count": rng.randint(1, 3)} for _ in range(200)],
+        commit=False
+    )
+    bench("assign_evacuees[200]", resource.assign_evacuees, request)
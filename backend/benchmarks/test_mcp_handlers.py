@@ -0,0 +1,45 @@
+"""
+MCP handlers: each builds its full response dict on every request.
+"""
+
+import pytest
+from conftest import load_mcp_server
+
+HANDLERS = {
+    "weather": "get_weather",
+    "maps": "get_location_info",
+    "news": "get_news",
+    "social": "get_social_data",
+    "resource": "get_resources"
+}
+LOCATION = "Santa Clara University Library"
+
+
+@pytest.fixture(scope="module")
+def servers():
+    return {name: load_mcp_server(name) for name in HANDLERS}
+
+
+@pytest.mark.parametrize("emergency_type", ["fire", "none"])
+@pytest.mark.parametrize("service", list(HANDLERS))
+def test_mcp_handler(bench, servers, service, emergency_type):
+    handler = getattr(servers[service], HANDLERS[service])
+    bench(f"{HANDLERS[service]}[{emergency_type}]", handler,
+          location=LOCATION, emergency_type=emergency_type)
+
+
+def test_maps_route(bench, servers):
+    # Uncached A* from the library to the athletic field around the fire buffer
+    maps = servers["maps"]
+    graph = maps.road_graph
+    source = graph.nearest_node(37.3496, -121.9390)
+    target = graph.nearest_node(37.3535, -121.9345)
+    hazards = [maps.Hazard(37.3490, -121.9395, maps.MAPS_FIRE_BUFFER_METERS, "fire")]
+    bench("maps_route[fire]", graph.shortest_path, source, target, hazards, ("El Camino Real",))
+
+
+@pytest.mark.parametrize("query", ["SCU library", "santa clra univrsity libary"])
+def test_maps_geocode(bench, servers, query):
+    # Uncached gazetteer search: exact words, then misspellings scored by edit distance
+    gazetteer = servers["maps"].gazetteer
+    bench(f"maps_geocode[{query}]", gazetteer.search, query, 5)
@@ -0,0 +1,46 @@
+"""
+LLM output parsing, procedure lookup and procedure retrieval.
+"""
+
+import json
+import pytest
+from knowledge import get_procedures, retrieve_guidance
+from main import parse_llm_response
+
+PLAN = {
+    "is_emergency": True,
+    "severity": "high",
+    "confidence": 0.92,
+    "summary": "Structure fire in the library west wing with confirmed smoke spread.",
+    "evacuation_routes": [
+        {"name": f"Route {i}", "direction": "north", "distance_miles": 0.4 * i,
+         "instructions": "Exit via the main stairwell and proceed to the assembly point."}
+        for i in range(1, 5)
+    ],
+    "shelters": [{"name": f"Shelter {i}", "capacity": 200 + i} for i in range(6)],
+    "immediate_actions": ["Evacuate", "Avoid elevators", "Stay low under smoke"] * 3
+}
+PLAN_JSON = json.dumps(PLAN, indent=2)
+
+RESPONSES = {
+    "plain": PLAN_JSON,
+    "fenced": f"Here is the plan:\n```json\n{PLAN_JSON}\n```\nStay safe.",
+    "truncated": PLAN_JSON[:int(len(PLAN_JSON) * 0.8)]
+}
+
+
+@pytest.mark.parametrize("shape", list(RESPONSES))
+def test_parse_llm_response(bench, shape):
+    bench(f"parse_llm_response[{shape}]", parse_llm_response, RESPONSES[shape])
+
+
+@pytest.mark.parametrize("emergency_type", ["fire", "hurricane", "flood", "none"])
+def test_get_procedures(bench, emergency_type):
+    bench(f"get_procedures[{emergency_type}]", get_procedures, emergency_type)
+
+
+@pytest.mark.parametrize("emergency_type", ["fire", "flood", "none"])
+def test_retrieve_guidance(bench, mcp_payloads, emergency_type):
+    scenario = "Smoke in the stairwell and water on the floor, phones are down"
+    bench(f"retrieve_guidance[{emergency_type}]", retrieve_guidance,
+          scenario, mcp_payloads[emergency_type], emergency_type)
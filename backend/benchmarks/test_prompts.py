@@ -0,0 +1,40 @@
+"""
+Prompt builders: run once per request (Stage 1) and again for Stage 2.
+"""
+
+import pytest
+from prompts import build_decision_prompt, build_emergency_prompt, build_false_alarm_prompt
+
+SCENARIO = "Smoke visible from the third floor, people are evacuating the west wing"
+LOCATION = "Santa Clara University Library"
+
+
+def prompt_args(payloads: dict) -> dict:
+    return {
+        "weather_data": payloads["weather"],
+        "maps_data": payloads["maps"],
+        "news_data": payloads["news"],
+        "social_data": payloads["social"],
+        "resource_data": payloads["resource"]
+    }
+
+
+@pytest.mark.parametrize("emergency_type", ["fire", "flood", "none"])
+def test_build_decision_prompt(bench, mcp_payloads, emergency_type):
+    args = prompt_args(mcp_payloads[emergency_type])
+    bench(f"build_decision_prompt[{emergency_type}]", build_decision_prompt,
+          SCENARIO, LOCATION, emergency_type=emergency_type, **args)
+
+
+@pytest.mark.parametrize("emergency_type", ["fire", "hurricane", "flood"])
+def test_build_emergency_prompt(bench, mcp_payloads, emergency_type):
+    args = prompt_args(mcp_payloads[emergency_type])
+    bench(f"build_emergency_prompt[{emergency_type}]", build_emergency_prompt,
+          SCENARIO, LOCATION, emergency_type, **args)
+
+
+@pytest.mark.parametrize("emergency_type", ["fire", "none"])
+def test_build_false_alarm_prompt(bench, mcp_payloads, emergency_type):
+    args = prompt_args(mcp_payloads[emergency_type])
+    bench(f"build_false_alarm_prompt[{emergency_type}]", build_false_alarm_prompt,
+          SCENARIO, LOCATION, emergency_type=emergency_type, **args)
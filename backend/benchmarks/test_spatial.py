@@ -0,0 +1,32 @@
+"""
+Spatial index queries over a city-sized set of places.
+"""
+
+import random
+import pytest
+from common.spatial import SpatialIndex
+
+PLACE_COUNT = 10_000
+QUERY = (37.3496, -121.9390)
+
+
+@pytest.fixture(scope="module")
+def index():
+    rng = random.Random(7)
+    return SpatialIndex({
+        "name": f"Place {i}",
+        "type": rng.choice(["shelter", "hospital", "fire_station"]),
+        "coordinates": {"lat": 37.2 + rng.random() * 0.4, "lng": -122.1 + rng.random() * 0.4},
+        "capacity": rng.randint(50, 900),
+        "current_occupancy": rng.randint(0, 900),
+        "status": rng.choice(["Open", "Closed", "Full"])
+    } for i in range(PLACE_COUNT))
+
+
+@pytest.mark.parametrize("k", [1, 5])
+def test_spatial_nearest(bench, index, k):
+    bench(f"spatial_nearest[k={k}]", index.nearest, *QUERY, k=k, status="open", min_capacity=1)
+
+
+def test_spatial_within(bench, index):
+    bench("spatial_within[2km]", index.within, *QUERY, 2000, status="open", min_capacity=1)
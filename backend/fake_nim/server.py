@@ -0,0 +1,408 @@
+"""
+Local stand-in for the NVIDIA NIM chat-completions API.
+
+Serves an OpenAI/NIM-compatible POST /v1/chat/completions (plain and
+`stream: true`) that answers the orchestrator's prompts with schema-valid
+JSON derived from the prompt itself: triage decisions from the intelligence
+in the stage-1 prompt, 5-step evacuation plans from the coordinates and
+waypoints in the emergency prompt, and assessments for false alarms.
+
+Latency is simulated as time-to-first-token plus tokens at a fixed rate, and
+errors (500) and rate limits (429 with Retry-After) are injected at
+configurable rates, so every orchestrator performance feature can be
+exercised offline. Point the orchestrator's NVIDIA_API_URL at
+http://localhost:9000/v1/chat/completions.
+"""
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Dict, Any, List, Optional, Tuple
+import ast
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+import uvicorn
+
+app = FastAPI(title="Fake NIM Server", version="1.0.0")
+
+PORT = int(os.getenv("FAKE_NIM_PORT", "9000"))
+
+# Seconds before the first token, and generation speed afterwards
+FAKE_NIM_TTFT = float(os.getenv("FAKE_NIM_TTFT", "0.3"))
+FAKE_NIM_TOKENS_PER_SEC = float(os.getenv("FAKE_NIM_TOKENS_PER_SEC", "200"))
+
+# Per-model overrides, matched by substring of the model name, e.g.
+# {"340b": {"ttft": 1.5, "tokens_per_sec": 40}, "mini": {"ttft": 0.1}}
+FAKE_NIM_MODEL_PROFILES: Dict[str, Dict[str, float]] = json.loads(os.getenv("FAKE_NIM_MODEL_PROFILES", "{}"))
+
+# Fraction of requests answered with a 500 / a 429
+FAKE_NIM_ERROR_RATE = float(os.getenv("FAKE_NIM_ERROR_RATE", "0.0"))
+FAKE_NIM_RATE_LIMIT_RATE = float(os.getenv("FAKE_NIM_RATE_LIMIT_RATE", "0.0"))
+
+# Requests beyond this many in flight get a 429 (0 = unlimited)
+FAKE_NIM_MAX_CONCURRENCY = int(os.getenv("FAKE_NIM_MAX_CONCURRENCY", "0"))
+FAKE_NIM_RETRY_AFTER = int(os.getenv("FAKE_NIM_RETRY_AFTER", "1"))
+
+# Fixed seed for reproducible error injection (unset = random)
+FAKE_NIM_SEED = os.getenv("FAKE_NIM_SEED")
+
+rng = random.Random(int(FAKE_NIM_SEED)) if FAKE_NIM_SEED else random.Random()
+
+# Roughly one token per 4 characters of output, as streamed
+CHARS_PER_TOKEN = 4
+
+EMERGENCY_TYPES = ("fire", "hurricane", "flood")
+
+EMERGENCY_MARKERS = (
+    '"red_flag_warning":true', "red_flag_warning=true", '"breaking_news":true', "breaking_news=true",
+    "evacuation order", "evacuation warning", "actively responding", "active operations",
+    "full activation", "hurricane warning", "flood warning", "fire weather watch"
+)
+FALSE_ALARM_MARKERS = (
+    '"breaking_news":false', "breaking_news=false", "drill", "alarm test", "no emergency",
+    "routine", '"reporting_emergency":0', "reporting_emergency=0"
+)
+
+DEFAULT_COORDINATES = {"lat": 37.3496, "lng": -121.9390}
+
+CONTACTS = {
+    "fire": {"service": "Fire Department", "number": "911"},
+    "hurricane": {"service": "Emergency Management", "number": "911"},
+    "flood": {"service": "Flood Control / Emergency Services", "number": "911"}
+}
+
+
+class ServerStats:
+    """
+    Request, error and token counters for GET /stats.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = 0
+        self.streamed = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.completion_tokens = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "streamed": self.streamed,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "completion_tokens": self.completion_tokens
+        }
+
+
+stats = ServerStats()
+
+
+def model_profile(model: str) -> Tuple[float, float]:
+    """(time to first token, tokens per second) for a model."""
+    ttft, tokens_per_sec = FAKE_NIM_TTFT, FAKE_NIM_TOKENS_PER_SEC
+    for marker, profile in FAKE_NIM_MODEL_PROFILES.items():
+        if marker in model:
+            ttft = float(profile.get("ttft", ttft))
+            tokens_per_sec = float(profile.get("tokens_per_sec", tokens_per_sec))
+    return ttft, max(tokens_per_sec, 1e-3)
+
+
+def prompt_field(prompt: str, label: str) -> str:
+    """Value of a `Label: value` line in the prompt."""
+    match = re.search(rf"^{re.escape(label)}:\s*(.*)$", prompt, re.MULTILINE)
+    return match.group(1).strip() if match else ""
+
+
+def literal(text: str, default: Any) -> Any:
+    """Python literal (dict/list repr) embedded in a prompt line."""
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return default
+
+
+def detect_emergency_type(prompt: str) -> str:
+    declared = prompt_field(prompt, "Emergency Type").lower()
+    if declared in EMERGENCY_TYPES:
+        return declared
+    text = prompt.lower()
+    counts = {kind: text.count(kind) for kind in EMERGENCY_TYPES}
+    kind, count = max(counts.items(), key=lambda item: item[1])
+    return kind if count else "none"
+
+
+def haversine_m(a: Dict[str, float], b: Dict[str, float]) -> float:
+    lat1, lng1, lat2, lng2 = map(math.radians, (a["lat"], a["lng"], b["lat"], b["lng"]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371000 * math.asin(math.sqrt(h))
+
+
+def triage_response(prompt: str) -> Dict[str, Any]:
+    """Stage-1 decision from the evidence markers present in the prompt."""
+    text = prompt.lower().replace(" ", "").replace("\n", "") + " " + prompt.lower()
+    emergency_hits = [marker for marker in EMERGENCY_MARKERS if marker in text]
+    false_hits = [marker for marker in FALSE_ALARM_MARKERS if marker in text]
+    emergency_type = detect_emergency_type(prompt)
+    is_emergency = len(emergency_hits) > len(false_hits) and emergency_type != "none"
+    evidence = emergency_hits if is_emergency else false_hits
+    margin = abs(len(emergency_hits) - len(false_hits))
+    return {
+        "is_emergency": is_emergency,
+        "emergency_type": emergency_type if is_emergency else "none",
+        "confidence": round(min(0.95, 0.6 + 0.08 * margin), 2),
+        "reasoning": f"Signals: {', '.join(evidence[:4]) or 'no corroborating reports'}"
+    }
+
+
+def evacuation_plan(prompt: str) -> Dict[str, Any]:
+    """Five steps from current location through the route waypoints to the shelter."""
+    emergency_type = detect_emergency_type(prompt)
+    start = literal(prompt_field(prompt, "- Current Location"), {}) or DEFAULT_COORDINATES
+    shelter = literal(prompt_field(prompt, "- Safe Shelter"), {}) or {
+        "lat": start["lat"] + 0.004, "lng": start["lng"] + 0.0045
+    }
+    waypoints = [
+        {"lat": point["lat"], "lng": point["lng"], "name": point.get("name", "")}
+        for point in literal(prompt_field(prompt, "- Waypoints"), [])
+        if isinstance(point, dict) and "lat" in point and "lng" in point
+    ]
+
+    # Three intermediate points: the inner waypoints if there are enough, else interpolated
+    inner = waypoints[1:-1] if len(waypoints) >= 5 else []
+    if len(inner) >= 3:
+        picks = [inner[0], inner[len(inner) // 2], inner[-1]]
+    else:
+        picks = [
+            {
+                "lat": start["lat"] + (shelter["lat"] - start["lat"]) * fraction,
+                "lng": start["lng"] + (shelter["lng"] - start["lng"]) * fraction,
+                "name": ""
+            }
+            for fraction in (0.25, 0.5, 0.75)
+        ]
+
+    points = [{**start, "name": "Current location"}] + picks + [{**shelter, "name": "Safe shelter"}]
+    hazard = f"{emergency_type} hazard zone" if emergency_type != "none" else "hazard area"
+    titles = ["Leave the Building Immediately", "Move to the Evacuation Route",
+              "Continue Along the Route", "Approach the Safe Zone", "Check In at the Shelter"]
+
+    steps = []
+    total = 0.0
+    for index, point in enumerate(points):
+        distance = haversine_m(points[index - 1], point) if index else 0.0
+        total += distance
+        minutes = distance / 80.0
+        steps.append({
+            "step": index + 1,
+            "title": titles[index],
+            "description": f"Proceed to {point['name'] or 'the next waypoint'} and keep away from the {hazard}.",
+            "situation": f"Active {emergency_type} reported nearby" if index == 0 else "Route reported clear",
+            "action": "Exit using the nearest safe exit" if index == 0 else f"Walk to {point['name'] or 'the waypoint'}",
+            "coordinates": {"lat": round(point["lat"], 6), "lng": round(point["lng"], 6)},
+            "distance": f"{int(distance)} meters",
+            "time": "< 1 min" if minutes < 1 else f"{math.ceil(minutes)} min",
+            "warning": f"Stay clear of the {hazard} and follow responder instructions"
+        })
+
+    # Blocked roads as rendered in either prompt format (minified JSON or digest)
+    blocked = re.findall(r'"name":\s*"([^"]+)",\s*"reason"', prompt) + \
+        [name.strip() for name in re.findall(r"blocked_roads\[\d+\]\.name=([^;\n]+)", prompt)]
+    return {
+        "is_emergency": True,
+        "severity": "high",
+        "threat_type": emergency_type,
+        "evacuation_steps": steps,
+        "blocked_routes": blocked,
+        "safe_shelter": {
+            "name": "Designated Emergency Shelter",
+            "coordinates": {"lat": round(shelter["lat"], 6), "lng": round(shelter["lng"], 6)},
+            "distance": f"{int(total)} meters"
+        },
+        "emergency_contacts": [CONTACTS.get(emergency_type, {"service": "Emergency Services", "number": "911"})]
+    }
+
+
+def false_alarm_assessment(prompt: str) -> Dict[str, Any]:
+    scenario = prompt_field(prompt, "Scenario") or "the reported situation"
+    location = prompt_field(prompt, "Location") or "the reported location"
+    return {
+        "is_emergency": False,
+        "assessment": f"No corroborating evidence of an emergency for '{scenario}' at {location}. "
+                      "Conditions and official channels appear normal.",
+        "confidence": 0.85,
+        "reasoning": "Weather is normal, no breaking news or official alerts, and no eyewitness reports of an emergency.",
+        "data_sources": [
+            {"source": "Weather Monitor", "query": f"Conditions at {location}", "response": "No active warnings"},
+            {"source": "News Feed", "query": f"Incidents near {location}", "response": "No breaking news"}
+        ],
+        "suggested_actions": [
+            "Follow instructions from on-site staff or building management",
+            "Report any new signs of danger to emergency services"
+        ]
+    }
+
+
+def generate(messages: List[Dict[str, str]]) -> str:
+    """Choose the response shape from the orchestrator's prompt markers."""
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    user = next((m.get("content", "") for m in messages if m.get("role") == "user"), "")
+    if "QUICK TRIAGE ASSESSMENT" in user or "triage" in system.lower():
+        content = triage_response(user)
+    elif "ACTIVE EMERGENCY SITUATION" in user:
+        content = evacuation_plan(user)
+    else:
+        content = false_alarm_assessment(user)
+    return json.dumps(content, indent=2)
+
+
+def token_chunks(text: str) -> List[str]:
+    return [text[i:i + CHARS_PER_TOKEN] for i in range(0, len(text), CHARS_PER_TOKEN)]
+
+
+def usage(messages: List[Dict[str, str]], completion: str) -> Dict[str, int]:
+    prompt_tokens = sum(len(m.get("content", "")) for m in messages) // CHARS_PER_TOKEN
+    completion_tokens = math.ceil(len(completion) / CHARS_PER_TOKEN)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+
+
+def injected_failure() -> Optional[JSONResponse]:
+    """A 429 or 500 response when the dice (or the concurrency cap) say so."""
+    if FAKE_NIM_MAX_CONCURRENCY and stats.in_flight >= FAKE_NIM_MAX_CONCURRENCY:
+        stats.rate_limited += 1
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Too many concurrent requests", "type": "rate_limit"}},
+            headers={"Retry-After": str(FAKE_NIM_RETRY_AFTER)}
+        )
+    roll = rng.random()
+    if roll < FAKE_NIM_RATE_LIMIT_RATE:
+        stats.rate_limited += 1
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Rate limit exceeded", "type": "rate_limit"}},
+            headers={"Retry-After": str(FAKE_NIM_RETRY_AFTER)}
+        )
+    if roll < FAKE_NIM_RATE_LIMIT_RATE + FAKE_NIM_ERROR_RATE:
+        stats.errors += 1
+        return JSONResponse(
+            status_code=500,
+            content={"error": {"message": "Injected upstream failure", "type": "server_error"}}
+        )
+    return None
+
+
+@app.get("/")
+def root():
+    return {
+        "service": "Fake NIM",
+        "version": "1.0.0",
+        "status": "operational"
+    }
+
+
+@app.get("/v1/models")
+def list_models():
+    models = ["nvidia/nemotron-mini-4b-instruct", "nvidia/nemotron-4-340b-instruct"]
+    return {"object": "list", "data": [{"id": model, "object": "model", "owned_by": "nvidia"} for model in models]}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """
+    OpenAI-compatible chat completion, plain or streamed (SSE `data:` lines
+    ending with `[DONE]`).
+    """
+    body = await request.json()
+    model = body.get("model", "")
+    messages = body.get("messages", [])
+    stats.requests += 1
+
+    failure = injected_failure()
+    if failure is not None:
+        return failure
+
+    ttft, tokens_per_sec = model_profile(model)
+    content = generate(messages)
+    chunks = token_chunks(content)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    created = int(time.time())
+    stats.completion_tokens += len(chunks)
+
+    if not body.get("stream"):
+        stats.in_flight += 1
+        try:
+            await asyncio.sleep(ttft + len(chunks) / tokens_per_sec)
+        finally:
+            stats.in_flight -= 1
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": usage(messages, content)
+        }
+
+    stats.streamed += 1
+
+    async def events():
+        stats.in_flight += 1
+        try:
+            await asyncio.sleep(ttft)
+            started = time.perf_counter()
+            for index, chunk in enumerate(chunks):
+                # Pace against the wall clock so slow event loops don't compound
+                delay = started + index / tokens_per_sec - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                event = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]
+                }
+                yield f"data: {json.dumps(event)}\n\n"
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "usage": usage(messages, content)
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+        finally:
+            stats.in_flight -= 1
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+def get_stats():
+    return stats.snapshot()
+
+
+@app.get("/health")
+def health_check():
+    return {"status": "healthy"}
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=PORT)
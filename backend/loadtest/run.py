@@ -0,0 +1,320 @@
+"""
+Open-loop load test for the CrisisVision backend.
+
+Brings up the full stack locally (see stack.py) or targets a running one,
+fires requests at a fixed or Poisson arrival rate with a configurable mix of
+targets (/analyze, /test, the MCP endpoints directly) and emergency types,
+and reports throughput, p50/p95/p99 latency and error rate per target.
+
+Results can be saved as a JSON baseline; later runs compared against it exit
+non-zero when latency, throughput or error rate regress past the tolerances.
+
+    python loadtest/run.py --rate 20 --duration 30 --save-baseline loadtest/baseline.json
+    python loadtest/run.py --rate 20 --duration 30 --baseline loadtest/baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+from typing import Dict, Any, List, Optional, Tuple
+import httpx
+from stack import LocalStack, MCP_SERVERS
+
+SCENARIOS = {
+    "fire": [
+        "Smoke coming from the hillside behind campus",
+        "Fire alarm and visible flames near the library",
+        "Strong smell of smoke and ash falling"
+    ],
+    "hurricane": [
+        "Hurricane winds are breaking windows",
+        "Storm surge flooding the coastal road"
+    ],
+    "flood": [
+        "Water rising quickly in the parking garage",
+        "Creek overflowing onto the street"
+    ],
+    "none": [
+        "Fire alarm going off, probably a drill",
+        "Someone reported smoke but it looks like a BBQ"
+    ]
+}
+LOCATIONS = ["Santa Clara University Library", "Downtown San Jose", "Mountain View Civic Center"]
+
+# Tolerances used when comparing against a baseline
+DEFAULT_LATENCY_TOLERANCE = 20.0
+DEFAULT_THROUGHPUT_TOLERANCE = 10.0
+DEFAULT_ERROR_RATE_TOLERANCE = 0.01
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """'fire=0.3,none=0.7' -> normalized weights."""
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError(f"Mix has no positive weights: {text}")
+    return {name: weight / total for name, weight in weights.items()}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """
+    Latencies and outcomes per target, ignoring requests started during warmup.
+    """
+
+    def __init__(self, measure_from: float):
+        self.measure_from = measure_from
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+        self.dropped = 0
+
+    def record(self, target: str, started: float, latency: float, error: Optional[str]) -> None:
+        if started < self.measure_from:
+            return
+        self.latencies.setdefault(target, [])
+        self.errors.setdefault(target, {})
+        if error is None:
+            self.latencies[target].append(latency)
+        else:
+            self.errors[target][error] = self.errors[target].get(error, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        targets = {}
+        for target in sorted(set(self.latencies) | set(self.errors)):
+            ok = sorted(self.latencies.get(target, []))
+            failed = sum(self.errors.get(target, {}).values())
+            total = len(ok) + failed
+            targets[target] = {
+                "requests": total,
+                "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+                "error_rate": round(failed / total, 4) if total else 0.0,
+                "errors": self.errors.get(target, {}),
+                "p50_ms": round(percentile(ok, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(ok, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(ok, 0.99) * 1000, 1),
+                "max_ms": round(ok[-1] * 1000, 1) if ok else 0.0
+            }
+        return {"dropped": self.dropped, "targets": targets}
+
+
+def build_request(
+    target: str,
+    emergency_type: str,
+    rng: random.Random,
+    sequence: int,
+    unique: bool,
+    orchestrator_url: str,
+    service_urls: Dict[str, str]
+) -> Tuple[str, str, Dict[str, Any]]:
+    """(method, url, httpx kwargs) for one request."""
+    location = rng.choice(LOCATIONS)
+    scenario = rng.choice(SCENARIOS[emergency_type])
+    if unique:
+        # Distinct text defeats the LLM cache and request coalescing
+        scenario = f"{scenario} (report {sequence})"
+    body = {"scenario": scenario, "location": location, "emergency_type": emergency_type}
+
+    if target in ("analyze", "test"):
+        return "POST", f"{orchestrator_url}/{target}", {"json": body}
+    endpoint = MCP_SERVERS[target][2]
+    return "GET", f"{service_urls[target]}{endpoint}", {
+        "params": {"location": location, "emergency_type": emergency_type}
+    }
+
+
+async def generate_load(args: argparse.Namespace, orchestrator_url: str, service_urls: Dict[str, str]) -> Dict[str, Any]:
+    target_mix = parse_mix(args.targets)
+    if "sources" in target_mix:
+        # "sources" spreads its weight over all five MCP endpoints
+        share = target_mix.pop("sources") / len(MCP_SERVERS)
+        for name in MCP_SERVERS:
+            target_mix[name] = target_mix.get(name, 0.0) + share
+    scenario_mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+
+    start = time.monotonic()
+    recorder = Recorder(start + args.warmup)
+    in_flight: set = set()
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        async def fire(target: str, method: str, url: str, kwargs: Dict[str, Any]) -> None:
+            started = time.monotonic()
+            try:
+                response = await client.request(method, url, **kwargs)
+                error = None if response.status_code < 400 else f"http_{response.status_code}"
+            except httpx.TimeoutException:
+                error = "timeout"
+            except httpx.HTTPError as e:
+                error = type(e).__name__
+            recorder.record(target, started, time.monotonic() - started, error)
+
+        sequence = 0
+        next_arrival = start
+        end = start + args.warmup + args.duration
+        while next_arrival < end:
+            delay = next_arrival - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            target = rng.choices(list(target_mix), weights=list(target_mix.values()))[0]
+            emergency_type = rng.choices(list(scenario_mix), weights=list(scenario_mix.values()))[0]
+            if len(in_flight) >= args.max_in_flight:
+                # Open loop: never wait for the system, count what it could not absorb
+                if next_arrival >= start + args.warmup:
+                    recorder.dropped += 1
+            else:
+                method, url, kwargs = build_request(
+                    target, emergency_type, rng, sequence, not args.repeat_scenarios,
+                    orchestrator_url, service_urls
+                )
+                task = asyncio.create_task(fire(target, method, url, kwargs))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            sequence += 1
+
+            gap = 1.0 / args.rate
+            next_arrival += rng.expovariate(args.rate) if args.arrival == "poisson" else gap
+
+        if in_flight:
+            await asyncio.wait(in_flight, timeout=args.timeout)
+        elapsed = min(time.monotonic(), end) - (start + args.warmup)
+
+    result = recorder.summary(max(elapsed, 1e-9))
+    result["config"] = {
+        "rate": args.rate,
+        "arrival": args.arrival,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "targets": args.targets,
+        "mix": args.mix,
+        "unique_scenarios": not args.repeat_scenarios,
+        "max_in_flight": args.max_in_flight,
+        "seed": args.seed
+    }
+    return result
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], args: argparse.Namespace) -> List[str]:
+    """Regressions of result against baseline, as human-readable lines."""
+    regressions = []
+    for target, current in result["targets"].items():
+        before = baseline.get("targets", {}).get(target)
+        if before is None:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if before[metric] > 0 and current[metric] > before[metric] * (1 + args.latency_tolerance / 100):
+                regressions.append(
+                    f"{target} {metric}: {before[metric]} -> {current[metric]} "
+                    f"(+{(current[metric] / before[metric] - 1) * 100:.1f}%)"
+                )
+        if before["throughput_rps"] > 0 and current["throughput_rps"] < before["throughput_rps"] * (1 - args.throughput_tolerance / 100):
+            regressions.append(f"{target} throughput_rps: {before['throughput_rps']} -> {current['throughput_rps']}")
+        if current["error_rate"] > before["error_rate"] + args.error_rate_tolerance:
+            regressions.append(f"{target} error_rate: {before['error_rate']} -> {current['error_rate']}")
+    return regressions
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print(f"\n{'target':<10} {'reqs':>6} {'rps':>8} {'err%':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for target, row in result["targets"].items():
+        print(
+            f"{target:<10} {row['requests']:>6} {row['throughput_rps']:>8} {row['error_rate'] * 100:>6.2f}% "
+            f"{row['p50_ms']:>7}ms {row['p95_ms']:>7}ms {row['p99_ms']:>7}ms {row['max_ms']:>7}ms"
+        )
+        if row["errors"]:
+            print(f"{'':<10} errors: {row['errors']}")
+    if result["dropped"]:
+        print(f"\n⚠️  {result['dropped']} arrivals dropped at --max-in-flight={result['config']['max_in_flight']}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="CrisisVision end-to-end load test")
+    parser.add_argument("--rate", type=float, default=10.0, help="Arrivals per second")
+    parser.add_argument("--arrival", choices=["poisson", "constant"], default="poisson")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before the run")
+    parser.add_argument("--targets", default="analyze=0.7,test=0.2,sources=0.1",
+                        help="Target mix: analyze, test, sources (all MCP endpoints) or a single source name")
+    parser.add_argument("--mix", default="fire=0.3,hurricane=0.2,flood=0.2,none=0.3", help="Emergency type mix")
+    parser.add_argument("--repeat-scenarios", action="store_true",
+                        help="Reuse identical scenario texts (lets caches and coalescing kick in)")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", help="Target a running orchestrator instead of starting a local stack")
+    parser.add_argument("--base-port", type=int, default=18000, help="First port of the local stack")
+    parser.add_argument("--orchestrator-env", action="append", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--nim-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Fake NIM settings, e.g. FAKE_NIM_TTFT=0.5")
+    parser.add_argument("--output", help="Write the full result JSON here")
+    parser.add_argument("--save-baseline", help="Write the result as the new baseline")
+    parser.add_argument("--baseline", help="Compare against this baseline and exit 1 on regression")
+    parser.add_argument("--latency-tolerance", type=float, default=DEFAULT_LATENCY_TOLERANCE, help="Percent")
+    parser.add_argument("--throughput-tolerance", type=float, default=DEFAULT_THROUGHPUT_TOLERANCE, help="Percent")
+    parser.add_argument("--error-rate-tolerance", type=float, default=DEFAULT_ERROR_RATE_TOLERANCE,
+                        help="Absolute increase")
+    return parser.parse_args(argv)
+
+
+def env_pairs(pairs: List[str]) -> Dict[str, str]:
+    return dict(pair.split("=", 1) for pair in pairs)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    if args.url:
+        service_urls = {name: os.getenv(f"{name.upper()}_SERVICE_URL", f"http://localhost:{8000 + offset}")
+                        for name, (_, offset, _) in MCP_SERVERS.items()}
+        print(f"🎯 Targeting {args.url}")
+        result = asyncio.run(generate_load(args, args.url.rstrip("/"), service_urls))
+    else:
+        stack = LocalStack(args.base_port, env_pairs(args.orchestrator_env), env_pairs(args.nim_env))
+        print(f"🚀 Starting local stack on ports {args.base_port}+ (logs in {stack.log_dir})")
+        with stack:
+            service_urls = {name: stack.service_url(name) for name in MCP_SERVERS}
+            print(f"📈 {args.rate}/s {args.arrival} for {args.duration}s (+{args.warmup}s warmup)")
+            result = asyncio.run(generate_load(args, stack.orchestrator_url, service_urls))
+
+    result["environment"] = {"python": platform.python_version(), "platform": platform.platform(),
+                             "cpus": os.cpu_count()}
+    print_report(result)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+            print(f"💾 Saved {path}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args)
+        if regressions:
+            print("\n❌ Regressions against baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print("\n✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
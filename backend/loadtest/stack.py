@@ -0,0 +1,136 @@
+"""
+Run the whole CrisisVision backend as local subprocesses (no Docker).
+
+Starts the five MCP servers, the fake NIM server and the orchestrator on a
+block of ports starting at `base_port`, waits for every /health, and tears
+everything down on exit. Process output goes to log files in `log_dir`.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Service name -> (directory under backend/, port offset from base_port, data endpoint)
+MCP_SERVERS = {
+    "weather": ("mcp_servers/weather", 1, "/weather"),
+    "maps": ("mcp_servers/maps", 2, "/location"),
+    "news": ("mcp_servers/news", 3, "/news"),
+    "social": ("mcp_servers/social", 4, "/social"),
+    "resource": ("mcp_servers/resource", 5, "/resources")
+}
+FAKE_NIM_OFFSET = 9
+
+
+class LocalStack:
+    """
+    Orchestrator + MCP servers + fake NIM as child processes.
+    """
+
+    def __init__(
+        self,
+        base_port: int = 18000,
+        orchestrator_env: Optional[Dict[str, str]] = None,
+        nim_env: Optional[Dict[str, str]] = None,
+        log_dir: Optional[str] = None
+    ):
+        self.base_port = base_port
+        self.orchestrator_env = orchestrator_env or {}
+        self.nim_env = nim_env or {}
+        self.log_dir = log_dir or tempfile.mkdtemp(prefix="crisisvision-loadtest-")
+        self.processes: List[subprocess.Popen] = []
+
+    @property
+    def orchestrator_url(self) -> str:
+        return f"http://127.0.0.1:{self.base_port}"
+
+    def service_url(self, name: str) -> str:
+        return f"http://127.0.0.1:{self.base_port + MCP_SERVERS[name][1]}"
+
+    @property
+    def nim_url(self) -> str:
+        return f"http://127.0.0.1:{self.base_port + FAKE_NIM_OFFSET}"
+
+    def _spawn(self, name: str, args: List[str], cwd: str, env: Dict[str, str]) -> None:
+        log = open(os.path.join(self.log_dir, f"{name}.log"), "w")
+        process = subprocess.Popen(
+            args,
+            cwd=cwd,
+            env={**os.environ, **env},
+            stdout=log,
+            stderr=subprocess.STDOUT
+        )
+        self.processes.append(process)
+
+    def _uvicorn(self, module: str, port: int) -> List[str]:
+        return [sys.executable, "-m", "uvicorn", module, "--host", "127.0.0.1", "--port", str(port),
+                "--log-level", "warning"]
+
+    def start(self, timeout: float = 30.0) -> None:
+        for name, (directory, offset, _) in MCP_SERVERS.items():
+            self._spawn(name, self._uvicorn("server:app", self.base_port + offset),
+                        os.path.join(BACKEND_DIR, directory), {})
+
+        self._spawn("fake_nim", self._uvicorn("server:app", self.base_port + FAKE_NIM_OFFSET),
+                    os.path.join(BACKEND_DIR, "fake_nim"), self.nim_env)
+
+        orchestrator_env = {
+            f"{name.upper()}_SERVICE_URL": self.service_url(name) for name in MCP_SERVERS
+        }
+        orchestrator_env.update({
+            "NVIDIA_API_URL": f"{self.nim_url}/v1/chat/completions",
+            "NVIDIA_API_KEY": "",
+            "LLM_CACHE_DIR": os.path.join(self.log_dir, "llm_cache")
+        })
+        orchestrator_env.update(self.orchestrator_env)
+        self._spawn("orchestrator", self._uvicorn("main:app", self.base_port),
+                    os.path.join(BACKEND_DIR, "orchestrator"), orchestrator_env)
+
+        urls = [self.orchestrator_url, self.nim_url] + [self.service_url(name) for name in MCP_SERVERS]
+        self.wait_healthy(urls, timeout)
+
+    def wait_healthy(self, urls: List[str], timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        pending = list(urls)
+        with httpx.Client(timeout=1.0) as client:
+            while pending:
+                for process in self.processes:
+                    if process.poll() is not None:
+                        raise RuntimeError(f"A service exited during startup; see logs in {self.log_dir}")
+                for url in list(pending):
+                    try:
+                        if client.get(f"{url}/health").status_code == 200:
+                            pending.remove(url)
+                    except httpx.HTTPError:
+                        pass
+                if pending and time.monotonic() > deadline:
+                    raise RuntimeError(f"Services not healthy after {timeout}s: {pending} (logs in {self.log_dir})")
+                if pending:
+                    time.sleep(0.2)
+
+    def stop(self) -> None:
+        for process in self.processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+
+    def __enter__(self) -> "LocalStack":
+        try:
+            self.start()
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,99 @@
+"""
+Prometheus metrics for the MCP servers.
+
+instrument(app, service) adds a middleware that counts and times every request
+and a GET /metrics endpoint in the Prometheus text format. Updates happen on
+the event loop thread (plain dict arithmetic, no locks) and histogram buckets
+are only cumulated at scrape time, so it is cheap enough to leave on.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class HTTPMetrics:
+    """
+    Request counts, latency histogram and in-flight gauge per route path.
+    """
+
+    def __init__(self, service: str):
+        self.service = service
+        self.known_paths: set = set()
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.bucket_counts: Dict[str, List[int]] = {}
+        self.latency_sums: Dict[str, float] = {}
+
+    def observe(self, path: str, method: str, status: int, seconds: float) -> None:
+        key = (path, method, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        counts = self.bucket_counts.get(path)
+        if counts is None:
+            counts = self.bucket_counts[path] = [0] * (len(BUCKETS) + 1)
+            self.latency_sums[path] = 0.0
+        counts[bisect_left(BUCKETS, seconds)] += 1
+        self.latency_sums[path] += seconds
+
+    def render(self) -> str:
+        service = f'service="{self.service}"'
+        lines = [
+            "# HELP mcp_http_requests_total HTTP requests handled",
+            "# TYPE mcp_http_requests_total counter"
+        ]
+        for (path, method, status), count in self.requests.items():
+            lines.append(f'mcp_http_requests_total{{{service},path="{path}",method="{method}",status="{status}"}} {count}')
+
+        lines += [
+            "# HELP mcp_http_requests_in_flight HTTP requests currently being handled",
+            "# TYPE mcp_http_requests_in_flight gauge"
+        ]
+        for path, count in self.in_flight.items():
+            lines.append(f'mcp_http_requests_in_flight{{{service},path="{path}"}} {count}')
+
+        lines += [
+            "# HELP mcp_http_request_seconds HTTP request latency",
+            "# TYPE mcp_http_request_seconds histogram"
+        ]
+        for path, counts in self.bucket_counts.items():
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'mcp_http_request_seconds_bucket{{{service},path="{path}",le="{le}"}} {cumulative}')
+            lines.append(f'mcp_http_request_seconds_sum{{{service},path="{path}"}} {self.latency_sums[path]!r}')
+            lines.append(f'mcp_http_request_seconds_count{{{service},path="{path}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
+
+
+def instrument(app: FastAPI, service: str) -> HTTPMetrics:
+    """
+    Record every request on `app` and expose GET /metrics.
+    """
+    http_metrics = HTTPMetrics(service)
+
+    @app.middleware("http")
+    async def record_http_metrics(request: Request, call_next):
+        if not http_metrics.known_paths:
+            http_metrics.known_paths = {route.path for route in app.routes}
+        path = request.url.path if request.url.path in http_metrics.known_paths else "other"
+        http_metrics.in_flight[path] = http_metrics.in_flight.get(path, 0) + 1
+        started = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            http_metrics.in_flight[path] -= 1
+        http_metrics.observe(path, request.method, response.status_code, time.perf_counter() - started)
+        return response
+
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics() -> Response:
+        return Response(content=http_metrics.render(), media_type=CONTENT_TYPE)
+
+    return http_metrics
@@ -0,0 +1,263 @@
+"""
+Grid index over geographic points (shelters, safe zones, hospitals, stations).
+
+Points are bucketed into square lat/lng cells (SPATIAL_CELL_DEGREES, ~1 km
+by default). A k-nearest query walks rings of cells outward from the query
+cell and stops as soon as the k-th best match is closer than anything the
+next ring could hold; a radius query only visits the cells overlapping the
+circle's bounding box. Either way a query touches a handful of cells, not
+every point, so it stays in microseconds with thousands of places loaded.
+
+Filters are evaluated on the stored dicts at query time, so occupancy and
+status updates made in place are seen by the next query without reindexing.
+
+A place is a dict with `coordinates: {"lat", "lng"}` and optionally
+`status`, `capacity` and `current_occupancy` (ints, or strings such as
+"500 people").
+"""
+
+import heapq
+import json
+import math
+import os
+from typing import Dict, Any, List, Optional, Tuple, Iterable, Callable, Union
+
+SPATIAL_CELL_DEGREES = float(os.getenv("SPATIAL_CELL_DEGREES", "0.01"))
+
+# Optional JSON list of extra places (shelters, hospitals, fire stations...)
+# shared by the resource and maps servers
+SHELTERS_FILE = os.getenv("SHELTERS_FILE")
+
+EARTH_RADIUS_M = 6371008.8
+# Lower bound on meters per degree, so ring cut-offs never skip a closer point
+METERS_PER_DEGREE = 111_000
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _haversine_term(meters: float) -> float:
+    """The `a` of the haversine formula for a distance; grows monotonically with it."""
+    if meters >= math.pi * EARTH_RADIUS_M:
+        return math.inf if meters == math.inf else 1.0
+    return math.sin(meters / (2 * EARTH_RADIUS_M)) ** 2
+
+
+def _term_meters(a: float) -> float:
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _count(value: Any) -> Optional[int]:
+    """Leading integer of a capacity value ("500 people" -> 500), None if absent."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    digits = ""
+    for char in str(value).strip().replace(",", ""):
+        if not char.isdigit():
+            break
+        digits += char
+    return int(digits) if digits else None
+
+
+def remaining_capacity(place: Dict[str, Any]) -> float:
+    """capacity - current_occupancy; unlimited when no capacity is given."""
+    capacity = _count(place.get("capacity"))
+    if capacity is None:
+        return math.inf
+    return capacity - (_count(place.get("current_occupancy")) or 0)
+
+
+def add_occupancy(place: Dict[str, Any], people: int) -> None:
+    """Record people arriving at a place; current_occupancy becomes an int."""
+    place["current_occupancy"] = (_count(place.get("current_occupancy")) or 0) + people
+
+
+def load_places(path: Optional[str]) -> List[Dict[str, Any]]:
+    """Places from a JSON list file; [] when no path is configured."""
+    if not path:
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        places = json.load(f)
+    print(f"📍 Loaded {len(places)} places from {path}")
+    return places
+
+
+class SpatialIndex:
+    """
+    Uniform grid of places keyed by (row, col) cell.
+
+    Cells hold (lat radians, lng radians, cos lat, place), so candidates are
+    compared on the haversine term alone and only results pay for asin/sqrt.
+    """
+
+    def __init__(self, places: Iterable[Dict[str, Any]] = (), cell_degrees: float = SPATIAL_CELL_DEGREES):
+        self.cell = cell_degrees
+        self._cells: Dict[Tuple[int, int], List[Tuple[float, float, float, Dict[str, Any]]]] = {}
+        self._count = 0
+        self._rows = (0, -1)
+        self._cols = (0, -1)
+        for place in places:
+            self.insert(place)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _key(self, lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell)), int(math.floor(lng / self.cell))
+
+    def insert(self, place: Dict[str, Any]) -> None:
+        coords = place["coordinates"]
+        lat, lng = float(coords["lat"]), float(coords["lng"])
+        row, col = self._key(lat, lng)
+        phi = math.radians(lat)
+        self._cells.setdefault((row, col), []).append((phi, math.radians(lng), math.cos(phi), place))
+        if self._count == 0:
+            self._rows, self._cols = (row, row), (col, col)
+        else:
+            self._rows = (min(self._rows[0], row), max(self._rows[1], row))
+            self._cols = (min(self._cols[0], col), max(self._cols[1], col))
+        self._count += 1
+
+    @staticmethod
+    def _matcher(
+        status: Union[str, Tuple[str, ...], None],
+        min_capacity: int,
+        predicate: Optional[Callable[[Dict[str, Any]], bool]]
+    ) -> Optional[Callable[[Dict[str, Any]], bool]]:
+        """
+        Combined filter. Status matches case-insensitively by prefix, so
+        "open" accepts "Open and accepting evacuees"; a tuple accepts any of
+        several prefixes.
+        """
+        if status is None and min_capacity <= 0 and predicate is None:
+            return None
+        if isinstance(status, str):
+            status = (status,)
+        prefix = tuple(option.lower() for option in status) if status is not None else None
+
+        def matches(place: Dict[str, Any]) -> bool:
+            if prefix is not None and not str(place.get("status", "")).lower().startswith(prefix):
+                return False
+            if min_capacity > 0 and remaining_capacity(place) < min_capacity:
+                return False
+            return predicate is None or predicate(place)
+        return matches
+
+    def nearest(
+        self,
+        lat: float,
+        lng: float,
+        k: int = 1,
+        max_distance_m: float = math.inf,
+        status: Union[str, Tuple[str, ...], None] = None,
+        min_capacity: int = 0,
+        predicate: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        """Up to k (meters, place) pairs matching the filters, nearest first."""
+        if k <= 0 or not self._count:
+            return []
+        matches = self._matcher(status, min_capacity, predicate)
+        row, col = self._key(lat, lng)
+        (row_lo, row_hi), (col_lo, col_hi) = self._rows, self._cols
+        # Rings before the first reach no occupied cell, rings past the last hold none
+        first_ring = max(0, row_lo - row, row - row_hi, col_lo - col, col - col_hi)
+        last_ring = max(abs(row - row_lo), abs(row - row_hi), abs(col - col_lo), abs(col - col_hi))
+
+        phi, lam, cos_phi = math.radians(lat), math.radians(lng), math.cos(math.radians(lat))
+        sin = math.sin
+        limit = _haversine_term(max_distance_m)
+
+        # Max-heap of the best k as (-haversine term, tiebreak, place)
+        best: List[Tuple[float, int, Dict[str, Any]]] = []
+        seen = 0
+        for ring in range(first_ring, last_ring + 1):
+            # Nothing in this ring or beyond is closer than the edge of the
+            # square of cells already searched (east-west meters taken at the
+            # most poleward latitude the ring reaches)
+            if ring:
+                lng_scale = METERS_PER_DEGREE * math.cos(math.radians(min(89.0, abs(lat) + self.cell * (ring + 1))))
+                floor_m = min(
+                    (lat - (row - ring + 1) * self.cell) * METERS_PER_DEGREE,
+                    ((row + ring) * self.cell - lat) * METERS_PER_DEGREE,
+                    (lng - (col - ring + 1) * self.cell) * lng_scale,
+                    ((col + ring) * self.cell - lng) * lng_scale
+                )
+                floor = _haversine_term(max(0.0, floor_m))
+                if floor > limit or (len(best) == k and -best[0][0] <= floor):
+                    break
+            # Only the part of the ring inside the occupied bounding box
+            for r in range(max(row - ring, row_lo), min(row + ring, row_hi) + 1):
+                if abs(r - row) == ring:
+                    cols = range(max(col - ring, col_lo), min(col + ring, col_hi) + 1)
+                else:
+                    cols = [c for c in (col - ring, col + ring) if col_lo <= c <= col_hi]
+                for c in cols:
+                    bucket = self._cells.get((r, c))
+                    if not bucket:
+                        continue
+                    for place_phi, place_lam, place_cos, place in bucket:
+                        a = sin((place_phi - phi) / 2) ** 2 + cos_phi * place_cos * sin((place_lam - lam) / 2) ** 2
+                        if a > limit or (len(best) == k and a >= -best[0][0]):
+                            continue
+                        if matches is not None and not matches(place):
+                            continue
+                        seen += 1
+                        if len(best) < k:
+                            heapq.heappush(best, (-a, seen, place))
+                        else:
+                            heapq.heapreplace(best, (-a, seen, place))
+        ranked = sorted(best, key=lambda entry: (-entry[0], entry[1]))
+        return [(_term_meters(-neg), place) for neg, _, place in ranked]
+
+    def within(
+        self,
+        lat: float,
+        lng: float,
+        radius_m: float,
+        status: Union[str, Tuple[str, ...], None] = None,
+        min_capacity: int = 0,
+        predicate: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        """All (meters, place) pairs within radius_m matching the filters, nearest first."""
+        if not self._count:
+            return []
+        matches = self._matcher(status, min_capacity, predicate)
+        dlat = radius_m / METERS_PER_DEGREE
+        dlng = radius_m / (METERS_PER_DEGREE * max(0.01, math.cos(math.radians(min(89.0, abs(lat) + dlat)))))
+        row_lo, col_lo = self._key(lat - dlat, lng - dlng)
+        row_hi, col_hi = self._key(lat + dlat, lng + dlng)
+        row_lo, row_hi = max(row_lo, self._rows[0]), min(row_hi, self._rows[1])
+        col_lo, col_hi = max(col_lo, self._cols[0]), min(col_hi, self._cols[1])
+
+        if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > len(self._cells):
+            # A huge radius: walking the occupied cells is cheaper than the box
+            buckets = [bucket for (r, c), bucket in self._cells.items()
+                       if row_lo <= r <= row_hi and col_lo <= c <= col_hi]
+        else:
+            buckets = [self._cells[(r, c)] for r in range(row_lo, row_hi + 1)
+                       for c in range(col_lo, col_hi + 1) if (r, c) in self._cells]
+
+        phi, lam, cos_phi = math.radians(lat), math.radians(lng), math.cos(math.radians(lat))
+        sin = math.sin
+        limit = _haversine_term(radius_m)
+        found = []
+        for bucket in buckets:
+            for place_phi, place_lam, place_cos, place in bucket:
+                a = sin((place_phi - phi) / 2) ** 2 + cos_phi * place_cos * sin((place_lam - lam) / 2) ** 2
+                if a <= limit and (matches is None or matches(place)):
+                    found.append((a, place))
+        found.sort(key=lambda entry: entry[0])
+        return [(_term_meters(a), place) for a, place in found]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "places": self._count,
+            "cells": len(self._cells),
+            "cell_degrees": self.cell
+        }
@@ -0,0 +1,27 @@
+"""
+Trace context for the MCP servers.
+
+The orchestrator sends a W3C `traceparent` header with every query. This
+middleware echoes it back as `traceresponse` and reports the handler's own
+time in `Server-Timing`, so the orchestrator's span for the call can separate
+server time from network and queueing time.
+"""
+
+import time
+from fastapi import FastAPI, Request
+
+
+def propagate(app: FastAPI) -> None:
+    """
+    Echo trace context and add a Server-Timing header to every response.
+    """
+
+    @app.middleware("http")
+    async def trace_context(request: Request, call_next):
+        started = time.perf_counter()
+        response = await call_next(request)
+        response.headers["Server-Timing"] = f"app;dur={(time.perf_counter() - started) * 1000:.2f}"
+        traceparent = request.headers.get("traceparent")
+        if traceparent:
+            response.headers["traceresponse"] = traceparent
+        return response
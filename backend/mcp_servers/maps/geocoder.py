@@ -0,0 +1,262 @@
+"""
+Place-name resolution against a local gazetteer.
+
+The gazetteer is a JSON list of places with a canonical `id`, a `name`,
+`aliases`, coordinates and an address. Every name and alias is tokenized
+(lowercase words, common abbreviations expanded: "Univ" -> "university")
+into a shared vocabulary, and each vocabulary word is indexed twice:
+
+- in a character trie, so a query word that is a prefix ("leav") reaches
+  the words it starts, and
+- in a trigram index, so a misspelt word ("libary", "feild") reaches the
+  words sharing its letter triples, which are then scored by edit distance
+  (transpositions count as one edit).
+
+A query only scores the places whose words its own words reach, so
+resolution costs microseconds to a few hundred of them whatever the size of
+the gazetteer. A place scores by how much of the query its best name variant
+covers, with a small bonus for covering the whole variant, so "Santa Clara"
+prefers the city over the university it is a prefix of.
+"""
+
+import json
+import os
+import re
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+# Best score below which a query is reported as unresolved
+GEOCODER_MIN_SCORE = float(os.getenv("GEOCODER_MIN_SCORE", "0.5"))
+
+# Vocabulary words a single query prefix may expand to
+PREFIX_EXPANSIONS = 32
+# Similarity below which a word is not a fuzzy match, and how many words
+# sharing the most trigrams with a query word are scored
+FUZZY_MIN_SIMILARITY = 0.5
+FUZZY_CANDIDATES = 12
+# Misspelt words remembered with their fuzzy matches
+FUZZY_CACHE_SIZE = 4096
+# Places scored per query at most (those reached by the most query words)
+MAX_CANDIDATES = 500
+
+ABBREVIATIONS = {
+    "univ": "university", "uni": "university", "lib": "library", "ctr": "center", "centre": "center",
+    "st": "street", "ave": "avenue", "blvd": "boulevard", "rd": "road", "expy": "expressway",
+    "hosp": "hospital", "med": "medical", "dept": "department", "stn": "station", "mt": "mount"
+}
+STOPWORDS = {"the", "at", "near", "of", "in"}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    words = []
+    for word in _WORD_RE.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        words.append(ABBREVIATIONS.get(word, word))
+    return words
+
+
+def trigrams(word: str) -> List[str]:
+    padded = f"${word}$"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def edit_similarity(a: str, b: str) -> float:
+    """1 - (optimal string alignment distance / longer length)."""
+    before, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        char = a[i - 1]
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            distance = previous[j - 1] + (char != b[j - 1])
+            if previous[j] + 1 < distance:
+                distance = previous[j] + 1
+            if current[j - 1] + 1 < distance:
+                distance = current[j - 1] + 1
+            if before is not None and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1] \
+                    and before[j - 2] + 1 < distance:
+                distance = before[j - 2] + 1
+            current[j] = distance
+        before, previous = previous, current
+    return 1 - previous[len(b)] / max(len(a), len(b), 1)
+
+
+class Place:
+    """
+    One gazetteer entry and the word-id tuples of its name and aliases.
+    """
+
+    __slots__ = ("id", "name", "type", "lat", "lng", "address", "variants")
+
+    def __init__(self, entry: Dict[str, Any]):
+        self.id = entry["id"]
+        self.name = entry["name"]
+        self.type = entry.get("type", "place")
+        self.lat = float(entry["lat"])
+        self.lng = float(entry["lng"])
+        self.address = entry.get("address", "")
+        self.variants: List[Tuple[int, ...]] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "type": self.type,
+            "coordinates": {"lat": self.lat, "lng": self.lng},
+            "address": self.address
+        }
+
+
+class Gazetteer:
+    """
+    Places with a word trie and a trigram index over their names and aliases.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]]):
+        self.places: List[Place] = []
+        self.words: List[str] = []
+        self._word_ids: Dict[str, int] = {}
+        self._postings: List[List[int]] = []
+        self._trie: Dict[str, Any] = {}
+        self._trigrams: Dict[str, List[int]] = {}
+        self._fuzzy_cache: Dict[str, List[Tuple[int, float]]] = {}
+        for entry in entries:
+            self._add_place(Place(entry), [entry["name"]] + entry.get("aliases", []))
+
+    @classmethod
+    def load(cls, path: str) -> "Gazetteer":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _word_id(self, word: str) -> int:
+        word_id = self._word_ids.get(word)
+        if word_id is not None:
+            return word_id
+        word_id = self._word_ids[word] = len(self.words)
+        self.words.append(word)
+        self._postings.append([])
+        node = self._trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node["$"] = word_id
+        for gram in set(trigrams(word)):
+            self._trigrams.setdefault(gram, []).append(word_id)
+        return word_id
+
+    def _add_place(self, place: Place, names: List[str]) -> None:
+        index = len(self.places)
+        self.places.append(place)
+        for name in names:
+            variant = tuple(self._word_id(word) for word in tokenize(name))
+            if not variant or variant in place.variants:
+                continue
+            place.variants.append(variant)
+            for word_id in variant:
+                postings = self._postings[word_id]
+                if not postings or postings[-1] != index:
+                    postings.append(index)
+
+    def _prefix_words(self, prefix: str) -> List[int]:
+        node = self._trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        found, stack = [], [node]
+        while stack and len(found) < PREFIX_EXPANSIONS:
+            node = stack.pop()
+            for char, child in node.items():
+                if char == "$":
+                    found.append(child)
+                else:
+                    stack.append(child)
+        return found
+
+    def _fuzzy_words(self, word: str) -> List[Tuple[int, float]]:
+        cached = self._fuzzy_cache.get(word)
+        if cached is not None:
+            return cached
+        shared: Counter = Counter()
+        for gram in set(trigrams(word)):
+            shared.update(self._trigrams.get(gram, ()))
+        scored = []
+        for word_id, _ in shared.most_common(FUZZY_CANDIDATES):
+            candidate = self.words[word_id]
+            if abs(len(candidate) - len(word)) > len(word) // 2:
+                continue
+            similarity = edit_similarity(word, candidate)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                scored.append((word_id, similarity))
+        if len(self._fuzzy_cache) >= FUZZY_CACHE_SIZE:
+            self._fuzzy_cache.clear()
+        self._fuzzy_cache[word] = scored
+        return scored
+
+    def _word_matches(self, token: str) -> Dict[int, float]:
+        """Vocabulary words a query word reaches, with a similarity in (0, 1]."""
+        matches: Dict[int, float] = {}
+        exact = self._word_ids.get(token)
+        if exact is not None:
+            matches[exact] = 1.0
+        if len(token) >= 2:
+            for word_id in self._prefix_words(token):
+                if word_id not in matches:
+                    matches[word_id] = 0.6 + 0.4 * len(token) / len(self.words[word_id])
+        if exact is None and len(token) >= 3:
+            for word_id, similarity in self._fuzzy_words(token):
+                if similarity > matches.get(word_id, 0.0):
+                    matches[word_id] = similarity
+        return matches
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[float, Place]]:
+        """Best (score, place) pairs for a free-text query, highest first."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # Vocabulary word -> [(query position, similarity)]
+        hits: Dict[int, List[Tuple[int, float]]] = {}
+        reached: Counter = Counter()
+        for position, token in enumerate(tokens):
+            places = set()
+            for word_id, similarity in self._word_matches(token).items():
+                hits.setdefault(word_id, []).append((position, similarity))
+                places.update(self._postings[word_id])
+            reached.update(places)
+
+        scored = []
+        for index, _ in reached.most_common(MAX_CANDIDATES):
+            place = self.places[index]
+            best = 0.0
+            for variant in place.variants:
+                per_token = [0.0] * len(tokens)
+                covered = 0
+                for word_id in variant:
+                    word_hits = hits.get(word_id)
+                    if word_hits is None:
+                        continue
+                    covered += 1
+                    for position, similarity in word_hits:
+                        if similarity > per_token[position]:
+                            per_token[position] = similarity
+                score = sum(per_token) / len(tokens) * (0.8 + 0.2 * covered / len(variant))
+                if score > best:
+                    best = score
+            scored.append((round(best, 4), place))
+        scored.sort(key=lambda item: (-item[0], len(item[1].name), item[1].id))
+        return scored[:limit]
+
+    def resolve(self, query: str) -> Optional[Place]:
+        """The best place for a query, or None below GEOCODER_MIN_SCORE."""
+        results = self.search(query, limit=1)
+        if results and results[0][0] >= GEOCODER_MIN_SCORE:
+            return results[0][1]
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "places": len(self.places),
+            "words": len(self.words),
+            "trigrams": len(self._trigrams)
+        }
@@ -0,0 +1,438 @@
+"""
+Walking evacuation routes over a local road and footpath graph.
+
+The graph is array-backed (CSR): node coordinates in two float arrays,
+`offsets[v]:offsets[v + 1]` indexing the edges leaving v in parallel
+`targets` / `lengths` / `name_ids` arrays. It is loaded either from an OSM
+XML extract (converted in memory; fine for a campus) or from the compact
+binary `.graph` file written by build_graph.py for city-sized regions.
+
+Routes are found with A* guided by ALT landmark bounds: the graph distance
+from a few far-apart landmarks to every node is precomputed (at load, or
+stored in the .graph file), and |d(L, t) - d(L, v)| is a lower bound on the
+remaining distance that is far tighter than the straight line on a street
+network. Removing edges only lengthens paths, so the bounds stay admissible
+when hazards close part of the graph.
+
+Hazards are circles (e.g. a fire with a buffer) and blocked street names.
+Inside a hazard circle only edges leading away from its center are usable,
+so a route can escape a buffer it starts in but never crosses one.
+"""
+
+import heapq
+import math
+import os
+import struct
+import sys
+import xml.etree.ElementTree as ET
+from array import array
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+
+EARTH_RADIUS_M = 6371008.8
+WALKING_SPEED_MPS = 1.3
+
+# OSM highway values usable on foot
+WALKABLE = {
+    "footway", "path", "pedestrian", "steps", "living_street", "residential", "service",
+    "unclassified", "tertiary", "secondary", "primary", "trunk", "track", "cycleway", "road"
+}
+
+GRAPH_MAGIC = b"CVGRAPH1"
+
+# Landmarks consulted per query (of MAPS_LANDMARKS precomputed)
+ACTIVE_LANDMARKS = 4
+
+COMPASS = ("north", "northeast", "east", "southeast", "south", "southwest", "west", "northwest")
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def bearing_deg(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dl = math.radians(lng2 - lng1)
+    x = math.sin(dl) * math.cos(p2)
+    y = math.cos(p1) * math.sin(p2) - math.sin(p1) * math.cos(p2) * math.cos(dl)
+    return (math.degrees(math.atan2(x, y)) + 360) % 360
+
+
+class Hazard:
+    """
+    A circular no-go area, e.g. a fire location plus its buffer.
+    """
+
+    def __init__(self, lat: float, lng: float, radius_m: float, label: str):
+        self.lat = lat
+        self.lng = lng
+        self.radius_m = radius_m
+        self.label = label
+
+    def key(self) -> tuple:
+        return (round(self.lat, 6), round(self.lng, 6), round(self.radius_m, 1), self.label)
+
+
+class RoadGraph:
+    """
+    CSR road/footpath graph with ALT landmarks and hazard-aware A*.
+    """
+
+    def __init__(
+        self,
+        lats: array,
+        lngs: array,
+        offsets: array,
+        targets: array,
+        lengths: array,
+        name_ids: array,
+        names: List[str],
+        landmarks: Optional[List[int]] = None,
+        landmark_distances: Optional[List[array]] = None
+    ):
+        # Plain lists index faster than arrays in the A* inner loop
+        self.lats = lats.tolist()
+        self.lngs = lngs.tolist()
+        self.offsets = offsets.tolist()
+        self.targets = targets.tolist()
+        self.lengths = lengths.tolist()
+        self.name_ids = name_ids.tolist()
+        self.names = names
+        self.node_count = len(self.lats)
+        self.edge_count = len(self.targets)
+        if landmarks is None:
+            landmarks, landmark_distances = self.select_landmarks(int(os.getenv("MAPS_LANDMARKS", "8")))
+        self.landmarks = landmarks
+        self.landmark_distances = [d.tolist() if isinstance(d, array) else d for d in landmark_distances]
+        self._build_snap_grid()
+
+    # ---------- loading ----------
+
+    @classmethod
+    def from_edges(
+        cls,
+        coords: List[Tuple[float, float]],
+        edges: Iterable[Tuple[int, int, str]],
+        landmarks: Optional[List[int]] = None,
+        landmark_distances: Optional[List[array]] = None
+    ) -> "RoadGraph":
+        """Build from node coordinates and undirected (u, v, street name) edges."""
+        names: List[str] = []
+        name_index: Dict[str, int] = {}
+        adjacency: List[List[Tuple[int, float, int]]] = [[] for _ in coords]
+        for u, v, name in edges:
+            if u == v:
+                continue
+            if name not in name_index:
+                name_index[name] = len(names)
+                names.append(name)
+            length = haversine_m(coords[u][0], coords[u][1], coords[v][0], coords[v][1])
+            adjacency[u].append((v, length, name_index[name]))
+            adjacency[v].append((u, length, name_index[name]))
+
+        offsets, targets, lengths, name_ids = array("I", [0]), array("I"), array("f"), array("I")
+        for neighbours in adjacency:
+            for target, length, name_id in neighbours:
+                targets.append(target)
+                lengths.append(length)
+                name_ids.append(name_id)
+            offsets.append(len(targets))
+        return cls(
+            array("d", (c[0] for c in coords)),
+            array("d", (c[1] for c in coords)),
+            offsets, targets, lengths, name_ids, names,
+            landmarks, landmark_distances
+        )
+
+    @classmethod
+    def from_osm(cls, path: str) -> "RoadGraph":
+        """Walkable ways of an OSM XML extract; only nodes used by them are kept."""
+        node_coords: Dict[str, Tuple[float, float]] = {}
+        ways: List[Tuple[List[str], str]] = []
+        for _, element in ET.iterparse(path, events=("end",)):
+            if element.tag == "node":
+                node_coords[element.get("id")] = (float(element.get("lat")), float(element.get("lon")))
+                element.clear()
+            elif element.tag == "way":
+                tags = {tag.get("k"): tag.get("v") for tag in element.findall("tag")}
+                if tags.get("highway") in WALKABLE and tags.get("access") not in ("private", "no"):
+                    refs = [nd.get("ref") for nd in element.findall("nd")]
+                    ways.append((refs, tags.get("name") or tags.get("highway")))
+                element.clear()
+
+        index: Dict[str, int] = {}
+        coords: List[Tuple[float, float]] = []
+        edges: List[Tuple[int, int, str]] = []
+        for refs, name in ways:
+            previous = None
+            for ref in refs:
+                if ref not in node_coords:
+                    previous = None
+                    continue
+                if ref not in index:
+                    index[ref] = len(coords)
+                    coords.append(node_coords[ref])
+                if previous is not None:
+                    edges.append((previous, index[ref], name))
+                previous = index[ref]
+        return cls.from_edges(coords, edges)
+
+    @classmethod
+    def load(cls, path: str) -> "RoadGraph":
+        if path.endswith(".graph"):
+            return cls.read_binary(path)
+        return cls.from_osm(path)
+
+    def write_binary(self, path: str) -> None:
+        """Compact little-endian file: header, CSR arrays, landmarks, then street names as UTF-8."""
+        names_blob = "\n".join(self.names).encode("utf-8")
+        sections = [
+            array("d", self.lats), array("d", self.lngs),
+            array("I", self.offsets), array("I", self.targets),
+            array("f", self.lengths), array("I", self.name_ids),
+            array("I", self.landmarks)
+        ] + [array("f", distances) for distances in self.landmark_distances]
+        with open(path, "wb") as f:
+            f.write(GRAPH_MAGIC)
+            f.write(struct.pack("<IIII", self.node_count, self.edge_count, len(self.landmarks), len(names_blob)))
+            for section in sections:
+                if sys.byteorder != "little":
+                    section.byteswap()
+                f.write(section.tobytes())
+            f.write(names_blob)
+
+    @classmethod
+    def read_binary(cls, path: str) -> "RoadGraph":
+        with open(path, "rb") as f:
+            if f.read(len(GRAPH_MAGIC)) != GRAPH_MAGIC:
+                raise ValueError(f"{path} is not a CrisisVision road graph")
+            nodes, edges, landmark_count, names_size = struct.unpack("<IIII", f.read(16))
+
+            def read(typecode: str, count: int) -> array:
+                values = array(typecode)
+                values.frombytes(f.read(values.itemsize * count))
+                if sys.byteorder != "little":
+                    values.byteswap()
+                return values
+
+            lats, lngs = read("d", nodes), read("d", nodes)
+            offsets, targets = read("I", nodes + 1), read("I", edges)
+            lengths, name_ids = read("f", edges), read("I", edges)
+            landmarks = read("I", landmark_count).tolist()
+            landmark_distances = [read("f", nodes) for _ in range(landmark_count)]
+            names = f.read(names_size).decode("utf-8").split("\n")
+        return cls(lats, lngs, offsets, targets, lengths, name_ids, names, landmarks, landmark_distances)
+
+    # ---------- precomputation ----------
+
+    def dijkstra(self, source: int) -> List[float]:
+        """Distances from source to every node over the full graph."""
+        distances = [math.inf] * self.node_count
+        distances[source] = 0.0
+        heap = [(0.0, source)]
+        offsets, targets, lengths = self.offsets, self.targets, self.lengths
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > distances[u]:
+                continue
+            for edge in range(offsets[u], offsets[u + 1]):
+                v = targets[edge]
+                nd = d + lengths[edge]
+                if nd < distances[v]:
+                    distances[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return distances
+
+    def select_landmarks(self, count: int) -> Tuple[List[int], List[List[float]]]:
+        """Farthest-point landmark selection: each new landmark maximizes its distance to the chosen ones."""
+        if self.node_count == 0 or count <= 0:
+            return [], []
+        landmarks: List[int] = []
+        tables: List[List[float]] = []
+        nearest = self.dijkstra(0)
+        for _ in range(min(count, self.node_count)):
+            candidate = max(range(self.node_count), key=lambda v: nearest[v] if nearest[v] < math.inf else -1.0)
+            if candidate in landmarks:
+                break
+            table = self.dijkstra(candidate)
+            landmarks.append(candidate)
+            tables.append(table)
+            nearest = table if len(landmarks) == 1 else [min(a, b) for a, b in zip(nearest, table)]
+        return landmarks, tables
+
+    def _build_snap_grid(self) -> None:
+        """Bucket nodes into ~100 m cells for nearest-node lookups."""
+        self._cell = 0.001
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        for v in range(self.node_count):
+            key = (int(math.floor(self.lats[v] / self._cell)), int(math.floor(self.lngs[v] / self._cell)))
+            self._grid.setdefault(key, []).append(v)
+
+    def nearest_node(self, lat: float, lng: float, max_rings: int = 50) -> Optional[int]:
+        row, col = int(math.floor(lat / self._cell)), int(math.floor(lng / self._cell))
+        best, best_distance = None, math.inf
+        for ring in range(max_rings + 1):
+            for r in range(row - ring, row + ring + 1):
+                for c in range(col - ring, col + ring + 1):
+                    if max(abs(r - row), abs(c - col)) != ring:
+                        continue
+                    for v in self._grid.get((r, c), ()):
+                        d = haversine_m(lat, lng, self.lats[v], self.lngs[v])
+                        if d < best_distance:
+                            best, best_distance = v, d
+            # Anything in the next ring is at least `ring` cells away
+            if best is not None and best_distance < ring * self._cell * 111_000 * math.cos(math.radians(lat)):
+                break
+        return best
+
+    # ---------- routing ----------
+
+    def _blocked_edge(self, u: int, v: int, name_id: int, blocked_names: set, hazards: List[Hazard]) -> bool:
+        if name_id in blocked_names:
+            return True
+        for hazard in hazards:
+            du = haversine_m(hazard.lat, hazard.lng, self.lats[u], self.lngs[u])
+            dv = haversine_m(hazard.lat, hazard.lng, self.lats[v], self.lngs[v])
+            if dv < hazard.radius_m:
+                # Inside the buffer only moving away from the center is allowed
+                if dv <= du:
+                    return True
+            elif du >= hazard.radius_m and self._segment_distance(hazard, u, v) < hazard.radius_m:
+                # Cuts through the buffer between two outside endpoints
+                return True
+        return False
+
+    def _segment_distance(self, hazard: Hazard, u: int, v: int) -> float:
+        """Closest approach of segment u-v to the hazard center (local equirectangular projection)."""
+        scale = math.cos(math.radians(hazard.lat)) * 111_320
+        ax, ay = (self.lngs[u] - hazard.lng) * scale, (self.lats[u] - hazard.lat) * 110_540
+        bx, by = (self.lngs[v] - hazard.lng) * scale, (self.lats[v] - hazard.lat) * 110_540
+        dx, dy = bx - ax, by - ay
+        span = dx * dx + dy * dy
+        t = 0.0 if span == 0 else max(0.0, min(1.0, -(ax * dx + ay * dy) / span))
+        return math.hypot(ax + t * dx, ay + t * dy)
+
+    def shortest_path(
+        self,
+        source: int,
+        target: int,
+        hazards: Optional[List[Hazard]] = None,
+        blocked_names: Iterable[str] = ()
+    ) -> Optional[Tuple[float, List[int]]]:
+        """A* with ALT bounds; returns (meters, node path) or None when unreachable."""
+        hazards = hazards or []
+        blocked_names = set(blocked_names)
+        blocked = {i for i, name in enumerate(self.names) if name in blocked_names}
+        lats, lngs = self.lats, self.lngs
+        offsets, targets, lengths, name_ids = self.offsets, self.targets, self.lengths, self.name_ids
+        # Only the landmarks giving the tightest bounds at the source are consulted per node
+        tables = sorted(
+            ((table, table[target]) for table in self.landmark_distances
+             if table[target] < math.inf and table[source] < math.inf),
+            key=lambda entry: abs(entry[1] - entry[0][source]),
+            reverse=True
+        )[:ACTIVE_LANDMARKS]
+        target_lat, target_lng = lats[target], lngs[target]
+        lng_scale = math.cos(math.radians(target_lat))
+        filtering = bool(blocked or hazards)
+
+        def heuristic(v: int) -> float:
+            # Straight line (slightly under-estimated) vs. landmark triangle bounds
+            dy = (lats[v] - target_lat) * 110_500
+            dx = (lngs[v] - target_lng) * 111_000 * lng_scale
+            bound = math.sqrt(dx * dx + dy * dy) * 0.995
+            for table, landmark_to_target in tables:
+                gap = landmark_to_target - table[v]
+                if gap < 0:
+                    gap = -gap
+                # Landmark tables are float32: shave the bound so rounding never overestimates
+                gap *= 0.99999
+                if gap > bound:
+                    bound = gap
+            return bound
+
+        best = {source: 0.0}
+        parent = {source: -1}
+        heap = [(heuristic(source), 0.0, source)]
+        closed = set()
+        while heap:
+            _, d, u = heapq.heappop(heap)
+            if u == target:
+                path = [u]
+                while parent[path[-1]] != -1:
+                    path.append(parent[path[-1]])
+                return d, path[::-1]
+            if u in closed:
+                continue
+            closed.add(u)
+            for edge in range(offsets[u], offsets[u + 1]):
+                v = targets[edge]
+                if v in closed:
+                    continue
+                nd = d + lengths[edge]
+                if nd >= best.get(v, math.inf):
+                    continue
+                if filtering and self._blocked_edge(u, v, name_ids[edge], blocked, hazards):
+                    continue
+                best[v] = nd
+                parent[v] = u
+                heapq.heappush(heap, (nd + heuristic(v), nd, v))
+        return None
+
+    def edge_name(self, u: int, v: int) -> str:
+        best_name, best_length = "", math.inf
+        for edge in range(self.offsets[u], self.offsets[u + 1]):
+            if self.targets[edge] == v and self.lengths[edge] < best_length:
+                best_name, best_length = self.names[self.name_ids[edge]], self.lengths[edge]
+        return best_name
+
+    def describe(self, path: List[int]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Collapse a node path into turn-point waypoints and walking steps (one
+        per street, with compass heading, turn direction and distance).
+        """
+        legs: List[Dict[str, Any]] = []
+        for u, v in zip(path, path[1:]):
+            name = self.edge_name(u, v)
+            length = haversine_m(self.lats[u], self.lngs[u], self.lats[v], self.lngs[v])
+            if legs and legs[-1]["name"] == name:
+                legs[-1]["end"] = v
+                legs[-1]["meters"] += length
+            else:
+                legs.append({"name": name, "start": u, "end": v, "meters": length})
+
+        waypoints, steps = [], []
+        previous_bearing = None
+        for index, leg in enumerate(legs):
+            start, end = leg["start"], leg["end"]
+            bearing = bearing_deg(self.lats[start], self.lngs[start], self.lats[end], self.lngs[end])
+            heading = COMPASS[int((bearing + 22.5) // 45) % 8]
+            if previous_bearing is None:
+                instruction = f"Head {heading} on {leg['name']}"
+            else:
+                turn = (bearing - previous_bearing + 540) % 360 - 180
+                if abs(turn) < 30:
+                    instruction = f"Continue {heading} onto {leg['name']}"
+                else:
+                    instruction = f"Turn {'right' if turn > 0 else 'left'} onto {leg['name']} heading {heading}"
+            previous_bearing = bearing
+            waypoints.append({"lat": round(self.lats[start], 6), "lng": round(self.lngs[start], 6), "name": leg["name"]})
+            steps.append({
+                "step": index + 1,
+                "instruction": instruction,
+                "distance_meters": round(leg["meters"]),
+                "time_minutes": round(leg["meters"] / WALKING_SPEED_MPS / 60, 1)
+            })
+        if path:
+            waypoints.append({"lat": round(self.lats[path[-1]], 6), "lng": round(self.lngs[path[-1]], 6), "name": "Destination"})
+        return waypoints, steps
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "nodes": self.node_count,
+            "edges": self.edge_count,
+            "streets": len(self.names),
+            "landmarks": len(self.landmarks)
+        }
@@ -1,11 +1,233 @@
 from fastapi import FastAPI, Query
-from typing import Literal, Dict, Any, List
+from functools import lru_cache
+from typing import Literal, Dict, Any, List, Optional, Tuple
+import os
+import sys
+import time
 import uvicorn
 
+# Shared helpers: the image copies common/ next to server.py; in a source
+# checkout it is mcp_servers/common, one directory up
+if not os.path.isdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), "common")):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.metrics import instrument
+from common.tracing import propagate
+from common.spatial import SpatialIndex, load_places, SHELTERS_FILE
+from routing import RoadGraph, Hazard, WALKING_SPEED_MPS, haversine_m
+from geocoder import Gazetteer, Place, GEOCODER_MIN_SCORE
+
 app = FastAPI(title="Maps MCP Server", version="1.0.0")
+instrument(app, "maps")
+propagate(app)
 
 EmergencyType = Literal["fire", "hurricane", "flood", "none"]
 
+# Road and footpath graph: an OSM extract (.osm) or a file from build_graph.py (.graph)
+MAPS_GRAPH_FILE = os.getenv(
+    "MAPS_GRAPH_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "campus.osm")
+)
+
+# Radius around a fire location that routes may not enter
+MAPS_FIRE_BUFFER_METERS = float(os.getenv("MAPS_FIRE_BUFFER_METERS", "100"))
+
+# Computed routes per (origin, destination, hazards); hazards change rarely
+MAPS_ROUTE_CACHE_SIZE = int(os.getenv("MAPS_ROUTE_CACHE_SIZE", "1024"))
+
+# Origins farther than this from the road graph keep the static routes
+MAPS_MAX_SNAP_METERS = float(os.getenv("MAPS_MAX_SNAP_METERS", "1000"))
+
+# Place names, aliases and coordinates for resolving the location parameter
+GAZETTEER_FILE = os.getenv(
+    "GAZETTEER_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer.json")
+)
+GEOCODER_CACHE_SIZE = int(os.getenv("GEOCODER_CACHE_SIZE", "4096"))
+
+# Where the location parameter points when it does not resolve
+DEFAULT_COORDS = {"lat": 37.3496, "lng": -121.9390}
+
+# Nearest usable safe zones returned (and routed to) per request
+MAPS_SAFE_ZONE_LIMIT = int(os.getenv("MAPS_SAFE_ZONE_LIMIT", "3"))
+
+SAFE_ZONES: Dict[str, List[Dict[str, Any]]] = {
+    "fire": [
+        {
+            "name": "Athletic Field Emergency Shelter",
+            "coordinates": {"lat": 37.3535, "lng": -121.9345},
+            "distance": "1000 meters",
+            "capacity": "500 people",
+            "status": "Open and accepting evacuees"
+        }
+    ],
+    "hurricane": [
+        {
+            "name": "Community Shelter - Leavey Center",
+            "coordinates": {"lat": 37.3505, "lng": -121.9385},
+            "elevation": "95 feet",
+            "capacity": "800 people",
+            "status": "Open"
+        }
+    ],
+    "flood": [
+        {
+            "name": "Higher Ground - Leavey Center Upper Floors",
+            "coordinates": {"lat": 37.3505, "lng": -121.9385},
+            "elevation": "120 feet",
+            "status": "Safe"
+        }
+    ],
+    "none": []
+}
+
+
+def build_safe_zone_indexes(places: List[Dict[str, Any]]) -> Dict[str, SpatialIndex]:
+    """Built-in safe zones plus catalogue shelters, one index per emergency type."""
+    indexes = {}
+    for emergency_type, zones in SAFE_ZONES.items():
+        index = SpatialIndex(zones)
+        for place in places:
+            if place.get("type", "shelter") in ("shelter", "safe_zone") and \
+                    emergency_type in place.get("emergency_types", SAFE_ZONES):
+                index.insert(place)
+        indexes[emergency_type] = index
+    return indexes
+
+
+safe_zone_indexes = build_safe_zone_indexes(load_places(SHELTERS_FILE))
+
+
+def nearest_safe_zones(emergency_type: str, origin: Dict[str, float]) -> List[Dict[str, Any]]:
+    """Open (or safe) zones with room left, nearest first; safe_zones[0] is the closest usable one."""
+    found = safe_zone_indexes[emergency_type].nearest(
+        origin["lat"], origin["lng"],
+        k=MAPS_SAFE_ZONE_LIMIT,
+        status=("open", "safe"),
+        min_capacity=1
+    )
+    return [{**zone, "distance_meters": round(meters)} for meters, zone in found]
+
+
+def load_road_graph(path: str) -> Optional[RoadGraph]:
+    if not os.path.exists(path):
+        print(f"⚠️  Road graph {path} not found, serving static evacuation routes")
+        return None
+    started = time.perf_counter()
+    graph = RoadGraph.load(path)
+    print(f"🗺️  Road graph loaded: {graph.stats()} in {(time.perf_counter() - started) * 1000:.0f}ms")
+    return graph
+
+
+road_graph = load_road_graph(MAPS_GRAPH_FILE)
+
+
+def load_gazetteer(path: str) -> Optional[Gazetteer]:
+    if not os.path.exists(path):
+        print(f"⚠️  Gazetteer {path} not found, locations will not be resolved")
+        return None
+    gazetteer = Gazetteer.load(path)
+    print(f"📖 Gazetteer loaded: {gazetteer.stats()}")
+    return gazetteer
+
+
+gazetteer = load_gazetteer(GAZETTEER_FILE)
+
+
+@lru_cache(maxsize=GEOCODER_CACHE_SIZE)
+def resolve_place(location: str) -> Optional[Place]:
+    """Canonical gazetteer place for a free-text location, or None."""
+    return gazetteer.resolve(location) if gazetteer is not None else None
+
+
+@lru_cache(maxsize=MAPS_ROUTE_CACHE_SIZE)
+def cached_route(
+    origin: Tuple[float, float],
+    destination: Tuple[float, float],
+    hazards: Tuple[tuple, ...],
+    blocked_roads: Tuple[str, ...]
+) -> Optional[Dict[str, Any]]:
+    """Shortest safe walking route between two points, or None if every route is cut off."""
+    source = road_graph.nearest_node(*origin)
+    target = road_graph.nearest_node(*destination)
+    if source is None or target is None:
+        return None
+    found = road_graph.shortest_path(source, target, [Hazard(*key) for key in hazards], blocked_roads)
+    if found is None:
+        return None
+    meters, path = found
+    # Off-graph legs from the origin to the first node and from the last node to the zone
+    meters += haversine_m(*origin, road_graph.lats[source], road_graph.lngs[source])
+    meters += haversine_m(road_graph.lats[target], road_graph.lngs[target], *destination)
+    waypoints, steps = road_graph.describe(path)
+    return {"meters": meters, "waypoints": waypoints, "steps": steps}
+
+
+@lru_cache(maxsize=MAPS_ROUTE_CACHE_SIZE)
+def snap_distance(lat: float, lng: float) -> float:
+    """Meters from a point to the nearest road graph node (inf when the graph is empty)."""
+    node = road_graph.nearest_node(lat, lng)
+    if node is None:
+        return float("inf")
+    return haversine_m(lat, lng, road_graph.lats[node], road_graph.lngs[node])
+
+
+def route_constraints(data: Dict[str, Any]) -> Tuple[Tuple[tuple, ...], Tuple[str, ...]]:
+    """Hazard circles and blocked street names from a location payload."""
+    hazards = []
+    fire = data.get("fire_location", {}).get("coordinates")
+    if fire:
+        hazards.append(Hazard(fire["lat"], fire["lng"], MAPS_FIRE_BUFFER_METERS, "fire").key())
+    blocked = []
+    for road in data.get("blocked_roads", []):
+        name = road.get("name") if isinstance(road, dict) else road.split(" - ")[0]
+        if name:
+            blocked.append(name)
+    return tuple(hazards), tuple(sorted(blocked))
+
+
+def plan_evacuation_routes(data: Dict[str, Any]) -> None:
+    """
+    Replace the static evacuation routes with computed walking routes from
+    current_location to every safe zone, shortest first. Shelter-in-place
+    entries (no waypoints) are kept ahead of them.
+    """
+    if road_graph is None or not data.get("safe_zones"):
+        return
+    origin = data["current_location"]["coordinates"]
+    if snap_distance(origin["lat"], origin["lng"]) > MAPS_MAX_SNAP_METERS:
+        return
+    hazards, blocked = route_constraints(data)
+    avoids = (["fire zone"] if hazards else []) + [name for name in blocked if name in road_graph.names]
+
+    routes = []
+    for zone in data["safe_zones"]:
+        destination = zone["coordinates"]
+        route = cached_route((origin["lat"], origin["lng"]), (destination["lat"], destination["lng"]), hazards, blocked)
+        if route is None:
+            routes.append({
+                "destination": zone["name"],
+                "status": "No safe route found - shelter in place and await responders"
+            })
+            continue
+        waypoints = [dict(point) for point in route["waypoints"]]
+        waypoints[-1]["name"] = zone["name"]
+        minutes = route["meters"] / WALKING_SPEED_MPS / 60
+        routes.append({
+            "destination": zone["name"],
+            "waypoints": waypoints,
+            "steps": route["steps"],
+            "distance_meters": round(route["meters"]),
+            "total_distance": f"{round(route['meters'])} meters",
+            "estimated_time": f"{max(1, round(minutes))} minutes walking",
+            "status": f"Clear - avoids {', '.join(avoids)}" if avoids else "Clear"
+        })
+
+    routes.sort(key=lambda route: route.get("distance_meters", float("inf")))
+    kept = [route for route in data.get("evacuation_routes", []) if "waypoints" not in route]
+    data["evacuation_routes"] = [
+        {"route_id": index, **route} for index, route in enumerate(kept + routes, start=1)
+    ]
+
 
 @app.get("/")
 def root():
@@ -16,21 +238,41 @@ def root():
     }
 
 
+@app.get("/geocode")
+def geocode(
+    q: str = Query(..., description="Free-text place name"),
+    limit: int = Query(5, ge=1, le=50, description="Maximum candidates")
+) -> Dict[str, Any]:
+    """
+    Resolve a place name against the gazetteer. `resolved` is the best
+    candidate when its score reaches GEOCODER_MIN_SCORE, else null.
+    """
+    if gazetteer is None:
+        return {"query": q, "resolved": None, "candidates": []}
+    candidates = [{**place.to_dict(), "score": score} for score, place in gazetteer.search(q, limit)]
+    resolved = candidates[0] if candidates and candidates[0]["score"] >= GEOCODER_MIN_SCORE else None
+    return {"query": q, "resolved": resolved, "candidates": candidates}
+
+
 @app.get("/location")
 def get_location_info(
     location: str = Query(..., description="Location to analyze"),
     emergency_type: EmergencyType = Query("none", description="Type of emergency")
 ) -> Dict[str, Any]:
     """
-    Returns location and navigation data based on emergency type.
+    Returns location and navigation data based on emergency type, with
+    evacuation routes computed over the road graph around active hazards.
+    The location is resolved against the gazetteer when it names a known place.
     """
     
-    base_coords = {"lat": 37.3496, "lng": -121.9390}
+    place = resolve_place(location)
+    base_coords = {"lat": place.lat, "lng": place.lng} if place else dict(DEFAULT_COORDS)
+    location_name = place.name if place else location
     
     if emergency_type == "fire":
-        return {
+        data = {
             "current_location": {
-                "name": "Santa Clara University Library",
+                "name": place.name if place else "Santa Clara University Library",
                 "coordinates": base_coords,
                 "address": "500 El Camino Real, Santa Clara, CA 95053"
             },
@@ -39,15 +281,7 @@ def get_location_info(
                 "distance": "75 meters",
                 "direction": "Southwest"
             },
-            "safe_zones": [
-                {
-                    "name": "Athletic Field Emergency Shelter",
-                    "coordinates": {"lat": 37.3535, "lng": -121.9345},
-                    "distance": "1000 meters",
-                    "capacity": "500 people",
-                    "status": "Open and accepting evacuees"
-                }
-            ],
+            "safe_zones": nearest_safe_zones(emergency_type, base_coords),
             "evacuation_routes": [
                 {
                     "route_id": 1,
@@ -92,9 +326,9 @@ def get_location_info(
         }
     
     elif emergency_type == "hurricane":
-        return {
+        data = {
             "current_location": {
-                "name": location,
+                "name": location_name,
                 "coordinates": base_coords,
                 "elevation": "82 feet above sea level"
             },
@@ -103,15 +337,7 @@ def get_location_info(
                 "distance": "25 miles",
                 "direction": "Moving northeast at 15 mph"
             },
-            "safe_zones": [
-                {
-                    "name": "Community Shelter - Leavey Center",
-                    "coordinates": {"lat": 37.3505, "lng": -121.9385},
-                    "elevation": "95 feet",
-                    "capacity": "800 people",
-                    "status": "Open"
-                }
-            ],
+            "safe_zones": nearest_safe_zones(emergency_type, base_coords),
             "evacuation_routes": [
                 {
                     "route_id": 1,
@@ -133,9 +359,9 @@ def get_location_info(
         }
     
     elif emergency_type == "flood":
-        return {
+        data = {
             "current_location": {
-                "name": location,
+                "name": location_name,
                 "coordinates": base_coords,
                 "elevation": "82 feet above sea level",
                 "flood_risk": "Moderate"
@@ -145,14 +371,7 @@ def get_location_info(
                 "rising_rate": "6 inches per hour",
                 "forecast": "Expected to crest at 16 feet in 2 hours"
             },
-            "safe_zones": [
-                {
-                    "name": "Higher Ground - Leavey Center Upper Floors",
-                    "coordinates": {"lat": 37.3505, "lng": -121.9385},
-                    "elevation": "120 feet",
-                    "status": "Safe"
-                }
-            ],
+            "safe_zones": nearest_safe_zones(emergency_type, base_coords),
             "evacuation_routes": [
                 {
                     "route_id": 1,
@@ -173,9 +392,9 @@ def get_location_info(
         }
     
     else:
-        return {
+        data = {
             "current_location": {
-                "name": location,
+                "name": location_name,
                 "coordinates": base_coords,
                 "address": "Santa Clara University, CA 95053"
             },
@@ -188,10 +407,23 @@ def get_location_info(
             "conditions": "Normal"
         }
 
+    if place:
+        data["current_location"]["location_id"] = place.id
+    plan_evacuation_routes(data)
+    return data
+
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "routing": road_graph.stats() if road_graph else None,
+        "route_cache": cached_route.cache_info()._asdict(),
+        "snap_cache": snap_distance.cache_info()._asdict(),
+        "gazetteer": gazetteer.stats() if gazetteer else None,
+        "geocode_cache": resolve_place.cache_info()._asdict(),
+        "spatial_index": {emergency_type: index.stats() for emergency_type, index in safe_zone_indexes.items()}
+    }
 
 
 if __name__ == "__main__":
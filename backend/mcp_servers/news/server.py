@@ -1,9 +1,20 @@
 from fastapi import FastAPI, Query
 from typing import Literal, Dict, Any, List
 from datetime import datetime, timedelta
+import os
+import sys
 import uvicorn
 
+# Shared helpers: the image copies common/ next to server.py; in a source
+# checkout it is mcp_servers/common, one directory up
+if not os.path.isdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), "common")):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.metrics import instrument
+from common.tracing import propagate
+
 app = FastAPI(title="News MCP Server", version="1.0.0")
+instrument(app, "news")
+propagate(app)
 
 EmergencyType = Literal["fire", "hurricane", "flood", "none"]
 
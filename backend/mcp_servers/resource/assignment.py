@@ -0,0 +1,192 @@
+"""
+Capacity-aware assignment of evacuees to shelters.
+
+Given evacuee groups (an origin point and a head count) and shelters with
+remaining capacity, find the assignment that places as many people as the
+capacity allows with the least total travel distance. Each group may only
+use its own candidate shelters (its nearest few), which keeps the cost
+matrix sparse whatever the size of the shelter catalogue.
+
+This is a min-cost flow problem (groups -> shelters -> sink) solved exactly
+by successive shortest paths. Groups are added one at a time and each is
+routed along the cheapest augmenting path: straight to a shelter with room,
+or to a full one while a chain of already placed people moves on to
+shelters they reach almost as cheaply. The residual graph is contracted to
+the shelters: the edge a -> b costs the cheapest move of anyone placed at
+a over to b, kept in a lazily cleaned heap per shelter pair. Dijkstra runs
+on reduced costs with shelter potentials, so a path search touches the
+shelters near the group, not the people already placed, and while there is
+slack it settles one shelter and stops.
+
+Groups are placed in the order given, so when demand exceeds capacity the
+people left unassigned are the last ones in the batch.
+"""
+
+import heapq
+import math
+from typing import Dict, List, Sequence, Tuple
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = EARTH_RADIUS_M * math.pi / 180
+
+
+def cost_rows(
+    origins: Sequence[Tuple[float, float]],
+    shelters: Sequence[Tuple[float, float]],
+    candidates: Sequence[Sequence[int]]
+) -> List[Dict[int, float]]:
+    """
+    Meters from each origin to each of its candidate shelters.
+
+    Distances use an equirectangular projection around the batch's mean
+    latitude: within a city it agrees with the great-circle distance to a
+    fraction of a percent and costs one hypot per pair.
+    """
+    if not origins:
+        return []
+    scale = math.cos(math.radians(sum(lat for lat, _ in origins) / len(origins))) * METERS_PER_DEGREE
+    projected = [(lng * scale, lat * METERS_PER_DEGREE) for lat, lng in shelters]
+    hypot = math.hypot
+    rows = []
+    for (lat, lng), options in zip(origins, candidates):
+        x, y = lng * scale, lat * METERS_PER_DEGREE
+        rows.append({s: hypot(projected[s][0] - x, projected[s][1] - y) for s in options})
+    return rows
+
+
+def solve(
+    rows: Sequence[Dict[int, float]],
+    demand: Sequence[int],
+    capacity: Sequence[float]
+) -> List[Dict[int, int]]:
+    """
+    Min-cost placement of demand[g] people from group g, whose costs to its
+    candidate shelters are rows[g], into shelters holding capacity[s] more
+    (math.inf for unlimited). Returns {shelter: people} per group; groups
+    that could not be fully placed have fewer people in their dict than
+    they asked for.
+    """
+    count = len(capacity)
+    sink = count
+    spare = list(capacity)
+    free = sum(spare)
+    potential = [0.0] * (count + 1)
+    flow: List[Dict[int, int]] = [{} for _ in rows]
+    # moves[a][b]: heap of (cost[x][b] - cost[x][a], x) over groups x placed at a;
+    # entries whose group has since left a are dropped when they reach the top.
+    # Groups newly placed at a wait in arrivals[a] until a search leaves a.
+    moves: List[Dict[int, list]] = [{} for _ in range(count)]
+    arrivals: List[List[int]] = [[] for _ in range(count)]
+
+    def place(group: int, shelter: int, people: int) -> None:
+        placed = flow[group]
+        if shelter in placed:
+            placed[shelter] += people
+        else:
+            placed[shelter] = people
+            arrivals[shelter].append(group)
+
+    def edges_from(a: int) -> Dict[int, list]:
+        edges = moves[a]
+        if arrivals[a]:
+            added: Dict[int, list] = {}
+            for group in arrivals[a]:
+                if a not in flow[group]:
+                    continue
+                row = rows[group]
+                here = row[a]
+                for other, cost in row.items():
+                    if other != a:
+                        added.setdefault(other, []).append((cost - here, group))
+            arrivals[a] = []
+            for b, entries in added.items():
+                heap = edges.get(b)
+                if heap is None:
+                    heapq.heapify(entries)
+                    edges[b] = entries
+                elif len(entries) * 4 > len(heap):
+                    heap.extend(entries)
+                    heapq.heapify(heap)
+                else:
+                    for entry in entries:
+                        heapq.heappush(heap, entry)
+        return edges
+
+    def cheapest_move(a: int, heap: list):
+        while heap and a not in flow[heap[0][1]]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    inf = math.inf
+    for group, row in enumerate(rows):
+        remaining = demand[group]
+        while remaining > 0 and free > 0:
+            # Dijkstra over shelters (+ sink) on reduced costs, from this group
+            dist = [inf] * (count + 1)
+            for shelter, cost in row.items():
+                dist[shelter] = cost - potential[shelter]
+            frontier = list(dist)
+            previous = [-1] * (count + 1)
+            mover = [-1] * (count + 1)
+            settled = []
+            while True:
+                best = min(frontier)
+                if best == inf:
+                    break
+                u = frontier.index(best)
+                frontier[u] = inf
+                settled.append(u)
+                if u == sink:
+                    break
+                if spare[u] > 0:
+                    reach = best + potential[u] - potential[sink]
+                    if reach < dist[sink]:
+                        dist[sink] = frontier[sink] = reach
+                        previous[sink] = u
+                    if reach <= best:
+                        # Reduced costs are non-negative: nothing beats the sink now
+                        settled.append(sink)
+                        break
+                base = best + potential[u]
+                for b, heap in edges_from(u).items():
+                    if frontier[b] == inf and dist[b] != inf:
+                        continue  # settled
+                    top = cheapest_move(u, heap)
+                    if top is None:
+                        continue
+                    candidate = base + top[0] - potential[b]
+                    if candidate < dist[b]:
+                        dist[b] = frontier[b] = candidate
+                        previous[b] = u
+                        mover[b] = top[1]
+            if sink not in settled:
+                break  # no shelter with room is reachable from this group
+
+            # Keep reduced costs non-negative for the next search
+            reach = dist[sink]
+            for v in settled:
+                if dist[v] < reach:
+                    potential[v] += dist[v] - reach
+
+            # Walk the path back from the sink: moves between shelters, then the entry shelter
+            target = previous[sink]
+            path = []
+            amount = min(remaining, spare[target])
+            b = target
+            while previous[b] != -1:
+                a, x = previous[b], mover[b]
+                path.append((a, b, x))
+                amount = min(amount, flow[x][a])
+                b = a
+            entry, amount = b, int(amount)
+
+            spare[target] -= amount
+            free -= amount
+            for a, b, x in path:
+                flow[x][a] -= amount
+                if not flow[x][a]:
+                    del flow[x][a]
+                place(x, b, amount)
+            place(group, entry, amount)
+            remaining -= amount
+    return flow
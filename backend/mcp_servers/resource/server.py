@@ -1,11 +1,357 @@
-from fastapi import FastAPI, Query
-from typing import Literal, Dict, Any, List
+from fastapi import FastAPI, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import Literal, Dict, Any, List, Optional, Tuple, Callable
+import heapq
+import math
+import os
+import sys
+import threading
+import time
 import uvicorn
 
+# Shared helpers: the image copies common/ next to server.py; in a source
+# checkout it is mcp_servers/common, one directory up
+if not os.path.isdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), "common")):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.metrics import instrument
+from common.tracing import propagate
+from common.spatial import SpatialIndex, load_places, remaining_capacity, add_occupancy, SHELTERS_FILE
+from assignment import cost_rows, solve, METERS_PER_DEGREE
+
 app = FastAPI(title="Resource MCP Server", version="1.0.0")
+instrument(app, "resource")
+propagate(app)
 
 EmergencyType = Literal["fire", "hurricane", "flood", "none"]
 
+# Reference point for the shelters listed in /resources (the campus library)
+ORIGIN = {"lat": 37.3496, "lng": -121.9390}
+
+# Nearest open shelters with room left returned per request
+RESOURCE_SHELTER_LIMIT = int(os.getenv("RESOURCE_SHELTER_LIMIT", "5"))
+
+# POST /assign: nearest shelters each evacuee may be sent to, and maximum
+# evacuee entries per call
+RESOURCE_ASSIGN_CANDIDATES = int(os.getenv("RESOURCE_ASSIGN_CANDIDATES", "8"))
+RESOURCE_ASSIGN_MAX_EVACUEES = int(os.getenv("RESOURCE_ASSIGN_MAX_EVACUEES", "20000"))
+
+SHELTERS: Dict[str, List[Dict[str, Any]]] = {
+    "fire": [
+        {
+            "name": "Athletic Field Emergency Shelter",
+            "address": "Santa Clara University Athletic Complex",
+            "coordinates": {"lat": 37.3535, "lng": -121.9345},
+            "capacity": 500,
+            "current_occupancy": 142,
+            "status": "Open",
+            "amenities": [
+                "Water",
+                "First aid",
+                "Medical personnel on site",
+                "Communication center"
+            ],
+            "accessibility": "Wheelchair accessible",
+            "contact": "(408) 555-0100"
+        },
+        {
+            "name": "Leavey Activities Center",
+            "address": "500 El Camino Real, Santa Clara",
+            "coordinates": {"lat": 37.3505, "lng": -121.9385},
+            "capacity": 800,
+            "current_occupancy": 56,
+            "status": "Open",
+            "amenities": [
+                "Water",
+                "Food",
+                "Restrooms",
+                "Phone charging stations"
+            ],
+            "accessibility": "Wheelchair accessible",
+            "contact": "(408) 555-0200"
+        }
+    ],
+    "hurricane": [
+        {
+            "name": "Leavey Center Hurricane Shelter",
+            "address": "500 El Camino Real",
+            "coordinates": {"lat": 37.3505, "lng": -121.9385},
+            "capacity": 800,
+            "current_occupancy": 423,
+            "status": "Open",
+            "amenities": [
+                "Generator power",
+                "Water",
+                "Food",
+                "Medical staff",
+                "Communications"
+            ],
+            "storm_rated": True,
+            "contact": "(408) 555-0200"
+        }
+    ],
+    "flood": [
+        {
+            "name": "Leavey Center (Upper Floors)",
+            "address": "500 El Camino Real",
+            "coordinates": {"lat": 37.3505, "lng": -121.9385},
+            "elevation": "120 feet (above flood level)",
+            "capacity": 600,
+            "status": "Open",
+            "floor": "2nd and 3rd floors only"
+        }
+    ],
+    "none": []
+}
+
+
+def build_indexes(places: List[Dict[str, Any]]) -> Dict[str, SpatialIndex]:
+    """
+    One index per emergency type: its built-in shelters plus every catalogue
+    place (shelters, hospitals, fire stations...) whose `emergency_types`
+    includes it (all types when absent).
+    """
+    indexes = {}
+    for emergency_type, shelters in SHELTERS.items():
+        index = SpatialIndex(shelters)
+        for place in places:
+            if emergency_type in place.get("emergency_types", SHELTERS):
+                index.insert(place)
+        indexes[emergency_type] = index
+    return indexes
+
+
+place_indexes = build_indexes(load_places(SHELTERS_FILE))
+
+
+def with_distance(meters: float, place: Dict[str, Any]) -> Dict[str, Any]:
+    result = {**place, "distance_meters": round(meters)}
+    available = remaining_capacity(place)
+    if available != float("inf"):
+        result["available_capacity"] = available
+    return result
+
+
+def nearest_shelters(emergency_type: str) -> List[Dict[str, Any]]:
+    """Open shelters with room left, nearest to ORIGIN first."""
+    found = place_indexes[emergency_type].nearest(
+        ORIGIN["lat"], ORIGIN["lng"],
+        k=RESOURCE_SHELTER_LIMIT,
+        status="open",
+        min_capacity=1,
+        predicate=lambda place: place.get("type", "shelter") == "shelter"
+    )
+    return [with_distance(meters, place) for meters, place in found]
+
+
+class Evacuee(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lng: float = Field(..., ge=-180, le=180)
+    count: int = Field(1, ge=1, description="People at this point")
+
+
+class AssignmentRequest(BaseModel):
+    evacuees: List[Evacuee]
+    emergency_type: EmergencyType = "none"
+    shelters: Optional[List[str]] = None
+    commit: bool = True
+
+
+# Held from reading remaining capacity to recording the new occupancy, so
+# concurrent batches never hand out the same places
+assignment_lock = threading.Lock()
+assignment_stats = {"batches": 0, "assigned": 0, "unassigned": 0}
+
+
+def open_shelters(
+    index: SpatialIndex,
+    lat: float,
+    lng: float,
+    predicate: Callable[[Dict[str, Any]], bool],
+    k: int,
+    max_distance_m: float = math.inf
+) -> List[Dict[str, Any]]:
+    return [place for _, place in index.nearest(lat, lng, k=k, max_distance_m=max_distance_m,
+                                                status="open", min_capacity=1, predicate=predicate)]
+
+
+def candidate_shelters(
+    index: SpatialIndex,
+    origins: List[Tuple[float, float]],
+    predicate: Callable[[Dict[str, Any]], bool]
+) -> Tuple[List[Dict[str, Any]], List[List[int]], bool]:
+    """
+    Open shelters with room that the origins may be sent to, per origin the
+    positions of its candidates, and whether candidates were restricted.
+
+    With at most RESOURCE_ASSIGN_CANDIDATES such shelters every origin may
+    use all of them. Otherwise each grid cell of origins gets every shelter
+    that can be among the nearest RESOURCE_ASSIGN_CANDIDATES of a point in
+    the cell (those within the cell center's k-th distance plus the cell
+    diagonal); assign_evacuees trims each origin to its own nearest.
+    """
+    k = RESOURCE_ASSIGN_CANDIDATES
+    lat = sum(origin[0] for origin in origins) / len(origins)
+    lng = sum(origin[1] for origin in origins) / len(origins)
+    near = open_shelters(index, lat, lng, predicate, k + 1)
+    if len(near) <= k:
+        everyone = list(range(len(near)))
+        return near, [everyone] * len(origins), False
+
+    # Any point of a cell is within half its diagonal of the center
+    diagonal_m = index.cell * METERS_PER_DEGREE * math.sqrt(2)
+    places: List[Dict[str, Any]] = []
+    positions: Dict[int, int] = {}
+    by_cell: Dict[Tuple[int, int], List[int]] = {}
+    candidates = []
+    for origin_lat, origin_lng in origins:
+        cell = (int(origin_lat // index.cell), int(origin_lng // index.cell))
+        options = by_cell.get(cell)
+        if options is None:
+            center_lat, center_lng = (cell[0] + 0.5) * index.cell, (cell[1] + 0.5) * index.cell
+            nearest = index.nearest(center_lat, center_lng, k=k,
+                                    status="open", min_capacity=1, predicate=predicate)
+            options = []
+            for place in open_shelters(index, center_lat, center_lng, predicate, len(index),
+                                       max_distance_m=nearest[-1][0] + diagonal_m):
+                position = positions.get(id(place))
+                if position is None:
+                    position = positions[id(place)] = len(places)
+                    places.append(place)
+                options.append(position)
+            by_cell[cell] = options
+        candidates.append(options)
+    return places, candidates, True
+
+
+def assign_evacuees(request: AssignmentRequest) -> Dict[str, Any]:
+    """
+    Assignment of the evacuees to open shelters within remaining capacity;
+    see assignment.py. The total distance is minimal when there are at most
+    RESOURCE_ASSIGN_CANDIDATES shelters. With more, each evacuee is first
+    matched among its own nearest RESOURCE_ASSIGN_CANDIDATES (minimal within
+    those), and anyone they cannot hold is then placed in whichever shelters
+    still have room, so the result approximates the global minimum. With
+    commit, the assigned people are added to the shelters' current_occupancy.
+    """
+    names = set(request.shelters) if request.shelters is not None else None
+
+    def predicate(place: Dict[str, Any]) -> bool:
+        return place.get("type", "shelter") == "shelter" and (names is None or place.get("name") in names)
+
+    # People at the same point form one group
+    group_of: Dict[Tuple[float, float], int] = {}
+    members: List[List[int]] = []
+    demand: List[int] = []
+    for position, evacuee in enumerate(request.evacuees):
+        point = (evacuee.lat, evacuee.lng)
+        group = group_of.get(point)
+        if group is None:
+            group = group_of[point] = len(demand)
+            members.append([])
+            demand.append(0)
+        members[group].append(position)
+        demand[group] += evacuee.count
+    origins = list(group_of)
+
+    started = time.perf_counter()
+    index = place_indexes[request.emergency_type]
+    with assignment_lock:
+        if origins:
+            places, candidates, restricted = candidate_shelters(index, origins, predicate)
+        else:
+            places, candidates, restricted = [], [], False
+        capacity = [remaining_capacity(place) for place in places]
+        points = [(place["coordinates"]["lat"], place["coordinates"]["lng"]) for place in places]
+        rows = cost_rows(origins, points, candidates)
+        if restricted:
+            rows = [row if len(row) <= RESOURCE_ASSIGN_CANDIDATES else
+                    dict(heapq.nsmallest(RESOURCE_ASSIGN_CANDIDATES, row.items(), key=lambda item: item[1]))
+                    for row in rows]
+        flow = solve(rows, demand, capacity)
+        assigned = [0] * len(places)
+        for placed in flow:
+            for shelter, people in placed.items():
+                assigned[shelter] += people
+
+        short = [group for group, placed in enumerate(flow) if sum(placed.values()) < demand[group]]
+        if short and restricted:
+            # Their nearest shelters are full: place the rest in any shelter with room left
+            positions = {id(place): position for position, place in enumerate(places)}
+            for place in open_shelters(index, *origins[short[0]], predicate, len(index)):
+                if id(place) not in positions:
+                    positions[id(place)] = len(places)
+                    places.append(place)
+                    capacity.append(remaining_capacity(place))
+                    points.append((place["coordinates"]["lat"], place["coordinates"]["lng"]))
+                    assigned.append(0)
+            spare = [room - people for room, people in zip(capacity, assigned)]
+            with_room = [position for position, room in enumerate(spare) if room > 0]
+            if with_room:
+                extra_rows = cost_rows([origins[group] for group in short], points, [with_room] * len(short))
+                leftover = [demand[group] - sum(flow[group].values()) for group in short]
+                for group, row, placed in zip(short, extra_rows, solve(extra_rows, leftover, spare)):
+                    rows[group].update(row)
+                    for shelter, people in placed.items():
+                        flow[group][shelter] = flow[group].get(shelter, 0) + people
+                        assigned[shelter] += people
+
+        if request.commit:
+            for place, people in zip(places, assigned):
+                if people:
+                    add_occupancy(place, people)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    # Split each group's placements across its evacuee entries, nearest shelter first
+    assignments = []
+    total_meters = 0.0
+    for group, positions in enumerate(members):
+        parts = sorted(flow[group].items(), key=lambda part: rows[group][part[0]])
+        for position in positions:
+            wanted = request.evacuees[position].count
+            while wanted and parts:
+                shelter, people = parts[0]
+                taken = min(wanted, people)
+                meters = rows[group][shelter]
+                assignments.append({
+                    "evacuee": position,
+                    "shelter": places[shelter]["name"],
+                    "count": taken,
+                    "distance_meters": round(meters)
+                })
+                total_meters += meters * taken
+                wanted -= taken
+                if taken == people:
+                    parts.pop(0)
+                else:
+                    parts[0] = (shelter, people - taken)
+            if wanted:
+                assignments.append({"evacuee": position, "shelter": None, "count": wanted})
+
+    people = sum(demand)
+    placed_people = sum(assigned)
+    assignment_stats["batches"] += 1
+    assignment_stats["assigned"] += placed_people
+    assignment_stats["unassigned"] += people - placed_people
+    shelters = []
+    for place, people_assigned, room in zip(places, assigned, capacity):
+        if not people_assigned:
+            continue
+        summary = {"name": place["name"], "assigned": people_assigned}
+        if room != float("inf"):
+            summary["available_capacity"] = room - people_assigned
+        shelters.append(summary)
+    return {
+        "emergency_type": request.emergency_type,
+        "committed": request.commit,
+        "evacuees": people,
+        "assigned": placed_people,
+        "unassigned": people - placed_people,
+        "total_distance_meters": round(total_meters),
+        "shelters": shelters,
+        "assignments": assignments,
+        "solve_ms": round(elapsed_ms, 1)
+    }
+
 
 @app.get("/")
 def root():
@@ -49,40 +395,7 @@ def get_resources(
                     "contact": "911"
                 }
             },
-            "shelters": [
-                {
-                    "name": "Athletic Field Emergency Shelter",
-                    "address": "Santa Clara University Athletic Complex",
-                    "coordinates": {"lat": 37.3535, "lng": -121.9345},
-                    "capacity": 500,
-                    "current_occupancy": 142,
-                    "status": "Open",
-                    "amenities": [
-                        "Water",
-                        "First aid",
-                        "Medical personnel on site",
-                        "Communication center"
-                    ],
-                    "accessibility": "Wheelchair accessible",
-                    "contact": "(408) 555-0100"
-                },
-                {
-                    "name": "Leavey Activities Center",
-                    "address": "500 El Camino Real, Santa Clara",
-                    "coordinates": {"lat": 37.3505, "lng": -121.9385},
-                    "capacity": 800,
-                    "current_occupancy": 56,
-                    "status": "Open",
-                    "amenities": [
-                        "Water",
-                        "Food",
-                        "Restrooms",
-                        "Phone charging stations"
-                    ],
-                    "accessibility": "Wheelchair accessible",
-                    "contact": "(408) 555-0200"
-                }
-            ],
+            "shelters": nearest_shelters(emergency_type),
             "medical_facilities": [
                 {
                     "name": "Kaiser Santa Clara Medical Center",
@@ -136,25 +449,7 @@ def get_resources(
                     "units_available": 12
                 }
             },
-            "shelters": [
-                {
-                    "name": "Leavey Center Hurricane Shelter",
-                    "address": "500 El Camino Real",
-                    "coordinates": {"lat": 37.3505, "lng": -121.9385},
-                    "capacity": 800,
-                    "current_occupancy": 423,
-                    "status": "Open",
-                    "amenities": [
-                        "Generator power",
-                        "Water",
-                        "Food",
-                        "Medical staff",
-                        "Communications"
-                    ],
-                    "storm_rated": True,
-                    "contact": "(408) 555-0200"
-                }
-            ],
+            "shelters": nearest_shelters(emergency_type),
             "supplies": {
                 "water": "72-hour supply secured",
                 "food": "MREs available for 1000 people",
@@ -182,17 +477,7 @@ def get_resources(
                     "pickup_points": ["Leavey Center", "Benson Center"]
                 }
             },
-            "shelters": [
-                {
-                    "name": "Leavey Center (Upper Floors)",
-                    "address": "500 El Camino Real",
-                    "coordinates": {"lat": 37.3505, "lng": -121.9385},
-                    "elevation": "120 feet (above flood level)",
-                    "capacity": 600,
-                    "status": "Open",
-                    "floor": "2nd and 3rd floors only"
-                }
-            ],
+            "shelters": nearest_shelters(emergency_type),
             "supplies": {
                 "drinking_water": "Emergency supply at upper floor shelters",
                 "sandbags": "Distributed at key locations",
@@ -240,9 +525,62 @@ def get_resources(
         }
 
 
+@app.get("/nearby")
+def get_nearby(
+    lat: float = Query(..., description="Latitude"),
+    lng: float = Query(..., description="Longitude"),
+    emergency_type: EmergencyType = Query("none", description="Type of emergency"),
+    place_type: Optional[str] = Query(None, description="shelter, hospital, fire_station..."),
+    k: int = Query(5, ge=1, le=100, description="Maximum results"),
+    radius_m: Optional[float] = Query(None, gt=0, description="Only places within this distance"),
+    status: Optional[str] = Query("open", description="Status prefix to match (empty for any)"),
+    min_capacity: int = Query(0, ge=0, description="Minimum remaining capacity")
+) -> Dict[str, Any]:
+    """
+    Places nearest to a point, filtered on type, status and remaining
+    capacity (capacity - current_occupancy), sorted by distance.
+    """
+    index = place_indexes[emergency_type]
+    predicate = (lambda place: place.get("type", "shelter") == place_type) if place_type else None
+    status = status or None
+    if radius_m is None:
+        found = index.nearest(lat, lng, k=k, status=status, min_capacity=min_capacity, predicate=predicate)
+    else:
+        found = index.within(lat, lng, radius_m, status=status, min_capacity=min_capacity, predicate=predicate)[:k]
+    results = [with_distance(meters, place) for meters, place in found]
+    return {"count": len(results), "results": results}
+
+
+@app.post("/assign")
+def assign(request: AssignmentRequest) -> Dict[str, Any]:
+    """
+    Assign a batch of evacuees ({lat, lng, count}) to open shelters
+    (optionally only those named in `shelters`) without exceeding any
+    shelter's capacity, keeping total travel distance low. The distance is
+    minimal with up to RESOURCE_ASSIGN_CANDIDATES shelters. With more, it
+    is minimal within each evacuee's nearest RESOURCE_ASSIGN_CANDIDATES,
+    with overflow sent to any shelter that still has room, which
+    approximates the global minimum. A group at one point may be split. Only
+    when every shelter is full are people (the last entries of the batch)
+    returned with shelter null.
+    With commit (default) the assignments are recorded in the shelters'
+    occupancy atomically.
+    """
+    if len(request.evacuees) > RESOURCE_ASSIGN_MAX_EVACUEES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(request.evacuees)} evacuees exceeds RESOURCE_ASSIGN_MAX_EVACUEES={RESOURCE_ASSIGN_MAX_EVACUEES}"
+        )
+    return assign_evacuees(request)
+
+
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "spatial_index": {emergency_type: index.stats() for emergency_type, index in place_indexes.items()},
+        "assignments": dict(assignment_stats)
+    }
 
 
 if __name__ == "__main__":
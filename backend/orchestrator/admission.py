@@ -0,0 +1,210 @@
+"""
+Priority-aware admission control in front of the LLM model slots.
+
+Every generation declares a priority class before it takes one of its model's
+concurrency slots:
+
+- critical: stage 2 for a confirmed emergency (the evacuation plan)
+- high:     stage 1 for a report that declares an emergency type
+- normal:   stage 1 for an undeclared report (emergency_type "none")
+- low:      stage 2 for a false-alarm assessment
+
+Freed slots go to the oldest waiter of the most urgent class. The last
+ADMISSION_RESERVED_SLOTS slots of each model are only usable by critical and
+high work, so a saturated queue of assessments can never occupy every slot.
+
+Each class has a bounded queue and a maximum wait. Work that would exceed
+either is shed with a 503 and a Retry-After estimated from recent slot hold
+times, and shedding is decided on arrival whenever the expected wait is
+already past the class limit, so overloaded callers fail fast instead of
+timing out. Confirmed emergencies keep their latency while false-alarm
+assessments absorb the overload.
+"""
+
+import asyncio
+import contextvars
+import math
+import os
+from collections import deque
+from typing import Dict, Any, Optional
+from fastapi import HTTPException
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() == "true"
+
+# Slots per model kept free for critical and high priority generations
+ADMISSION_RESERVED_SLOTS = int(os.getenv("ADMISSION_RESERVED_SLOTS", "1"))
+
+CRITICAL = 0
+HIGH = 1
+NORMAL = 2
+LOW = 3
+PRIORITY_NAMES = ("critical", "high", "normal", "low")
+
+# Per-class queue depth and maximum wait in seconds,
+# e.g. ADMISSION_LOW_QUEUE=8, ADMISSION_LOW_MAX_WAIT=2
+DEFAULT_QUEUE_LIMITS = (256, 128, 64, 16)
+DEFAULT_MAX_WAITS = (60.0, 30.0, 10.0, 5.0)
+QUEUE_LIMITS = tuple(
+    int(os.getenv(f"ADMISSION_{name.upper()}_QUEUE", str(default)))
+    for name, default in zip(PRIORITY_NAMES, DEFAULT_QUEUE_LIMITS)
+)
+MAX_WAITS = tuple(
+    float(os.getenv(f"ADMISSION_{name.upper()}_MAX_WAIT", str(default)))
+    for name, default in zip(PRIORITY_NAMES, DEFAULT_MAX_WAITS)
+)
+
+# Smoothing for the per-model slot hold time behind Retry-After estimates
+HOLD_TIME_ALPHA = 0.2
+
+# Priority of the generation the current task is about to start
+llm_priority = contextvars.ContextVar("llm_priority", default=NORMAL)
+
+
+def priority_for(emergency_type: str, is_emergency: Optional[bool] = None) -> int:
+    """
+    Priority class from the declared emergency type and, once stage 1 has
+    run, its outcome.
+    """
+    if is_emergency is True:
+        return CRITICAL
+    if is_emergency is False:
+        return LOW
+    return NORMAL if emergency_type == "none" else HIGH
+
+
+class PriorityGate:
+    """
+    Concurrency slots for one model, granted strictly by priority class and
+    FIFO within a class.
+    """
+
+    def __init__(self, name: str, limit: int, enforce: bool):
+        self.name = name
+        self.limit = limit
+        self.enforce = enforce
+        self.reserved = min(ADMISSION_RESERVED_SLOTS, limit - 1) if enforce else 0
+        self.in_flight = 0
+        self.hold_time: Optional[float] = None
+        self._queues = [deque() for _ in PRIORITY_NAMES]
+        self.admitted = [0] * len(PRIORITY_NAMES)
+        self.shed = {name: {"queue_full": 0, "overloaded": 0, "timeout": 0} for name in PRIORITY_NAMES}
+
+    def capacity_for(self, priority: int) -> int:
+        return self.limit if priority <= HIGH else self.limit - self.reserved
+
+    def queued_ahead(self, priority: int) -> int:
+        return sum(len(queue) for queue in self._queues[:priority + 1])
+
+    def estimated_wait(self, priority: int) -> Optional[float]:
+        """Seconds until a new waiter of this class would get a slot, once hold times are known."""
+        if self.hold_time is None:
+            return None
+        return self.hold_time * (self.queued_ahead(priority) + 1) / self.capacity_for(priority)
+
+    def retry_after(self, priority: int) -> int:
+        estimate = self.estimated_wait(priority)
+        return max(1, math.ceil(estimate if estimate is not None else MAX_WAITS[priority]))
+
+    def reject(self, priority: int, reason: str) -> HTTPException:
+        self.shed[PRIORITY_NAMES[priority]][reason] += 1
+        return HTTPException(
+            status_code=503,
+            detail=f"Shed {PRIORITY_NAMES[priority]}-priority {self.name} generation ({reason}); retry later",
+            headers={"Retry-After": str(self.retry_after(priority))}
+        )
+
+    async def acquire(self, priority: int) -> None:
+        if not self.enforce:
+            priority = NORMAL
+
+        if self.queued_ahead(priority) == 0 and self.in_flight < self.capacity_for(priority):
+            self.in_flight += 1
+            self.admitted[priority] += 1
+            return
+
+        max_wait = None
+        if self.enforce:
+            if len(self._queues[priority]) >= QUEUE_LIMITS[priority]:
+                raise self.reject(priority, "queue_full")
+            estimate = self.estimated_wait(priority)
+            if estimate is not None and estimate > MAX_WAITS[priority]:
+                raise self.reject(priority, "overloaded")
+            max_wait = MAX_WAITS[priority]
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[priority].append(waiter)
+        try:
+            done, _ = await asyncio.wait({waiter}, timeout=max_wait)
+        except asyncio.CancelledError:
+            self._abandon(priority, waiter)
+            raise
+        if not done:
+            self._abandon(priority, waiter)
+            raise self.reject(priority, "timeout")
+        self.admitted[priority] += 1
+
+    def _abandon(self, priority: int, waiter: asyncio.Future) -> None:
+        if waiter.done():
+            # Granted while we were being cancelled: hand the slot on
+            self.in_flight -= 1
+            self._dispatch()
+        else:
+            self._queues[priority].remove(waiter)
+            waiter.cancel()
+
+    def release(self, held_for: float) -> None:
+        self.in_flight -= 1
+        if self.hold_time is None:
+            self.hold_time = held_for
+        else:
+            self.hold_time += HOLD_TIME_ALPHA * (held_for - self.hold_time)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        for priority, queue in enumerate(self._queues):
+            # Lower classes have no more capacity than this one, so stop at
+            # the first class that has waiters but cannot start
+            while queue:
+                if self.in_flight >= self.capacity_for(priority):
+                    return
+                self.in_flight += 1
+                queue.popleft().set_result(None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "reserved": self.reserved,
+            "in_flight": self.in_flight,
+            "hold_time_ms": round(self.hold_time * 1000, 1) if self.hold_time is not None else None,
+            "queued": {name: len(queue) for name, queue in zip(PRIORITY_NAMES, self._queues)},
+            "admitted": dict(zip(PRIORITY_NAMES, self.admitted)),
+            "shed": self.shed
+        }
+
+
+class AdmissionController:
+    """
+    One lazily created gate per model.
+    """
+
+    def __init__(self, enforce: bool):
+        self.enforce = enforce
+        self._gates: Dict[str, PriorityGate] = {}
+
+    def gate(self, model: str, limit: int) -> PriorityGate:
+        gate = self._gates.get(model)
+        if gate is None:
+            gate = PriorityGate(model, limit, self.enforce)
+            self._gates[model] = gate
+        return gate
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enforce,
+            "queue_limits": dict(zip(PRIORITY_NAMES, QUEUE_LIMITS)),
+            "max_wait_seconds": dict(zip(PRIORITY_NAMES, MAX_WAITS)),
+            "models": {model: gate.snapshot() for model, gate in self._gates.items()}
+        }
+
+
+admission = AdmissionController(ADMISSION_CONTROL)
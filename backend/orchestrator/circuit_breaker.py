@@ -0,0 +1,208 @@
+"""
+Per-service circuit breakers and hedged requests for the MCP sources.
+
+A breaker counts consecutive failures (errors and missed budgets) for one
+service. At CIRCUIT_FAILURE_THRESHOLD it opens: calls fail fast without
+touching the network and are answered with the last-known-good payload for
+that location, if there is one. After CIRCUIT_RESET_TIMEOUT a single probe is
+let through (half-open); its success closes the circuit, its failure re-opens
+it for another full timeout.
+
+Each breaker also keeps a window of recent successful latencies. With
+HEDGE_REQUESTS enabled, a second identical request is fired once the first
+has been outstanding longer than the service's p95, and whichever answers
+first wins. MCP queries are idempotent GETs, so the duplicate is harmless.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Any, Optional, Callable, Awaitable, Hashable
+
+CIRCUIT_BREAKER_ENABLED = os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() == "true"
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+# Last-known-good payloads kept per service (one per location/emergency type)
+CIRCUIT_FALLBACK_ENTRIES = int(os.getenv("CIRCUIT_FALLBACK_ENTRIES", "256"))
+
+# Hedged requests (opt-in)
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "false").lower() == "true"
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.05"))
+LATENCY_WINDOW = 200
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker for one service.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, fallback_entries: int):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.fallback_entries = fallback_entries
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self._latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self._last_good: "OrderedDict[Hashable, dict]" = OrderedDict()
+        self.times_opened = 0
+        self.short_circuited = 0
+        self.fallbacks_served = 0
+        self.hedges_fired = 0
+        self.hedge_wins = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go to the network now."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.short_circuited += 1
+                return False
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        # Half-open: exactly one probe at a time
+        if self.probe_in_flight:
+            self.short_circuited += 1
+            return False
+        self.probe_in_flight = True
+        return True
+
+    def record_success(self, key: Hashable, payload: dict, latency: float) -> None:
+        self._latencies.append(latency)
+        self._last_good[key] = payload
+        self._last_good.move_to_end(key)
+        while len(self._last_good) > self.fallback_entries:
+            self._last_good.popitem(last=False)
+        if self.state != CLOSED:
+            print(f"✅ Circuit for {self.name} closed")
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self.probe_in_flight = False
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+            print(f"🔌 Circuit for {self.name} opened after {self.consecutive_failures} consecutive failures")
+
+    def release(self) -> None:
+        """Give back a half-open probe slot whose call was abandoned without an outcome."""
+        self.probe_in_flight = False
+
+    def fallback(self, key: Hashable) -> dict:
+        """Last-known-good payload for the key, or an error payload."""
+        payload = self._last_good.get(key)
+        if payload is None:
+            return {"error": f"Circuit open for {self.name}", "status": "circuit_open"}
+        self.fallbacks_served += 1
+        return {**payload, "circuit": OPEN}
+
+    def p95(self) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+
+    def hedge_delay(self) -> Optional[float]:
+        """Delay before firing a duplicate request, or None when hedging is off or unwarmed."""
+        if not HEDGE_REQUESTS or len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, self.p95())
+
+    def snapshot(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        retry_in = 0.0
+        if self.state == OPEN:
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_in": round(retry_in, 1),
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited,
+            "fallbacks_served": self.fallbacks_served,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "hedges_fired": self.hedges_fired,
+            "hedge_wins": self.hedge_wins
+        }
+
+
+class BreakerRegistry:
+    """
+    One lazily created breaker per service name.
+    """
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, CIRCUIT_FALLBACK_ENTRIES)
+            self._breakers[name] = breaker
+        return breaker
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": CIRCUIT_BREAKER_ENABLED,
+            "hedging": HEDGE_REQUESTS,
+            "services": {name: breaker.snapshot() for name, breaker in self._breakers.items()}
+        }
+
+
+breakers = BreakerRegistry()
+
+
+async def hedged_call(
+    call: Callable[[], Awaitable[dict]],
+    delay: Optional[float],
+    breaker: Optional[CircuitBreaker] = None
+) -> dict:
+    """
+    Run call(); if it has not answered after `delay` seconds, run it again and
+    return the first successful payload. An error payload from one attempt
+    still waits for the other before being returned.
+    """
+    if delay is None:
+        return await call()
+
+    first = asyncio.create_task(call())
+    attempts = [first]
+    try:
+        done, _ = await asyncio.wait(attempts, timeout=delay)
+        if done:
+            return first.result()
+
+        attempts.append(asyncio.create_task(call()))
+        if breaker is not None:
+            breaker.hedges_fired += 1
+
+        pending = set(attempts)
+        result: dict = {}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if "error" not in result:
+                    if breaker is not None and task is not first:
+                        breaker.hedge_wins += 1
+                    return result
+        return result
+    finally:
+        for task in attempts:
+            if not task.done():
+                task.cancel()
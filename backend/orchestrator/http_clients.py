@@ -0,0 +1,144 @@
+"""
+Application-lifetime HTTP client registry.
+
+One keep-alive connection pool per upstream (each MCP service and the NVIDIA
+NIM endpoint), created at startup and closed at shutdown, so requests reuse
+TCP connections and TLS sessions instead of paying a handshake every call.
+"""
+
+import os
+from typing import Dict, Any, Optional
+import httpx
+
+# Pool limits shared by every upstream unless overridden per pool
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30.0"))
+
+# NIM pool: usually fewer, longer-lived connections to a single TLS host
+NIM_MAX_CONNECTIONS = int(os.getenv("NIM_MAX_CONNECTIONS", str(HTTP_MAX_CONNECTIONS)))
+NIM_HTTP2 = os.getenv("NIM_HTTP2", "false").lower() == "true"
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package (pip install httpx[http2])."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class PoolStats:
+    """
+    Connection reuse counters for one pool, fed by the httpcore trace extension.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+
+    def record(self, event: str) -> None:
+        if event == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+        elif event == "connection.start_tls.complete":
+            self.tls_handshakes += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        reused = max(self.requests - self.connections_opened, 0)
+        return {
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "tls_handshakes": self.tls_handshakes,
+            "reused_requests": reused,
+            "reuse_ratio": round(reused / self.requests, 3) if self.requests else 0.0
+        }
+
+
+class ClientRegistry:
+    """
+    Named HTTP clients with per-pool limits and reuse statistics.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, PoolStats] = {}
+        self._config: Dict[str, Dict[str, Any]] = {}
+
+    def configure(
+        self,
+        name: str,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive: int = HTTP_MAX_KEEPALIVE,
+        http2: bool = False
+    ) -> None:
+        """Declare a pool; the client itself is created on first use or at startup."""
+        if http2 and not http2_available():
+            print(f"⚠️  HTTP/2 requested for '{name}' but h2 is not installed, using HTTP/1.1")
+            http2 = False
+        self._config[name] = {
+            "max_connections": max_connections,
+            "max_keepalive": min(max_keepalive, max_connections),
+            "http2": http2
+        }
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        config = self._config.get(name) or {
+            "max_connections": HTTP_MAX_CONNECTIONS,
+            "max_keepalive": HTTP_MAX_KEEPALIVE,
+            "http2": False
+        }
+        stats = self._stats.setdefault(name, PoolStats())
+        limits = httpx.Limits(
+            max_connections=config["max_connections"],
+            max_keepalive_connections=config["max_keepalive"],
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        )
+
+        async def trace(event: str, info: dict) -> None:
+            stats.record(event)
+
+        async def on_request(request: httpx.Request) -> None:
+            stats.requests += 1
+            request.extensions["trace"] = trace
+
+        return httpx.AsyncClient(
+            limits=limits,
+            http2=config["http2"],
+            event_hooks={"request": [on_request]}
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Return the pooled client for an upstream, creating it if needed."""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create(name)
+            self._clients[name] = client
+        return client
+
+    def start(self) -> None:
+        """Open every configured pool."""
+        for name in self._config:
+            self.get(name)
+
+    async def close(self) -> None:
+        """Close every pool and drop idle connections."""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    def stats(self, name: Optional[str] = None) -> Dict[str, Any]:
+        if name is not None:
+            return self._stats.setdefault(name, PoolStats()).snapshot()
+        return {
+            pool: {
+                **self._stats.setdefault(pool, PoolStats()).snapshot(),
+                "http2": self._config.get(pool, {}).get("http2", False),
+                "max_connections": self._config.get(pool, {}).get("max_connections", HTTP_MAX_CONNECTIONS)
+            }
+            for pool in sorted(set(self._config) | set(self._clients))
+        }
+
+
+http_registry = ClientRegistry()
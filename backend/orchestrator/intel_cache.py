@@ -0,0 +1,134 @@
+"""
+In-process intelligence cache.
+
+MCP payloads are cached per (location, emergency_type, source) with a TTL per
+source: weather and maps change over minutes, social feeds over seconds. Once
+an entry expires it is still served for a short stale window while a single
+background refresh runs, so a hot key never makes a caller wait on an MCP
+round trip. Entries are evicted least-recently-used beyond a size bound.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
+from locations import location_key
+
+INTEL_CACHE_ENABLED = os.getenv("INTEL_CACHE_ENABLED", "true").lower() == "true"
+INTEL_CACHE_MAX_ENTRIES = int(os.getenv("INTEL_CACHE_MAX_ENTRIES", "2048"))
+
+# How long an expired entry may still be served while it is being refreshed
+INTEL_CACHE_STALE_SECONDS = float(os.getenv("INTEL_CACHE_STALE_SECONDS", "60"))
+
+# Freshness per source, e.g. INTEL_CACHE_TTL_SOCIAL=10
+DEFAULT_TTLS = {
+    "weather": 300.0,
+    "maps": 600.0,
+    "news": 60.0,
+    "social": 15.0,
+    "resource": 30.0
+}
+INTEL_CACHE_TTLS = {
+    source: float(os.getenv(f"INTEL_CACHE_TTL_{source.upper()}", str(ttl)))
+    for source, ttl in DEFAULT_TTLS.items()
+}
+
+
+class IntelligenceCache:
+    """
+    LRU cache of MCP payloads with per-source TTLs and stale-while-revalidate.
+    """
+
+    def __init__(self, ttls: Dict[str, float], stale_seconds: float, max_entries: int):
+        self.ttls = ttls
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, dict]]" = OrderedDict()
+        self._refreshing: Dict[Tuple[str, str, str], asyncio.Task] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, source: str, outcome: str) -> None:
+        counters = self._counters.setdefault(source, {"hits": 0, "misses": 0, "stale": 0})
+        counters[outcome] += 1
+
+    def lookup(self, location: str, emergency_type: str, source: str) -> Tuple[Optional[dict], str]:
+        """
+        Return (payload, state) where state is "fresh", "stale" or "miss".
+        """
+        key = (location_key(location), emergency_type, source)
+        entry = self._entries.get(key)
+        if entry is None:
+            self._count(source, "misses")
+            return None, "miss"
+
+        stored_at, payload = entry
+        age = time.monotonic() - stored_at
+        ttl = self.ttls.get(source, 60.0)
+        if age <= ttl:
+            self._entries.move_to_end(key)
+            self._count(source, "hits")
+            return payload, "fresh"
+        if age <= ttl + self.stale_seconds:
+            self._entries.move_to_end(key)
+            self._count(source, "stale")
+            return payload, "stale"
+
+        del self._entries[key]
+        self._count(source, "misses")
+        return None, "miss"
+
+    def store(self, location: str, emergency_type: str, source: str, payload: dict) -> None:
+        """Cache a successful payload; error and circuit-fallback payloads are never cached."""
+        if "error" in payload or "circuit" in payload:
+            return
+        key = (location_key(location), emergency_type, source)
+        self._entries[key] = (time.monotonic(), payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def revalidate(
+        self,
+        location: str,
+        emergency_type: str,
+        source: str,
+        fetch: Callable[[], Awaitable[dict]]
+    ) -> None:
+        """
+        Refresh an entry in the background. At most one refresh per key runs
+        at a time; callers keep getting the stale payload meanwhile.
+        """
+        key = (location_key(location), emergency_type, source)
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                self.store(location, emergency_type, source, await fetch())
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        totals = {"hits": 0, "misses": 0, "stale": 0}
+        for counters in self._counters.values():
+            for outcome, count in counters.items():
+                totals[outcome] += count
+        lookups = sum(totals.values())
+        return {
+            "enabled": INTEL_CACHE_ENABLED,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "refreshing": len(self._refreshing),
+            **totals,
+            "hit_ratio": round((totals["hits"] + totals["stale"]) / lookups, 3) if lookups else 0.0,
+            "sources": {source: dict(counters) for source, counters in sorted(self._counters.items())}
+        }
+
+
+intel_cache = IntelligenceCache(INTEL_CACHE_TTLS, INTEL_CACHE_STALE_SECONDS, INTEL_CACHE_MAX_ENTRIES)
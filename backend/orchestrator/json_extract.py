@@ -0,0 +1,272 @@
+"""
+Tolerant JSON extraction from LLM output.
+
+Models wrap their JSON in code fences, add a sentence before or after it, or
+get cut off at LLM_MAX_TOKENS. extract_json() finds the first balanced object
+regardless of surrounding prose and, if the output was truncated, repairs it
+by finishing a cut-off true/false/null and closing the open string and
+brackets, or else by cutting back to the last point where the text was still
+valid.
+
+StreamingJSONParser consumes a token stream and reports each top-level field
+(and each element of a top-level array, e.g. every evacuation step) as soon
+as it closes, so downstream work can start before generation finishes.
+"""
+
+import itertools
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+CLOSERS = {"{": "}", "[": "]"}
+LITERALS = ("true", "false", "null")
+
+
+class JSONExtractError(ValueError):
+    """Raised when no JSON object can be recovered from the text."""
+
+
+def _scan(text: str, start: int) -> Tuple[Optional[int], List[Tuple[int, Tuple[str, ...]]], Tuple[str, ...], bool]:
+    """
+    Walk text from an opening brace. Returns (end index of the balanced
+    object or None, safe cut points with their bracket stacks, the bracket
+    stack at end of text, whether the text ended inside a string).
+
+    The stack is an immutable tuple so cut points share it instead of
+    copying it.
+    """
+    stack: Tuple[str, ...] = ()
+    safe_points: List[Tuple[int, Tuple[str, ...]]] = []
+    in_string = False
+    escape = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in CLOSERS:
+            stack += (char,)
+            # Before the first key or element: an empty container is valid
+            safe_points.append((index + 1, stack))
+        elif char in "}]":
+            if not stack:
+                return None, safe_points, stack, False
+            stack = stack[:-1]
+            if not stack:
+                return index, safe_points, stack, False
+            safe_points.append((index + 1, stack))
+        elif char == ",":
+            safe_points.append((index, stack))
+    return None, safe_points, stack, in_string
+
+
+def _close(fragment: str, stack: Sequence[str]) -> str:
+    return fragment + "".join(CLOSERS[bracket] for bracket in reversed(stack))
+
+
+def _complete_literal(fragment: str) -> str:
+    """Finish a true/false/null cut off mid-word ("tru" -> "true")."""
+    head = fragment.rstrip()
+    word_start = len(head)
+    while word_start and head[word_start - 1].isalpha():
+        word_start -= 1
+    word = head[word_start:]
+    for literal in LITERALS:
+        if word and literal.startswith(word):
+            return head[:word_start] + literal
+    return fragment
+
+
+def _starts_object(text: str, position: int) -> bool:
+    """Whether the brace at position can open a JSON object ('{' then '"' or '}')."""
+    rest = text[position + 1:].lstrip()
+    return not rest or rest[0] in '"}'
+
+
+def repair_truncated(text: str, start: int = 0) -> Optional[dict]:
+    """
+    Best-effort completion of a JSON object cut off mid-generation.
+
+    Tries closing the text as-is first (finishing a cut-off literal), then
+    falls back to each earlier point where a value had just completed or a
+    container had just opened, dropping the partial tail.
+    """
+    _, safe_points, stack, in_string = _scan(text, start)
+    fragment = text[start:]
+    if in_string:
+        fragment += '"'
+    else:
+        fragment = _complete_literal(fragment)
+    # Built lazily: the first cut point that parses is usually the last one
+    attempts = itertools.chain(
+        (_close(fragment, stack),),
+        (_close(text[start:cut], cut_stack) for cut, cut_stack in reversed(safe_points)),
+        ("{}",)
+    )
+
+    for candidate in attempts:
+        try:
+            value = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(value, dict):
+            return value
+    return None
+
+
+def extract_json(text: str, repair: bool = True) -> dict:
+    """
+    Return the first JSON object found in text, repairing truncation if needed.
+
+    A brace still open at the end of the text is either where the output was
+    truncated or a stray brace in prose; when repairing it recovers nothing,
+    the scan moves on to the next brace and the empty object is only
+    returned if nothing better follows.
+    """
+    empty: Optional[dict] = None
+    position = text.find("{")
+    while position != -1:
+        if not _starts_object(text, position):
+            position = text.find("{", position + 1)
+            continue
+        end, _, _, _ = _scan(text, position)
+        if end is None:
+            if repair:
+                value = repair_truncated(text, position)
+                if value:
+                    return value
+                if value is not None and empty is None:
+                    empty = value
+        else:
+            try:
+                value = json.loads(text[position:end + 1])
+                if isinstance(value, dict):
+                    return value
+            except ValueError:
+                pass
+        position = text.find("{", position + 1)
+
+    if empty is not None:
+        return empty
+    raise JSONExtractError("No JSON object found in LLM response")
+
+
+class StreamingJSONParser:
+    """
+    Incremental parser for a single top-level JSON object.
+
+    feed() returns the events completed by the new chunk:
+    - ("field", key, value) when a top-level field closes
+    - ("item", key, index, value) when an element of a top-level array closes
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0
+        self.stack: List[str] = []
+        self.in_string = False
+        self.escape = False
+        self.object_start: Optional[int] = None
+        self.field_start = 0
+        self.item_start = 0
+        self.item_index = 0
+        self.current_key: Optional[str] = None
+        self.done = False
+        self.fields: Dict[str, Any] = {}
+
+    def _field_key(self, segment: str) -> Optional[str]:
+        head = segment.split(":", 1)[0].strip()
+        try:
+            key = json.loads(head)
+        except ValueError:
+            return None
+        return key if isinstance(key, str) else None
+
+    def _close_field(self, end: int, events: list) -> None:
+        segment = self.buffer[self.field_start:end].strip()
+        if not segment:
+            return
+        try:
+            parsed = json.loads("{" + segment + "}")
+        except ValueError:
+            return
+        for key, value in parsed.items():
+            self.fields[key] = value
+            events.append(("field", key, value))
+
+    def _close_item(self, end: int, events: list) -> None:
+        segment = self.buffer[self.item_start:end].strip()
+        if not segment or self.current_key is None:
+            return
+        try:
+            value = json.loads(segment)
+        except ValueError:
+            return
+        events.append(("item", self.current_key, self.item_index, value))
+        self.item_index += 1
+
+    def feed(self, chunk: str) -> List[tuple]:
+        events: List[tuple] = []
+        if self.done:
+            return events
+        self.buffer += chunk
+
+        while self.position < len(self.buffer):
+            index = self.position
+            char = self.buffer[index]
+            self.position += 1
+
+            if self.object_start is None:
+                if char == "{":
+                    self.object_start = index
+                    self.stack.append("{")
+                    self.field_start = index + 1
+                continue
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+
+            if char == '"':
+                self.in_string = True
+            elif char in CLOSERS:
+                if len(self.stack) == 1:
+                    self.current_key = self._field_key(self.buffer[self.field_start:index])
+                if char == "[" and len(self.stack) == 1:
+                    self.item_start = index + 1
+                    self.item_index = 0
+                self.stack.append(char)
+            elif char in "}]":
+                if len(self.stack) == 2 and self.stack[-1] == "[":
+                    self._close_item(index, events)
+                self.stack.pop()
+                if not self.stack:
+                    self._close_field(index, events)
+                    self.done = True
+                    break
+            elif char == ",":
+                if len(self.stack) == 1:
+                    self._close_field(index, events)
+                    self.field_start = index + 1
+                elif len(self.stack) == 2 and self.stack[-1] == "[":
+                    self._close_item(index, events)
+                    self.item_start = index + 1
+
+        return events
+
+    def result(self) -> dict:
+        """The complete object, repairing it if the stream was cut short."""
+        if self.object_start is None:
+            raise JSONExtractError("No JSON object found in LLM response")
+        return extract_json(self.buffer[self.object_start:])
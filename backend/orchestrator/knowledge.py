@@ -1,117 +1,217 @@
 """
 Emergency procedures and protocols knowledge base.
-"""
 
-FIRE_PROCEDURES = """
-FIRE EMERGENCY PROCEDURES:
-
-Immediate Actions:
-1. Activate nearest fire alarm
-2. Alert others in the immediate area
-3. Exit building using nearest safe exit
-4. Do NOT use elevators
-5. Close doors behind you to contain fire
-6. Stay low if smoke is present
-7. Feel doors before opening (heat check)
-
-Evacuation Protocol:
-- Move quickly but do not run
-- Use stairs, never elevators
-- Assist those who need help
-- Do not stop to collect belongings
-- Proceed to designated assembly point
-- Stay clear of building (minimum 500 feet)
-- Do not re-enter until cleared by authorities
-
-Safety Guidelines:
-- If trapped: Close doors, seal gaps, signal for help
-- If clothing catches fire: Stop, Drop, and Roll
-- Stay together with your group
-- Account for all personnel at assembly point
-- Report missing persons to emergency responders
-
-Evacuation Route Selection:
-- Primary route: Nearest marked exit
-- Secondary route: Alternative if primary blocked
-- Avoid smoke-filled areas
-- Stay on designated evacuation routes
-- Follow directional signage
-"""
+Procedures live as Markdown documents in KNOWLEDGE_DIR (default
+`procedures/`): optional front matter (`emergency_types: fire, flood`), a
+`# Title` and `## Section` headings. At startup every section is tokenized
+into a BM25 inverted index, so a request only touches the postings of its
+own query terms however many documents the directory holds.
 
-HURRICANE_PROCEDURES = """
-HURRICANE EMERGENCY PROCEDURES:
-
-Before Hurricane:
-1. Monitor official weather updates
-2. Secure or bring inside loose objects
-3. Close storm shutters or board windows
-4. Prepare emergency kit (water, food, medicine, flashlight)
-5. Charge all electronic devices
-6. Fill bathtubs with water for utility use
-
-During Hurricane:
-- Stay inside, away from windows
-- Move to interior room on lowest floor
-- If flooding occurs, move to higher floor
-- Do not go outside until all-clear given
-- Stay away from floodwater
-- Conserve battery power
-
-After Hurricane:
-- Wait for official all-clear
-- Avoid floodwater (may be contaminated)
-- Watch for hazards (downed power lines, debris)
-- Do not return home if unsafe
-- Document damage for insurance
+`retrieve` returns the top sections for a scenario and its intelligence,
+within a token budget, for grounding the stage-2 prompt. `get_procedures`
+still returns a whole document for the response's `emergency_procedures`.
 """
 
-FLOOD_PROCEDURES = """
-FLOOD EMERGENCY PROCEDURES:
-
-Immediate Actions:
-1. Move to higher ground immediately
-2. Do NOT walk through moving water
-3. Do NOT drive through flooded areas
-4. Stay away from power lines and electrical wires
-5. Listen to emergency broadcasts
-
-Safety Rules:
-- 6 inches of water can knock you down
-- 12 inches of water can carry away a vehicle
-- Turn Around, Don't Drown
-- Do not touch electrical equipment if wet
-- Avoid contact with floodwater (contamination risk)
-
-Evacuation:
-- Leave as soon as advised
-- Follow designated evacuation routes
-- Do not return until authorities say it's safe
-- Be aware of flash flood potential
-- Move to higher elevation, not just higher floor
-"""
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+from prompt_format import estimate_tokens, DROP_FIELDS, NOISY_KEYS
 
-GENERAL_SAFETY = """
-GENERAL EMERGENCY SAFETY:
-
-Universal Rules:
-1. Stay calm and think clearly
-2. Follow official instructions
-3. Help others if you can do so safely
-4. Do not spread unverified information
-5. Keep emergency contacts accessible
-
-Communication:
-- Call 911 for life-threatening emergencies
-- Use text messages if phone lines are busy
-- Check in with family/friends
-- Monitor official channels for updates
-
-After Emergency:
-- Document everything (photos, notes)
-- Contact insurance company
-- Be aware of stress and trauma
-- Seek medical attention if needed
-"""
+KNOWLEDGE_DIR = os.getenv("KNOWLEDGE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "procedures"))
+
+# Retrieved guidance in the stage-2 prompt (counts against RESPONSE_PROMPT_TOKENS)
+KNOWLEDGE_RETRIEVAL = os.getenv("KNOWLEDGE_RETRIEVAL", "true").lower() == "true"
+KNOWLEDGE_TOP_K = int(os.getenv("KNOWLEDGE_TOP_K", "4"))
+KNOWLEDGE_PROMPT_TOKENS = int(os.getenv("KNOWLEDGE_PROMPT_TOKENS", "400"))
+
+# BM25 parameters, and the score multiplier for sections of documents tagged
+# with the request's emergency type
+BM25_K1 = 1.2
+BM25_B = 0.75
+TYPE_BOOST = 1.5
+
+# Intelligence strings longer than this are skipped when building the query
+QUERY_STRING_LIMIT = 160
+QUERY_MAX_STRINGS = 200
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "if", "in",
+    "is", "it", "its", "not", "of", "on", "or", "that", "the", "this", "to", "was", "were",
+    "will", "with", "you", "your", "do", "no", "all", "any", "can", "there", "they", "we"
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords, with plural -s stripped."""
+    tokens = []
+    for word in _WORD_RE.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+class Section:
+    """
+    One `## heading` block of a procedures document.
+    """
+
+    __slots__ = ("doc_id", "title", "heading", "body", "emergency_types", "length", "tokens")
+
+    def __init__(self, doc_id: str, title: str, heading: str, body: str, emergency_types: Tuple[str, ...]):
+        self.doc_id = doc_id
+        self.title = title
+        self.heading = heading
+        self.body = body
+        self.emergency_types = emergency_types
+        self.length = 0
+        self.tokens = estimate_tokens(self.render())
+
+    def render(self) -> str:
+        return f"[{self.title} / {self.heading}]\n{self.body}"
+
+
+class KnowledgeBase:
+    """
+    Procedures documents split into sections, with a BM25 index over them.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.sections: List[Section] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._idf: Dict[str, float] = {}
+        self._avg_length = 0.0
+        self.load()
+
+    def load(self) -> None:
+        self.documents = {}
+        self.sections = []
+        if os.path.isdir(self.directory):
+            for name in sorted(os.listdir(self.directory)):
+                if name.endswith(".md"):
+                    with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                        self._add_document(os.path.splitext(name)[0], f.read())
+        self._build_index()
+
+    def _add_document(self, doc_id: str, text: str) -> None:
+        meta: Dict[str, str] = {}
+        if text.startswith("---\n"):
+            header, _, text = text[4:].partition("\n---\n")
+            for line in header.splitlines():
+                key, _, value = line.partition(":")
+                meta[key.strip()] = value.strip()
+        emergency_types = tuple(t.strip() for t in meta.get("emergency_types", "").split(",") if t.strip())
+
+        title = doc_id
+        sections: List[Section] = []
+        heading, lines = None, []
+
+        def close_section() -> None:
+            if heading is not None:
+                body = "\n".join(lines).strip("\n")
+                sections.append(Section(doc_id, title, heading, body, emergency_types))
+
+        for line in text.splitlines():
+            if line.startswith("# "):
+                title = line[2:].strip()
+            elif line.startswith("## "):
+                close_section()
+                heading, lines = line[3:].strip(), []
+            elif heading is not None:
+                lines.append(line)
+        close_section()
+
+        self.documents[doc_id] = {"title": title, "emergency_types": emergency_types, "sections": sections}
+        self.sections.extend(sections)
+
+    def _build_index(self) -> None:
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        total_length = 0
+        for index, section in enumerate(self.sections):
+            # The heading names the situation, so it counts twice
+            terms = tokenize(f"{section.heading} {section.heading} {section.title} {section.body}")
+            section.length = len(terms)
+            total_length += len(terms)
+            for term, frequency in Counter(terms).items():
+                postings.setdefault(term, []).append((index, frequency))
+
+        count = len(self.sections)
+        self._postings = postings
+        self._avg_length = total_length / count if count else 0.0
+        self._idf = {
+            term: math.log(1 + (count - len(entries) + 0.5) / (len(entries) + 0.5))
+            for term, entries in postings.items()
+        }
+
+    def search(self, query: str, emergency_type: Optional[str] = None, k: int = KNOWLEDGE_TOP_K) -> List[Tuple[float, Section]]:
+        """Top-k (score, section) pairs for a free-text query."""
+        scores: Dict[int, float] = {}
+        for term, query_frequency in Counter(tokenize(query)).items():
+            entries = self._postings.get(term)
+            if not entries:
+                continue
+            idf = self._idf[term]
+            for index, frequency in entries:
+                length = self.sections[index].length
+                norm = frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / self._avg_length)
+                # Repeated query terms add weight, with diminishing returns
+                scores[index] = scores.get(index, 0.0) + idf * frequency * (BM25_K1 + 1) / norm * math.sqrt(query_frequency)
+
+        if emergency_type:
+            for index in scores:
+                if emergency_type in self.sections[index].emergency_types:
+                    scores[index] *= TYPE_BOOST
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(score, self.sections[index]) for index, score in ranked]
+
+    def retrieve(
+        self,
+        query: str,
+        emergency_type: Optional[str] = None,
+        k: int = KNOWLEDGE_TOP_K,
+        token_budget: int = KNOWLEDGE_PROMPT_TOKENS
+    ) -> List[Section]:
+        """Highest-scoring sections that fit the token budget together."""
+        selected, used = [], 0
+        for _, section in self.search(query, emergency_type, k):
+            if used + section.tokens <= token_budget:
+                selected.append(section)
+                used += section.tokens
+        return selected
+
+    def document_text(self, doc_id: str) -> str:
+        """A whole document in the plain-text layout of the response's emergency_procedures."""
+        document = self.documents.get(doc_id)
+        if document is None:
+            return ""
+        blocks = [f"{document['title']}:"] + [f"{s.heading}:\n{s.body}" for s in document["sections"]]
+        return "\n" + "\n\n".join(blocks) + "\n"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "documents": len(self.documents),
+            "sections": len(self.sections),
+            "terms": len(self._postings),
+            "retrieval": KNOWLEDGE_RETRIEVAL
+        }
+
+
+knowledge_base = KnowledgeBase(KNOWLEDGE_DIR)
+
+FIRE_PROCEDURES = knowledge_base.document_text("fire")
+HURRICANE_PROCEDURES = knowledge_base.document_text("hurricane")
+FLOOD_PROCEDURES = knowledge_base.document_text("flood")
+GENERAL_SAFETY = knowledge_base.document_text("general")
 
 
 def get_procedures(emergency_type: str) -> str:
@@ -125,3 +225,39 @@ def get_procedures(emergency_type: str) -> str:
         "none": GENERAL_SAFETY
     }
     return procedures_map.get(emergency_type.lower(), GENERAL_SAFETY)
+
+
+def _query_strings(value: Any, key: str, out: List[str]) -> None:
+    if len(out) >= QUERY_MAX_STRINGS or key in DROP_FIELDS or key in NOISY_KEYS:
+        return
+    if isinstance(value, dict):
+        for child_key, child in value.items():
+            _query_strings(child, child_key, out)
+    elif isinstance(value, list):
+        for child in value:
+            _query_strings(child, key, out)
+    elif isinstance(value, str) and len(value) <= QUERY_STRING_LIMIT:
+        out.append(value)
+
+
+def build_query(scenario: str, intelligence_data: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Retrieval query: the scenario text (weighted double) plus the short text
+    fields of the intelligence payloads (warnings, headlines, conditions...).
+    """
+    strings = [scenario, scenario]
+    for payload in (intelligence_data or {}).values():
+        if isinstance(payload, dict) and "error" not in payload:
+            _query_strings(payload, "", strings)
+    return "\n".join(strings)
+
+
+def retrieve_guidance(scenario: str, intelligence_data: Dict[str, Any], emergency_type: str) -> str:
+    """
+    Procedure sections relevant to this request, rendered for a prompt, or
+    "" when retrieval is off or nothing matches.
+    """
+    if not KNOWLEDGE_RETRIEVAL:
+        return ""
+    sections = knowledge_base.retrieve(build_query(scenario, intelligence_data), emergency_type)
+    return "\n\n".join(section.render() for section in sections)
@@ -0,0 +1,157 @@
+"""
+Content-addressed cache of LLM completions.
+
+Entries are keyed by a SHA-256 of everything that determines the generation
+(model, system prompt, user prompt, temperature, max_tokens). A bounded
+in-memory LRU tier sits in front of an on-disk store of one JSON file per key,
+so repeated drills, demos and UI retries survive restarts without a NIM call.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".llm_cache"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+
+# Header callers send to force a fresh generation (the result is still stored)
+BYPASS_HEADER = "X-Cache-Bypass"
+
+# Set per request; copied into every task the request spawns
+bypass_llm_cache = contextvars.ContextVar("bypass_llm_cache", default=False)
+
+
+def cache_key(payload: Dict[str, Any]) -> str:
+    """Hash the generation-determining fields of a chat-completions payload."""
+    messages = payload.get("messages", [])
+    material = {
+        "model": payload.get("model"),
+        "system": next((m["content"] for m in messages if m["role"] == "system"), ""),
+        "user": next((m["content"] for m in messages if m["role"] == "user"), ""),
+        "temperature": payload.get("temperature"),
+        "max_tokens": payload.get("max_tokens")
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-tier (memory LRU + disk) completion cache with a TTL.
+    """
+
+    def __init__(self, directory: str, ttl: float, memory_entries: int):
+        self.directory = directory
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _remember(self, key: str, created_at: float, text: str) -> None:
+        self._memory[key] = (created_at, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, entry: dict) -> None:
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️  LLM cache write failed: {e}")
+
+    def _delete_disk(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    async def get(self, key: str) -> Optional[str]:
+        if bypass_llm_cache.get():
+            self.bypassed += 1
+            return None
+
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            created_at, text = entry
+            if now - created_at <= self.ttl:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return text
+            del self._memory[key]
+
+        stored = await asyncio.to_thread(self._read_disk, key)
+        if stored is not None:
+            if now - stored["created_at"] <= self.ttl:
+                self._remember(key, stored["created_at"], stored["text"])
+                self.disk_hits += 1
+                return stored["text"]
+            await asyncio.to_thread(self._delete_disk, key)
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, model: str, text: str) -> None:
+        created_at = time.time()
+        self._remember(key, created_at, text)
+        entry = {"created_at": created_at, "model": model, "text": text}
+        await asyncio.to_thread(self._write_disk, key, entry)
+
+    def prune(self) -> int:
+        """Delete expired files from the disk tier; returns how many were removed."""
+        removed = 0
+        now = time.time()
+        if not os.path.isdir(self.directory):
+            return removed
+        for shard in os.listdir(self.directory):
+            shard_dir = os.path.join(self.directory, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                path = os.path.join(shard_dir, name)
+                try:
+                    if now - os.path.getmtime(path) > self.ttl:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0
+        }
+
+
+llm_cache = LLMResponseCache(LLM_CACHE_DIR, LLM_CACHE_TTL, LLM_CACHE_MEMORY_ENTRIES)
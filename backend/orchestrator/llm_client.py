@@ -0,0 +1,257 @@
+"""
+Async NVIDIA NIM client with bounded concurrency per model.
+
+Generations run on the shared event loop without blocking it, and each model
+gets its own pool of slots so a burst of large-model plans cannot starve the
+small triage model (or the upstream rate limit). Slots are granted by
+priority class through the admission controller (see admission.py).
+"""
+
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, AsyncIterator
+import httpx
+from fastapi import HTTPException
+from http_clients import http_registry
+from llm_cache import llm_cache, cache_key, bypass_llm_cache, LLM_CACHE_ENABLED, LLM_CACHE_TTL
+from metrics import llm_tokens, llm_requests
+from admission import admission, llm_priority
+from shared_cache import shared_cache
+
+NVIDIA_API_KEY = os.getenv("NVIDIA_API_KEY", "")
+DEFAULT_API_URL = "https://integrate.api.nvidia.com/v1/chat/completions"
+
+# Any OpenAI/NIM-compatible endpoint, e.g. the bundled fake_nim server for offline runs
+NVIDIA_API_URL = os.getenv("NVIDIA_API_URL", DEFAULT_API_URL)
+
+DEFAULT_MODEL = os.getenv("LLM_MODEL", "nvidia/nemotron-4-340b-instruct")
+DECISION_MODEL = os.getenv("DECISION_MODEL", "nvidia/nemotron-mini-4b-instruct")
+RESPONSE_MODEL = os.getenv("RESPONSE_MODEL", "nvidia/nemotron-4-340b-instruct")
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30.0"))
+
+# Maximum in-flight generations per model; extra calls queue by priority for a slot
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+MODEL_CONCURRENCY = {
+    DECISION_MODEL: int(os.getenv("DECISION_MODEL_CONCURRENCY", "16")),
+    RESPONSE_MODEL: int(os.getenv("RESPONSE_MODEL_CONCURRENCY", "4"))
+}
+
+
+class LLMClient:
+    """
+    Chat-completions client with a bounded number of slots per model.
+    """
+
+    def __init__(self, api_url: str, limits: Dict[str, int], default_limit: int):
+        self.api_url = api_url
+        self.limits = dict(limits)
+        self.default_limit = default_limit
+        self._in_flight: Dict[str, int] = {}
+        self._waiting: Dict[str, int] = {}
+
+    def build_payload(self, system_prompt: str, user_prompt: str, model: str) -> Dict[str, Any]:
+        return {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": float(os.getenv("LLM_TEMPERATURE", "0.2")),
+            "max_tokens": int(os.getenv("LLM_MAX_TOKENS", "2000"))
+        }
+
+    def record_usage(self, model: str, usage: Optional[Dict[str, Any]]) -> None:
+        """Count the prompt/completion tokens NIM reports in `usage`."""
+        if not isinstance(usage, dict):
+            return
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if isinstance(usage.get(kind), int):
+                llm_tokens.inc(usage[kind], model=model, kind=kind[:-len("_tokens")])
+
+    def headers(self) -> Dict[str, str]:
+        """Request headers; the API key is only mandatory for the hosted NVIDIA endpoint."""
+        if not NVIDIA_API_KEY:
+            if self.api_url == DEFAULT_API_URL:
+                raise HTTPException(
+                    status_code=500,
+                    detail="NVIDIA_API_KEY not configured. Please set the environment variable."
+                )
+            return {"Content-Type": "application/json"}
+        return {
+            "Authorization": f"Bearer {NVIDIA_API_KEY}",
+            "Content-Type": "application/json"
+        }
+
+    @asynccontextmanager
+    async def slot(self, model: str):
+        """
+        Hold one of the model's concurrency slots for the duration of a call,
+        queued at the current task's priority (admission.llm_priority). Raises
+        a 503 with Retry-After if the admission controller sheds the call.
+        """
+        gate = admission.gate(model, self.limits.get(model, self.default_limit))
+        self._waiting[model] = self._waiting.get(model, 0) + 1
+        try:
+            await gate.acquire(llm_priority.get())
+        finally:
+            self._waiting[model] -= 1
+
+        self._in_flight[model] = self._in_flight.get(model, 0) + 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._in_flight[model] -= 1
+            gate.release(time.monotonic() - started)
+
+    async def complete(self, system_prompt: str, user_prompt: str, model: Optional[str] = None) -> str:
+        """
+        Run one chat completion under the model's concurrency limit.
+
+        Cancelling the awaiting task (e.g. on client disconnect) releases the
+        slot and aborts the upstream HTTP request. Cached completions are
+        returned without taking a slot. With a shared cache (multi-worker
+        deployments), an identical generation already running in another
+        worker is awaited instead of repeated.
+        """
+        llm_model = model or DEFAULT_MODEL
+        headers = self.headers()
+        payload = self.build_payload(system_prompt, user_prompt, llm_model)
+
+        key = cache_key(payload)
+        if LLM_CACHE_ENABLED:
+            cached = await llm_cache.get(key)
+            if cached is not None:
+                llm_requests.inc(model=llm_model, outcome="cached")
+                return cached
+
+        if shared_cache is not None and not bypass_llm_cache.get():
+            return await shared_cache.get_or_compute(
+                "llm", key, LLM_CACHE_TTL, lambda: self.generate(headers, payload, llm_model, key)
+            )
+        return await self.generate(headers, payload, llm_model, key)
+
+    async def generate(self, headers: Dict[str, str], payload: Dict[str, Any], llm_model: str, key: str) -> str:
+        """One non-streaming NIM call under a model slot; the result is cached."""
+        async with self.slot(llm_model):
+            try:
+                response = await http_registry.get("nim").post(
+                    self.api_url,
+                    headers=headers,
+                    json=payload,
+                    timeout=LLM_TIMEOUT
+                )
+                response.raise_for_status()
+
+                result = response.json()
+                content = result["choices"][0]["message"]["content"]
+                self.record_usage(llm_model, result.get("usage"))
+                llm_requests.inc(model=llm_model, outcome="ok")
+                if LLM_CACHE_ENABLED:
+                    await llm_cache.put(key, llm_model, content)
+                return content
+
+            except httpx.HTTPStatusError as e:
+                llm_requests.inc(model=llm_model, outcome="error")
+                raise HTTPException(
+                    status_code=e.response.status_code,
+                    detail=f"NVIDIA API error: {e.response.text}"
+                )
+            except HTTPException:
+                raise
+            except Exception as e:
+                llm_requests.inc(model=llm_model, outcome="error")
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"LLM call failed: {str(e)}"
+                )
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat completion (`stream: true`), yielding content deltas as
+        NIM emits them. The model slot is held until the stream ends. A cached
+        completion is yielded as a single delta.
+        """
+        llm_model = model or DEFAULT_MODEL
+        headers = self.headers()
+        payload = self.build_payload(system_prompt, user_prompt, llm_model)
+
+        key = cache_key(payload)
+        if LLM_CACHE_ENABLED:
+            cached = await llm_cache.get(key)
+            if cached is not None:
+                llm_requests.inc(model=llm_model, outcome="cached")
+                yield cached
+                return
+
+        payload["stream"] = True
+        chunks = []
+
+        async with self.slot(llm_model):
+            try:
+                async with http_registry.get("nim").stream(
+                    "POST",
+                    self.api_url,
+                    headers=headers,
+                    json=payload,
+                    timeout=LLM_TIMEOUT
+                ) as response:
+                    if response.status_code >= 400:
+                        await response.aread()
+                        response.raise_for_status()
+
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        event = json.loads(data)
+                        # Servers that report usage on streams put it on the last chunk
+                        self.record_usage(llm_model, event.get("usage"))
+                        choices = event.get("choices") or [{}]
+                        delta = choices[0].get("delta", {}).get("content")
+                        if delta:
+                            chunks.append(delta)
+                            yield delta
+
+                llm_requests.inc(model=llm_model, outcome="ok")
+                if LLM_CACHE_ENABLED:
+                    await llm_cache.put(key, llm_model, "".join(chunks))
+
+            except httpx.HTTPStatusError as e:
+                llm_requests.inc(model=llm_model, outcome="error")
+                raise HTTPException(
+                    status_code=e.response.status_code,
+                    detail=f"NVIDIA API error: {e.response.text}"
+                )
+            except HTTPException:
+                raise
+            except Exception as e:
+                llm_requests.inc(model=llm_model, outcome="error")
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"LLM stream failed: {str(e)}"
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        models = set(self.limits) | set(self._waiting)
+        return {
+            model: {
+                "limit": self.limits.get(model, self.default_limit),
+                "in_flight": self._in_flight.get(model, 0),
+                "waiting": self._waiting.get(model, 0)
+            }
+            for model in sorted(models)
+        }
+
+
+llm_client = LLMClient(NVIDIA_API_URL, MODEL_CONCURRENCY, LLM_CONCURRENCY)
@@ -0,0 +1,131 @@
+"""
+Canonical location keys.
+
+Reports name one place many ways: "SCU library", "Santa Clara Univ
+Library", "santa clara university libary". The maps server resolves a
+location against its gazetteer (GET /geocode); the orchestrator asks once
+per distinct spelling and from then on keys everything by the canonical
+place ID: the intelligence cache, the shared cache, circuit-breaker
+fallbacks, request coalescing and batch deduplication. The MCP services are
+queried with the canonical name, so every spelling gets the same payloads.
+
+A location that does not resolve, or cannot be resolved because the maps
+service is down, is keyed by its normalized text and asked about again after
+GEOCODE_RETRY_SECONDS.
+"""
+
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Awaitable, Optional, Tuple
+from singleflight import SingleFlight
+
+GEOCODE_ENABLED = os.getenv("GEOCODE_ENABLED", "true").lower() == "true"
+GEOCODE_TIMEOUT = float(os.getenv("GEOCODE_TIMEOUT", "0.5"))
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "4096"))
+GEOCODE_RETRY_SECONDS = float(os.getenv("GEOCODE_RETRY_SECONDS", "60"))
+
+
+def normalize_location(location: str) -> str:
+    """Case, punctuation and whitespace-insensitive form of a location string."""
+    return " ".join(re.sub(r"[^\w\s]", " ", location.lower()).split())
+
+
+class LocationResolver:
+    """
+    LRU map from normalized location text to (cache key, canonical name).
+    """
+
+    def __init__(self, max_entries: int, retry_seconds: float):
+        self.max_entries = max_entries
+        self.retry_seconds = retry_seconds
+        # normalized text -> (key, canonical name, expiry or 0 for resolved places)
+        self._entries: "OrderedDict[str, Tuple[str, str, float]]" = OrderedDict()
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.resolved = 0
+        self.unresolved = 0
+        self.failures = 0
+
+    def _lookup(self, normalized: str) -> Optional[Tuple[str, str]]:
+        entry = self._entries.get(normalized)
+        if entry is None:
+            return None
+        key, name, expires_at = entry
+        if expires_at and expires_at < time.monotonic():
+            del self._entries[normalized]
+            return None
+        self._entries.move_to_end(normalized)
+        return key, name
+
+    def _store(self, normalized: str, key: str, name: str, expires_at: float) -> None:
+        self._entries[normalized] = (key, name, expires_at)
+        self._entries.move_to_end(normalized)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def key(self, location: str) -> str:
+        """Cache key for a location: "place:<id>" once resolved, else its normalized text."""
+        normalized = normalize_location(location)
+        entry = self._lookup(normalized)
+        return entry[0] if entry else normalized
+
+    def canonical_name(self, location: str) -> str:
+        """Gazetteer name for a resolved location, else the location as given."""
+        entry = self._lookup(normalize_location(location))
+        return entry[1] if entry else location
+
+    async def resolve(self, location: str, geocode: Callable[[str], Awaitable[Dict[str, Any]]]) -> str:
+        """
+        Key for a location, calling geocode(location) (a GET /geocode payload)
+        the first time a spelling is seen. Concurrent first sightings share one call.
+        """
+        normalized = normalize_location(location)
+        if not GEOCODE_ENABLED or not normalized:
+            return normalized
+        entry = self._lookup(normalized)
+        if entry is not None:
+            self.hits += 1
+            return entry[0]
+        return await self._flights.do(normalized, lambda: self._fetch(location, normalized, geocode))
+
+    async def _fetch(self, location: str, normalized: str, geocode: Callable[[str], Awaitable[Dict[str, Any]]]) -> str:
+        try:
+            payload = await geocode(location)
+        except Exception as e:
+            payload = {"error": str(e)}
+
+        resolved = payload.get("resolved") if isinstance(payload, dict) else None
+        if resolved:
+            key, name = f"place:{resolved['id']}", resolved["name"]
+            self.resolved += 1
+            self._store(normalized, key, name, 0.0)
+            # The canonical name itself (what the MCP services are sent) maps to the same key
+            self._store(normalize_location(name), key, name, 0.0)
+            print(f"📍 Location '{location}' -> {key} ({name}, score {resolved.get('score')})")
+            return key
+
+        if isinstance(payload, dict) and "error" in payload:
+            self.failures += 1
+        else:
+            self.unresolved += 1
+        self._store(normalized, normalized, location, time.monotonic() + self.retry_seconds)
+        return normalized
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": GEOCODE_ENABLED,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "resolved": self.resolved,
+            "unresolved": self.unresolved,
+            "failures": self.failures
+        }
+
+
+location_resolver = LocationResolver(GEOCODE_CACHE_SIZE, GEOCODE_RETRY_SECONDS)
+
+
+def location_key(location: str) -> str:
+    return location_resolver.key(location)
@@ -1,9 +1,11 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
 from typing import Literal, Optional, List, Dict, Any
-import httpx
+import asyncio
 import json
 import os
+import time
 from prompts import (
     get_system_prompt,
     build_false_alarm_prompt,
@@ -11,7 +13,24 @@ from prompts import (
     DECISION_SYSTEM_PROMPT,
     build_decision_prompt
 )
-from knowledge import get_procedures
+from knowledge import get_procedures, retrieve_guidance, knowledge_base
+from json_extract import extract_json, JSONExtractError, StreamingJSONParser
+from http_clients import http_registry, NIM_MAX_CONNECTIONS, NIM_HTTP2
+from llm_client import llm_client, DECISION_MODEL, RESPONSE_MODEL
+from llm_cache import llm_cache, bypass_llm_cache, BYPASS_HEADER, LLM_CACHE_ENABLED
+from intel_cache import intel_cache, INTEL_CACHE_ENABLED, INTEL_CACHE_TTLS
+from locations import location_resolver, location_key, GEOCODE_TIMEOUT
+from shared_cache import shared_cache, SHARED_CACHE_URL
+from singleflight import analysis_flights
+from triage_rules import rule_based_decision, triage_stats, RULES_TRIAGE_ENABLED
+from circuit_breaker import breakers, hedged_call, CIRCUIT_BREAKER_ENABLED
+from metrics import (
+    metrics, CONTENT_TYPE, http_requests, http_request_seconds, http_in_flight,
+    phase_seconds, mcp_fetch_seconds, mcp_fetches
+)
+from tracing import tracer, TRACEPARENT_HEADER
+from speculation import SPECULATIVE_STAGE2, predict_branch, branch_matches, speculation_stats
+from admission import admission, llm_priority, priority_for, PRIORITY_NAMES
 import uvicorn
 
 app = FastAPI(
@@ -20,9 +39,6 @@ app = FastAPI(
     version="1.0.0"
 )
 
-NVIDIA_API_KEY = os.getenv("NVIDIA_API_KEY", "")
-NVIDIA_API_URL = "https://integrate.api.nvidia.com/v1/chat/completions"
-
 MCP_SERVICES = {
     "weather": os.getenv("WEATHER_SERVICE_URL", "http://weather:8001"),
     "maps": os.getenv("MAPS_SERVICE_URL", "http://maps:8002"),
@@ -31,6 +47,58 @@ MCP_SERVICES = {
     "resource": os.getenv("RESOURCE_SERVICE_URL", "http://resource:8005")
 }
 
+# Data endpoint queried on each MCP service during intelligence gathering
+MCP_ENDPOINTS = {
+    "weather": "/weather",
+    "maps": "/location",
+    "news": "/news",
+    "social": "/social",
+    "resource": "/resources"
+}
+
+# Overall deadline for the intelligence fan-out. Sources that have not answered
+# by then are marked late and the analysis proceeds with partial intelligence.
+INTELLIGENCE_DEADLINE = float(os.getenv("INTELLIGENCE_DEADLINE", "5.0"))
+
+# Per-source budgets, e.g. SOCIAL_SERVICE_TIMEOUT=1.5 (defaults to MCP_TIMEOUT)
+MCP_TIMEOUT = float(os.getenv("MCP_TIMEOUT", "3.0"))
+MCP_TIMEOUTS = {
+    name: float(os.getenv(f"{name.upper()}_SERVICE_TIMEOUT", str(MCP_TIMEOUT)))
+    for name in MCP_SERVICES
+}
+
+# One keep-alive pool per MCP service plus one for NIM
+for _service_name in MCP_SERVICES:
+    http_registry.configure(f"mcp:{_service_name}")
+http_registry.configure("nim", max_connections=NIM_MAX_CONNECTIONS, http2=NIM_HTTP2)
+
+# Share one pipeline run between identical concurrent /analyze requests
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "true").lower() == "true"
+
+# /analyze/batch: items whose LLM stages may run at once, and maximum batch size
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+
+# How often a pending /analyze checks whether its client is still connected
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.25"))
+
+
+@app.on_event("startup")
+async def open_http_pools():
+    http_registry.start()
+    if shared_cache is not None:
+        removed = shared_cache.prune()
+        print(f"🗄️  Shared cache at {SHARED_CACHE_URL} ({removed} expired entries pruned)")
+    if LLM_CACHE_ENABLED:
+        removed = llm_cache.prune()
+        if removed:
+            print(f"🧹 Pruned {removed} expired LLM cache entries")
+
+
+@app.on_event("shutdown")
+async def close_http_pools():
+    await http_registry.close()
+
 
 class AnalysisRequest(BaseModel):
     scenario: str
@@ -38,6 +106,20 @@ class AnalysisRequest(BaseModel):
     emergency_type: Literal["fire", "hurricane", "flood", "none"] = "none"
 
 
+@app.middleware("http")
+async def record_http_metrics(request: Request, call_next):
+    """
+    Count and time every request (until its response starts) by route path.
+    """
+    path = request.url.path if request.url.path in ROUTE_PATHS else "other"
+    started = time.perf_counter()
+    with http_in_flight.track(path=path):
+        response = await call_next(request)
+    http_request_seconds.observe(time.perf_counter() - started, path=path)
+    http_requests.inc(path=path, method=request.method, status=response.status_code)
+    return response
+
+
 @app.get("/")
 def root():
     return {
@@ -52,54 +134,283 @@ def root():
 def health_check():
     return {
         "status": "healthy",
-        "services": MCP_SERVICES
+        "services": MCP_SERVICES,
+        "http_pools": http_registry.stats(),
+        "llm": llm_client.stats(),
+        "intelligence_cache": intel_cache.stats(),
+        "llm_cache": llm_cache.stats(),
+        "coalescing": analysis_flights.stats(),
+        "triage": triage_stats.snapshot(),
+        "speculation": speculation_stats.snapshot(),
+        "knowledge": knowledge_base.stats(),
+        "locations": location_resolver.stats(),
+        "circuits": breakers.stats(),
+        "admission": admission.stats(),
+        "shared_cache": shared_cache.stats() if shared_cache is not None else {"enabled": False},
+        "worker_pid": os.getpid()
     }
 
 
-async def query_mcp_service(service_name: str, endpoint: str, params: dict) -> dict:
+@app.get("/metrics")
+def prometheus_metrics() -> Response:
+    """
+    Prometheus text exposition of request, phase, MCP, LLM and cache metrics.
+    """
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
+
+
+llm_in_flight = metrics.gauge("crisisvision_llm_in_flight", "Generations holding a model slot", ("model",))
+llm_waiting = metrics.gauge("crisisvision_llm_waiting", "Generations waiting for a model slot", ("model",))
+cache_lookups = metrics.counter("crisisvision_cache_lookups_total", "Cache lookups by result", ("cache", "source", "result"))
+cache_hit_ratio = metrics.gauge("crisisvision_cache_hit_ratio", "Cache hits over lookups since start", ("cache",))
+coalesced = metrics.counter("crisisvision_coalesced_requests_total", "Coalesced /analyze requests by role", ("role",))
+triage_decisions = metrics.counter("crisisvision_triage_decisions_total", "Stage-1 decisions by source", ("source",))
+llm_queued = metrics.gauge("crisisvision_llm_queued", "Generations queued for a model slot by priority", ("model", "priority"))
+llm_shed = metrics.counter("crisisvision_llm_shed_total", "Generations shed by admission control", ("model", "priority", "reason"))
+circuit_state = metrics.gauge("crisisvision_circuit_open", "1 while a source's circuit is open or half-open", ("source",))
+
+
+def collect_runtime_metrics() -> None:
+    """
+    Copy counters kept by the pipeline components into the registry.
+    """
+    for model, usage in llm_client.stats().items():
+        llm_in_flight.set(usage["in_flight"], model=model)
+        llm_waiting.set(usage["waiting"], model=model)
+    
+    llm_stats = llm_cache.stats()
+    cache_lookups.set_total(llm_stats["memory_hits"], cache="llm", result="memory_hit")
+    cache_lookups.set_total(llm_stats["disk_hits"], cache="llm", result="disk_hit")
+    cache_lookups.set_total(llm_stats["misses"], cache="llm", result="miss")
+    cache_hit_ratio.set(llm_stats["hit_ratio"], cache="llm")
+    
+    intel_stats = intel_cache.stats()
+    for source, counters in intel_stats["sources"].items():
+        for result, count in counters.items():
+            cache_lookups.set_total(count, cache="intelligence", source=source, result=result)
+    cache_hit_ratio.set(intel_stats["hit_ratio"], cache="intelligence")
+    
+    flights = analysis_flights.stats()
+    coalesced.set_total(flights["leaders"], role="leader")
+    coalesced.set_total(flights["followers"], role="follower")
+    
+    triage = triage_stats.snapshot()
+    triage_decisions.set_total(triage["rule_decisions"], source="rules")
+    triage_decisions.set_total(triage["llm_fallbacks"], source="llm")
+    
+    for source, snapshot in breakers.stats()["services"].items():
+        circuit_state.set(0 if snapshot["state"] == "closed" else 1, source=source)
+    
+    if shared_cache is not None:
+        shared = shared_cache.stats()
+        cache_lookups.set_total(shared["hits"], cache="shared", result="hit")
+        cache_lookups.set_total(shared["waited_for_other_worker"], cache="shared", result="waited")
+        cache_lookups.set_total(shared["misses"], cache="shared", result="miss")
+        cache_hit_ratio.set(shared["hit_ratio"], cache="shared")
+    
+    for model, gate in admission.stats()["models"].items():
+        for priority in PRIORITY_NAMES:
+            llm_queued.set(gate["queued"][priority], model=model, priority=priority)
+            for reason, count in gate["shed"][priority].items():
+                llm_shed.set_total(count, model=model, priority=priority, reason=reason)
+
+
+metrics.add_collector(collect_runtime_metrics)
+
+
+async def query_mcp_service(service_name: str, endpoint: str, params: dict, timeout: float = 10.0) -> dict:
     """
     Query an MCP service and return the response.
+    
+    The current trace travels in a `traceparent` header; the server's own
+    handling time comes back in `Server-Timing` and is recorded on the span.
     """
-    try:
-        base_url = MCP_SERVICES.get(service_name)
-        if not base_url:
-            return {"error": f"Service {service_name} not configured"}
-        
-        url = f"{base_url}{endpoint}"
-        
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url, params=params)
+    with tracer.span(f"mcp.{service_name}", endpoint=endpoint) as span:
+        try:
+            base_url = MCP_SERVICES.get(service_name)
+            if not base_url:
+                return {"error": f"Service {service_name} not configured"}
+            
+            url = f"{base_url}{endpoint}"
+            headers = {}
+            traceparent = tracer.traceparent()
+            if traceparent:
+                headers[TRACEPARENT_HEADER] = traceparent
+            
+            client = http_registry.get(f"mcp:{service_name}")
+            response = await client.get(url, params=params, headers=headers, timeout=timeout)
+            span.set("status_code", response.status_code)
+            server_timing = response.headers.get("Server-Timing", "")
+            if "dur=" in server_timing:
+                span.set("server_ms", float(server_timing.split("dur=", 1)[1].split(",")[0].split(";")[0]))
             response.raise_for_status()
             return response.json()
-    except Exception as e:
-        return {"error": str(e)}
+        except Exception as e:
+            span.set("error", str(e)[:200])
+            return {"error": str(e)}
 
 
-async def gather_intelligence(location: str, emergency_type: str) -> Dict[str, Any]:
+async def query_source(service_name: str, params: dict) -> dict:
     """
-    Query all MCP services in parallel and gather intelligence data.
+    Query one intelligence source within its time budget.
+    
+    The call goes through the service's circuit breaker: while the circuit is
+    open it returns the last-known-good payload for this location (marked
+    "circuit": "open") without touching the network. Once the service's p95
+    is known, a hedged duplicate may be fired (HEDGE_REQUESTS).
     """
-    params = {
-        "location": location,
-        "emergency_type": emergency_type
-    }
+    budget = MCP_TIMEOUTS.get(service_name, MCP_TIMEOUT)
     
-    weather_data = await query_mcp_service("weather", "/weather", params)
-    maps_data = await query_mcp_service("maps", "/location", params)
-    news_data = await query_mcp_service("news", "/news", params)
-    social_data = await query_mcp_service("social", "/social", params)
-    resource_data = await query_mcp_service("resource", "/resources", params)
+    def attempt() -> Any:
+        return query_mcp_service(service_name, MCP_ENDPOINTS[service_name], params, timeout=budget)
     
-    return {
-        "weather": weather_data,
-        "maps": maps_data,
-        "news": news_data,
-        "social": social_data,
-        "resource": resource_data
-    }
+    def late() -> dict:
+        mcp_fetch_seconds.observe(time.monotonic() - started, source=service_name)
+        mcp_fetches.inc(source=service_name, outcome="late")
+        return {"error": f"No response within {budget}s budget", "status": "late"}
+    
+    def finished(payload: dict) -> dict:
+        mcp_fetch_seconds.observe(time.monotonic() - started, source=service_name)
+        mcp_fetches.inc(source=service_name, outcome="error" if "error" in payload else "ok")
+        return payload
+    
+    if not CIRCUIT_BREAKER_ENABLED:
+        started = time.monotonic()
+        try:
+            return finished(await asyncio.wait_for(attempt(), timeout=budget))
+        except asyncio.TimeoutError:
+            return late()
+    
+    breaker = breakers.get(service_name)
+    key = (location_key(params["location"]), params["emergency_type"])
+    if not breaker.allow():
+        mcp_fetches.inc(source=service_name, outcome="fallback")
+        return breaker.fallback(key)
+    
+    started = time.monotonic()
+    try:
+        payload = await asyncio.wait_for(hedged_call(attempt, breaker.hedge_delay(), breaker), timeout=budget)
+    except asyncio.TimeoutError:
+        breaker.record_failure()
+        return late()
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    
+    if "error" in payload:
+        breaker.record_failure()
+    else:
+        breaker.record_success(key, payload, time.monotonic() - started)
+    return finished(payload)
+
+
+async def resolve_location(location: str) -> str:
+    """
+    Canonical cache key for a location (see locations.py), asking the maps
+    service's gazetteer the first time a spelling is seen.
+    """
+    return await location_resolver.resolve(
+        location,
+        lambda text: query_mcp_service("maps", "/geocode", {"q": text, "limit": 1}, timeout=GEOCODE_TIMEOUT)
+    )
+
+
+async def gather_intelligence(location: str, emergency_type: str) -> Dict[str, Any]:
+    """
+    Query all MCP services concurrently and gather intelligence data.
+    
+    Cached payloads are used when fresh (or stale, with a background refresh);
+    only missing sources are queried. With a shared cache, a source another
+    worker has fetched (or is fetching) for this location is not re-queried. Every query runs under its own budget
+    and the whole fan-out under INTELLIGENCE_DEADLINE. Sources still pending
+    at the deadline are cancelled and returned as {"error": ..., "status": "late"}
+    so callers always get all five keys.
+    
+    Services are queried with the location's canonical gazetteer name and
+    everything is cached under its canonical key.
+    """
+    with tracer.span("gather_intelligence", location=location, emergency_type=emergency_type):
+        started = time.perf_counter()
+        await resolve_location(location)
+        params = {
+            "location": location_resolver.canonical_name(location),
+            "emergency_type": emergency_type
+        }
+        
+        async def fetch(name: str) -> dict:
+            if shared_cache is not None:
+                payload = await shared_cache.get_or_compute(
+                    "intel",
+                    f"{location_key(location)}|{emergency_type}|{name}",
+                    INTEL_CACHE_TTLS[name],
+                    lambda: query_source(name, params),
+                    cacheable=lambda payload: "error" not in payload and "circuit" not in payload
+                )
+            else:
+                payload = await query_source(name, params)
+            if INTEL_CACHE_ENABLED:
+                intel_cache.store(location, emergency_type, name, payload)
+            return payload
+        
+        intelligence_data = {}
+        tasks = {}
+        for name in MCP_ENDPOINTS:
+            if INTEL_CACHE_ENABLED:
+                cached, state = intel_cache.lookup(location, emergency_type, name)
+                if state == "stale":
+                    intel_cache.revalidate(location, emergency_type, name, lambda name=name: query_source(name, params))
+                if cached is not None:
+                    intelligence_data[name] = cached
+                    continue
+            tasks[name] = asyncio.create_task(fetch(name))
+        
+        if not tasks:
+            phase_seconds.observe(time.perf_counter() - started, phase="intelligence")
+            return intelligence_data
+        
+        done, pending = await asyncio.wait(tasks.values(), timeout=INTELLIGENCE_DEADLINE)
+        for task in pending:
+            task.cancel()
+        
+        for name, task in tasks.items():
+            if task in done:
+                intelligence_data[name] = task.result()
+            else:
+                intelligence_data[name] = {
+                    "error": f"No response within {INTELLIGENCE_DEADLINE}s deadline",
+                    "status": "late"
+                }
+        
+        phase_seconds.observe(time.perf_counter() - started, phase="intelligence")
+        return {name: intelligence_data[name] for name in MCP_ENDPOINTS}
+
+
+def summarize_intelligence(intelligence_data: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Report per-source status: "ok", "fallback" (last-known-good payload served
+    by an open circuit), "late" (missed its budget or the deadline) or
+    "missing" (service error, open circuit with no fallback, or not configured).
+    """
+    status = {}
+    for name, payload in intelligence_data.items():
+        if isinstance(payload, dict) and "circuit" in payload:
+            status[name] = "fallback"
+        elif not isinstance(payload, dict) or "error" not in payload:
+            status[name] = "ok"
+        elif payload.get("status") == "late":
+            status[name] = "late"
+        else:
+            status[name] = "missing"
+    return status
 
 
-def call_nvidia_llm(system_prompt: str, user_prompt: str, model: str = None) -> str:
+async def call_nvidia_llm(
+    system_prompt: str,
+    user_prompt: str,
+    model: str = None,
+    phase: str = "llm",
+    priority: Optional[int] = None
+) -> str:
     """
     Call NVIDIA NIM API for LLM inference.
     
@@ -107,126 +418,265 @@ def call_nvidia_llm(system_prompt: str, user_prompt: str, model: str = None) ->
         system_prompt: System instructions for the LLM
         user_prompt: User query and context
         model: Optional model override (defaults to env var or nemotron-4-340b)
+        phase: Label for the latency histogram (llm_stage1 / llm_stage2)
+        priority: Admission class for the model slot (see admission.priority_for)
     """
-    if not NVIDIA_API_KEY:
-        raise HTTPException(
-            status_code=500,
-            detail="NVIDIA_API_KEY not configured. Please set the environment variable."
-        )
-    
-    # Use provided model, or fall back to env var, or use default
-    llm_model = model or os.getenv("LLM_MODEL", "nvidia/nemotron-4-340b-instruct")
-    
+    token = llm_priority.set(priority) if priority is not None else None
     try:
-        response = httpx.post(
-            NVIDIA_API_URL,
-            headers={
-                "Authorization": f"Bearer {NVIDIA_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": llm_model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                "temperature": float(os.getenv("LLM_TEMPERATURE", "0.2")),
-                "max_tokens": int(os.getenv("LLM_MAX_TOKENS", "2000"))
-            },
-            timeout=30.0
-        )
-        response.raise_for_status()
-        
-        result = response.json()
-        return result["choices"][0]["message"]["content"]
-    
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(
-            status_code=e.response.status_code,
-            detail=f"NVIDIA API error: {e.response.text}"
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"LLM call failed: {str(e)}"
-        )
+        with phase_seconds.time(phase=phase), tracer.span(phase, model=model or "default"):
+            return await llm_client.complete(system_prompt, user_prompt, model=model)
+    finally:
+        if token is not None:
+            llm_priority.reset(token)
+
+
+async def cancel_on_disconnect(raw_request: Request, coro) -> Any:
+    """
+    Await a pipeline coroutine, cancelling it if the HTTP client goes away so
+    abandoned requests stop holding LLM slots.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await raw_request.is_disconnected():
+                task.cancel()
+                print("🔌 Client disconnected, cancelled analysis")
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
 
 
 def parse_llm_response(response_text: str) -> dict:
     """
     Parse LLM response and extract JSON.
+    
+    Tolerates code fences, surrounding prose and output truncated at
+    LLM_MAX_TOKENS (see json_extract.extract_json).
     """
     try:
-        response_text = response_text.strip()
-        
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        
-        response_text = response_text.strip()
-        
-        return json.loads(response_text)
+        with phase_seconds.time(phase="json_parse"):
+            return extract_json(response_text)
     
-    except json.JSONDecodeError as e:
+    except JSONExtractError as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to parse LLM response as JSON: {str(e)}\nResponse: {response_text[:500]}"
+            detail=f"Failed to parse LLM response as JSON: {str(e)}\nResponse: {response_text.strip()[:500]}"
         )
 
 
 @app.post("/analyze")
-async def analyze_situation(request: AnalysisRequest) -> dict:
+async def analyze_situation(request: AnalysisRequest, raw_request: Request) -> dict:
     """
     Two-stage analysis:
     1. Fast decision model determines if it's an emergency
     2. Large response model generates detailed guidance
+    
+    Send `X-Cache-Bypass: true` to skip cached LLM completions.
+    """
+    fresh = wants_fresh_generation(raw_request)
+    bypass_llm_cache.set(fresh)
+    with tracer.span(
+        "analyze",
+        traceparent=raw_request.headers.get(TRACEPARENT_HEADER),
+        location=request.location,
+        emergency_type=request.emergency_type
+    ):
+        if not COALESCE_REQUESTS:
+            return await cancel_on_disconnect(raw_request, run_analysis(request))
+        
+        # Identical concurrent reports (however they spell the location) share one
+        # pipeline run; each caller's own request and trace go into its result
+        await resolve_location(request.location)
+        key = analysis_key(request, fresh)
+        result, intelligence_data, decision = await cancel_on_disconnect(
+            raw_request, analysis_flights.do(key, lambda: run_pipeline(request))
+        )
+        return finalize_result(dict(result), request, intelligence_data, decision)
+
+
+def analysis_key(request: AnalysisRequest, fresh: bool = False) -> tuple:
+    """
+    Coalescing key: normalized scenario, canonical location key and emergency type.
+    """
+    return (
+        " ".join(request.scenario.lower().split()),
+        location_key(request.location),
+        request.emergency_type,
+        fresh
+    )
+
+
+def wants_fresh_generation(raw_request: Request) -> bool:
+    """
+    True when the caller asked to bypass the LLM response cache.
+    """
+    if raw_request.headers.get(BYPASS_HEADER, "").lower() in ("1", "true", "yes"):
+        return True
+    return "no-cache" in raw_request.headers.get("Cache-Control", "").lower()
+
+
+async def run_analysis(request: AnalysisRequest, intelligence_data: Optional[Dict[str, Any]] = None) -> dict:
+    """
+    Run the full two-stage pipeline for one request, optionally on
+    intelligence the caller already gathered.
+    """
+    result, intelligence_data, decision = await run_pipeline(request, intelligence_data)
+    return finalize_result(result, request, intelligence_data, decision)
+
+
+async def run_pipeline(request: AnalysisRequest, intelligence_data: Optional[Dict[str, Any]] = None) -> tuple:
+    """
+    Intelligence, triage and stage 2 for one request, before any
+    request-specific metadata is added: (parsed result, intelligence, decision).
     """
     
     # Gather intelligence from all MCP agents
-    intelligence_data = await gather_intelligence(
-        request.location,
-        request.emergency_type
-    )
+    if intelligence_data is None:
+        intelligence_data = await gather_intelligence(
+            request.location,
+            request.emergency_type
+        )
+    
+    # Optionally start stage 2 on the predicted branch while triage runs
+    predicted, speculative_task = start_speculative_stage2(request, intelligence_data)
+    
+    try:
+        decision = await run_triage(request, intelligence_data)
+        is_emergency = decision.get("is_emergency", False)
+        emergency_type = decision.get("emergency_type", "none")
+        
+        # ============================================
+        # STAGE 2: DETAILED RESPONSE (Large Model)
+        # ============================================
+        if speculative_task is not None and branch_matches(predicted, is_emergency, emergency_type):
+            speculation_stats.hits += 1
+            print("⚡ Stage 2: Speculative generation matched triage, reusing it...")
+            llm_response_text = await speculative_task
+        else:
+            if speculative_task is not None:
+                speculation_stats.misses += 1
+                speculative_task.cancel()
+            
+            print(f"🤖 Stage 2: Generating detailed {'evacuation plan' if is_emergency else 'assessment'}...")
+            
+            system_prompt, user_prompt = build_response_prompt(request, intelligence_data, is_emergency, emergency_type)
+            
+            # Use a large, powerful model for detailed response
+            # Default to a strong instruct model for detailed responses
+            llm_response_text = await call_nvidia_llm(
+                system_prompt,
+                user_prompt,
+                model=RESPONSE_MODEL,
+                phase="llm_stage2",
+                priority=priority_for(request.emergency_type, is_emergency)
+            )
+    finally:
+        if speculative_task is not None and not speculative_task.done():
+            speculative_task.cancel()
+    
+    result = parse_llm_response(llm_response_text)
+    
+    return result, intelligence_data, decision
+
+
+def start_speculative_stage2(request: AnalysisRequest, intelligence_data: Dict[str, Any]) -> tuple:
+    """
+    When SPECULATIVE_STAGE2 is on and the outcome is predictable, launch the
+    stage-2 generation for the predicted branch. Returns (predicted, task),
+    both None when not speculating.
+    """
+    if not SPECULATIVE_STAGE2:
+        return None, None
+    
+    predicted = predict_branch(request.emergency_type, intelligence_data)
+    if predicted is None:
+        speculation_stats.skipped += 1
+        return None, None
+    
+    system_prompt, user_prompt = build_response_prompt(request, intelligence_data, *predicted)
+    task = asyncio.create_task(call_nvidia_llm(
+        system_prompt,
+        user_prompt,
+        model=RESPONSE_MODEL,
+        phase="llm_stage2",
+        priority=priority_for(request.emergency_type, predicted[0])
+    ))
+    # A discarded speculation may fail after we stop caring; don't log it as unretrieved
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return predicted, task
+
+
+async def run_triage(request: AnalysisRequest, intelligence_data: Dict[str, Any]) -> dict:
+    """
+    Stage 1: decide whether this is a real emergency.
+    
+    Clear-cut emergencies are settled by the rules engine without a model
+    call; everything else goes to the small decision model.
+    """
+    if RULES_TRIAGE_ENABLED:
+        decision = rule_based_decision(request.scenario, request.emergency_type, intelligence_data)
+        if decision is not None:
+            triage_stats.rule_decisions += 1
+            print(f"⚡ Stage 1: Rule-based decision: {'EMERGENCY' if decision['is_emergency'] else 'FALSE ALARM'} (confidence: {decision['confidence']})")
+            return decision
+        triage_stats.llm_fallbacks += 1
     
-    # ============================================
-    # STAGE 1: QUICK DECISION (Small/Fast Model)
-    # ============================================
     print("🧠 Stage 1: Quick triage decision...")
     
-    decision_prompt = build_decision_prompt(
-        request.scenario,
-        request.location,
-        intelligence_data["weather"],
-        intelligence_data["maps"],
-        intelligence_data["news"],
-        intelligence_data["social"],
-        intelligence_data["resource"]
-    )
+    with phase_seconds.time(phase="prompt_build_stage1"):
+        decision_prompt = build_decision_prompt(
+            request.scenario,
+            request.location,
+            intelligence_data["weather"],
+            intelligence_data["maps"],
+            intelligence_data["news"],
+            intelligence_data["social"],
+            intelligence_data["resource"],
+            emergency_type=request.emergency_type
+        )
     
     # Use a small, fast model for quick decision
     # Prefer a small INSTRUCT chat model for fast triage
-    decision_model = os.getenv("DECISION_MODEL", "nvidia/nemotron-mini-4b-instruct")
-    decision_response = call_nvidia_llm(
+    decision_response = await call_nvidia_llm(
         DECISION_SYSTEM_PROMPT, 
         decision_prompt,
-        model=decision_model
+        model=DECISION_MODEL,
+        phase="llm_stage1",
+        priority=priority_for(request.emergency_type)
     )
     
     decision = parse_llm_response(decision_response)
-    is_emergency = decision.get("is_emergency", False)
-    emergency_type = decision.get("emergency_type", "none")
-    
-    print(f"✅ Decision: {'EMERGENCY' if is_emergency else 'FALSE ALARM'} (confidence: {decision.get('confidence', 0)})")
     
-    # ============================================
-    # STAGE 2: DETAILED RESPONSE (Large Model)
-    # ============================================
-    print(f"🤖 Stage 2: Generating detailed {'evacuation plan' if is_emergency else 'assessment'}...")
+    print(f"✅ Decision: {'EMERGENCY' if decision.get('is_emergency', False) else 'FALSE ALARM'} (confidence: {decision.get('confidence', 0)})")
     
+    return decision
+
+
+def build_response_prompt(
+    request: AnalysisRequest,
+    intelligence_data: Dict[str, Any],
+    is_emergency: bool,
+    emergency_type: str
+) -> tuple:
+    """
+    Stage 2 prompts: (system_prompt, user_prompt) for the chosen branch.
+    """
+    with phase_seconds.time(phase="prompt_build_stage2"):
+        return _build_response_prompt(request, intelligence_data, is_emergency, emergency_type)
+
+
+def _build_response_prompt(
+    request: AnalysisRequest,
+    intelligence_data: Dict[str, Any],
+    is_emergency: bool,
+    emergency_type: str
+) -> tuple:
     system_prompt = get_system_prompt(is_emergency)
+    guidance = retrieve_guidance(request.scenario, intelligence_data, emergency_type if is_emergency else request.emergency_type)
     
     if is_emergency:
         user_prompt = build_emergency_prompt(
@@ -237,7 +687,8 @@ async def analyze_situation(request: AnalysisRequest) -> dict:
             intelligence_data["maps"],
             intelligence_data["news"],
             intelligence_data["social"],
-            intelligence_data["resource"]
+            intelligence_data["resource"],
+            guidance=guidance
         )
     else:
         user_prompt = build_false_alarm_prompt(
@@ -247,36 +698,211 @@ async def analyze_situation(request: AnalysisRequest) -> dict:
             intelligence_data["maps"],
             intelligence_data["news"],
             intelligence_data["social"],
-            intelligence_data["resource"]
+            intelligence_data["resource"],
+            emergency_type=request.emergency_type,
+            guidance=guidance
         )
     
-    # Use a large, powerful model for detailed response
-    # Default to a strong instruct model for detailed responses
-    response_model = os.getenv("RESPONSE_MODEL", "nvidia/nemotron-4-340b-instruct")
-    llm_response_text = call_nvidia_llm(system_prompt, user_prompt, model=response_model)
-    
-    result = parse_llm_response(llm_response_text)
-    
-    # Merge decision metadata with response
+    return system_prompt, user_prompt
+
+
+def finalize_result(
+    result: dict,
+    request: AnalysisRequest,
+    intelligence_data: Dict[str, Any],
+    decision: dict
+) -> dict:
+    """
+    Merge stage-1 metadata, procedures and request metadata into the plan.
+    """
     result["decision_metadata"] = {
         "stage1_decision": decision,
-        "stage1_model": decision_model,
-        "stage2_model": response_model
+        "stage1_model": "rules" if decision.get("source") == "rules" else DECISION_MODEL,
+        "stage2_model": RESPONSE_MODEL
     }
     
-    procedures = get_procedures(emergency_type)
+    procedures = get_procedures(decision.get("emergency_type", "none"))
     result["emergency_procedures"] = procedures
     
     result["metadata"] = {
         "scenario": request.scenario,
         "location": request.location,
         "emergency_type": request.emergency_type,
-        "intelligence_sources": list(intelligence_data.keys())
+        "intelligence_sources": list(intelligence_data.keys()),
+        "intelligence_status": summarize_intelligence(intelligence_data)
     }
+    current_span = tracer.current()
+    if current_span is not None:
+        result["metadata"]["trace_id"] = current_span.trace.trace_id
     
     return result
 
 
+@app.post("/analyze/stream")
+async def analyze_situation_stream(request: AnalysisRequest, raw_request: Request) -> StreamingResponse:
+    """
+    Server-Sent Events variant of /analyze.
+    
+    Events, in order:
+    - intelligence: MCP snapshot as soon as the fan-out resolves
+    - decision: stage-1 triage result
+    - token: stage-2 text deltas as NIM generates them
+    - field / item: each top-level field of the plan, and each element of a
+      top-level array (e.g. every evacuation step), as soon as it closes
+    - result: the merged final document (same shape as /analyze)
+    - error: emitted instead of the remaining events if a stage fails
+    """
+    return StreamingResponse(
+        stream_analysis(request, fresh=wants_fresh_generation(raw_request), traceparent=raw_request.headers.get(TRACEPARENT_HEADER)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_analysis(request: AnalysisRequest, fresh: bool = False, traceparent: Optional[str] = None):
+    """
+    Run the pipeline, yielding SSE frames as each stage completes.
+    """
+    bypass_llm_cache.set(fresh)
+    with tracer.span(
+        "analyze_stream",
+        traceparent=traceparent,
+        location=request.location,
+        emergency_type=request.emergency_type
+    ):
+        try:
+            intelligence_data = await gather_intelligence(
+                request.location,
+                request.emergency_type
+            )
+            yield sse_event("intelligence", {
+                "intelligence_data": intelligence_data,
+                "intelligence_status": summarize_intelligence(intelligence_data)
+            })
+            
+            decision = await run_triage(request, intelligence_data)
+            yield sse_event("decision", decision)
+            
+            is_emergency = decision.get("is_emergency", False)
+            emergency_type = decision.get("emergency_type", "none")
+            print(f"🤖 Stage 2 (streaming): Generating detailed {'evacuation plan' if is_emergency else 'assessment'}...")
+            
+            system_prompt, user_prompt = build_response_prompt(request, intelligence_data, is_emergency, emergency_type)
+            
+            llm_priority.set(priority_for(request.emergency_type, is_emergency))
+            chunks = []
+            parser = StreamingJSONParser()
+            stage2_started = time.perf_counter()
+            with tracer.span("llm_stage2", model=RESPONSE_MODEL, streaming=True):
+                async for delta in llm_client.stream(system_prompt, user_prompt, model=RESPONSE_MODEL):
+                    chunks.append(delta)
+                    yield sse_event("token", {"text": delta})
+                    for completed in parser.feed(delta):
+                        if completed[0] == "field":
+                            yield sse_event("field", {"key": completed[1], "value": completed[2]})
+                        else:
+                            yield sse_event("item", {"key": completed[1], "index": completed[2], "value": completed[3]})
+            
+            phase_seconds.observe(time.perf_counter() - stage2_started, phase="llm_stage2")
+            
+            result = parse_llm_response("".join(chunks))
+            yield sse_event("result", finalize_result(result, request, intelligence_data, decision))
+        
+        except HTTPException as e:
+            yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+
+
+@app.post("/analyze/batch")
+async def analyze_batch(requests: List[AnalysisRequest], raw_request: Request) -> StreamingResponse:
+    """
+    Analyze a list of reports in one call.
+    
+    Intelligence is gathered once per distinct (location, emergency_type),
+    at most BATCH_CONCURRENCY items run their LLM stages at a time, and
+    results stream back as NDJSON lines in completion order:
+    {"index": 3, "status": "ok", "result": {...}} or
+    {"index": 5, "status": "error", "error": {"status_code": ..., "detail": ...}}
+    """
+    if len(requests) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(requests)} items exceeds BATCH_MAX_ITEMS={BATCH_MAX_ITEMS}"
+        )
+    
+    return StreamingResponse(
+        stream_batch(requests, fresh=wants_fresh_generation(raw_request), traceparent=raw_request.headers.get(TRACEPARENT_HEADER)),
+        media_type="application/x-ndjson"
+    )
+
+
+async def stream_batch(requests: List[AnalysisRequest], fresh: bool = False, traceparent: Optional[str] = None):
+    """
+    Run every batch item and yield one NDJSON line per item as it finishes.
+    """
+    bypass_llm_cache.set(fresh)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    intelligence_tasks: Dict[tuple, asyncio.Task] = {}
+    
+    with tracer.span("analyze_batch", traceparent=traceparent, items=len(requests)):
+        # Resolve each distinct spelling once so items naming the same place share intelligence
+        await asyncio.gather(*(resolve_location(location) for location in {r.location for r in requests}))
+        for request in requests:
+            key = (location_key(request.location), request.emergency_type)
+            if key not in intelligence_tasks:
+                intelligence_tasks[key] = asyncio.create_task(
+                    gather_intelligence(request.location, request.emergency_type)
+                )
+        print(f"📦 Batch: {len(requests)} items, {len(intelligence_tasks)} distinct intelligence queries")
+        
+        async def run_item(index: int, request: AnalysisRequest) -> dict:
+            with tracer.span("batch_item", index=index):
+                try:
+                    key = (location_key(request.location), request.emergency_type)
+                    intelligence_data = await intelligence_tasks[key]
+                    async with semaphore:
+                        result = await run_analysis(request, intelligence_data)
+                    return {"index": index, "status": "ok", "result": result}
+                except HTTPException as e:
+                    return {"index": index, "status": "error", "error": {"status_code": e.status_code, "detail": e.detail}}
+                except Exception as e:
+                    return {"index": index, "status": "error", "error": {"status_code": 500, "detail": str(e)}}
+        
+        tasks = [asyncio.create_task(run_item(index, request)) for index, request in enumerate(requests)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            for task in tasks + list(intelligence_tasks.values()):
+                if not task.done():
+                    task.cancel()
+
+
+@app.get("/debug/traces")
+def list_traces(slowest: Optional[int] = None, limit: int = 20) -> dict:
+    """
+    Recently finished traces, newest first, or the `slowest` N by duration.
+    """
+    if slowest is not None:
+        return {"order": "slowest", "traces": tracer.slowest(slowest)}
+    return {"order": "recent", "traces": tracer.recent(limit)}
+
+
+@app.get("/debug/traces/{trace_id}")
+def trace_waterfall(trace_id: str) -> dict:
+    """
+    One trace as a waterfall: spans by start time with offset, duration,
+    nesting depth and a text bar scaled to the root span.
+    """
+    trace = tracer.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Trace {trace_id} not in the buffer")
+    return trace.waterfall()
+
+
 @app.post("/test")
 async def test_without_llm(request: AnalysisRequest) -> dict:
     """
@@ -292,10 +918,15 @@ async def test_without_llm(request: AnalysisRequest) -> dict:
         "location": request.location,
         "emergency_type": request.emergency_type,
         "intelligence_data": intelligence_data,
+        "intelligence_status": summarize_intelligence(intelligence_data),
         "note": "This is test mode - no LLM call made"
     }
 
 
+# Known paths for the HTTP metrics label; anything else is reported as "other"
+ROUTE_PATHS = {route.path for route in app.routes}
+
+
 if __name__ == "__main__":
     port = int(os.getenv("ORCHESTRATOR_PORT", "8000"))
     uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,191 @@
+"""
+Compact, token-budgeted rendering of MCP intelligence for prompts.
+
+Each source is rendered as minified JSON (or a flat key=value digest) with its
+fields ordered by importance for the emergency type. When the rendered
+sources exceed the model's token budget the renderer first strips noisy
+nested detail (post engagement, shelter amenities, timestamps), then trims
+long lists, and finally drops whole fields from the least important end.
+Fields are never cut mid-value.
+"""
+
+import json
+import os
+import re
+from typing import Dict, Any, List, Tuple
+
+# Token budgets for the complete user prompt, per stage
+DECISION_PROMPT_TOKENS = int(os.getenv("DECISION_PROMPT_TOKENS", "700"))
+RESPONSE_PROMPT_TOKENS = int(os.getenv("RESPONSE_PROMPT_TOKENS", "3500"))
+
+# "json" (minified) or "digest" (key=value; key=value)
+PROMPT_FORMAT = os.getenv("PROMPT_FORMAT", "json")
+
+# Field order per source; "default" applies to emergency types without an entry.
+# Fields not listed keep their original order after the listed ones.
+FIELD_PRIORITY: Dict[str, Dict[str, List[str]]] = {
+    "weather": {
+        "default": ["warnings", "conditions", "forecast", "wind", "visibility", "air_quality", "temperature"],
+        "fire": ["red_flag_warning", "warnings", "fire_weather_index", "wind", "humidity", "conditions",
+                 "forecast", "air_quality", "visibility", "temperature"],
+        "hurricane": ["warnings", "hurricane_category", "wind", "storm_surge", "rainfall", "forecast",
+                      "conditions", "visibility"],
+        "flood": ["warnings", "flood_stage", "river_level", "rainfall", "forecast", "conditions", "visibility"]
+    },
+    "maps": {
+        "default": ["current_location", "fire_location", "storm_center", "water_levels", "safe_zones",
+                    "evacuation_routes", "blocked_roads", "hazards", "flood_zones", "flooded_areas",
+                    "status", "conditions"]
+    },
+    "news": {
+        "default": ["breaking_news", "incident_type", "status", "official_statements", "timeline",
+                    "reports", "affected_area", "casualties"]
+    },
+    "social": {
+        "default": ["total_posts", "sentiment", "eyewitness_reports", "misinformation_risk",
+                    "public_response", "trending_keywords", "posts", "geographic_concentration"]
+    },
+    "resource": {
+        "default": ["emergency_services", "shelters", "evacuation_support", "emergency_contacts",
+                    "medical_facilities", "supplies", "facilities", "status"]
+    }
+}
+
+# Fields that never help the models decide or plan
+DROP_FIELDS = {"location", "analysis_period", "landmarks", "nearby_landmarks", "circuit"}
+
+# Nested keys stripped once a prompt is over budget
+NOISY_KEYS = {"engagement", "amenities", "timestamp", "accessibility", "contact",
+              "user", "platform", "hours", "services"}
+
+LIST_LIMIT = 3
+
+# Lists that are only meaningful whole (a route with its middle cut out is wrong)
+KEEP_LISTS = {"waypoints", "warnings"}
+
+# A word of n characters matches ceil(n / 4) times; subn() counts without keeping them
+_TOKEN_RE = re.compile(r"\w{1,4}|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap BPE-style estimate: one token per punctuation mark and roughly one
+    per four characters of each word. Close enough to budget prompts without
+    shipping a tokenizer.
+    """
+    return _TOKEN_RE.subn("", text)[1]
+
+
+def _strip_noise(value: Any, list_limit: int, key: str = "") -> Any:
+    if isinstance(value, dict):
+        return {k: _strip_noise(v, list_limit, k) for k, v in value.items() if k not in NOISY_KEYS}
+    if isinstance(value, list):
+        items = value if key in KEEP_LISTS else value[:list_limit]
+        return [_strip_noise(item, list_limit) for item in items]
+    return value
+
+
+def _flatten(value: Any, prefix: str = "") -> List[Tuple[str, Any]]:
+    if isinstance(value, dict):
+        items = []
+        for key, child in value.items():
+            items.extend(_flatten(child, f"{prefix}.{key}" if prefix else key))
+        return items
+    if isinstance(value, list) and any(isinstance(item, (dict, list)) for item in value):
+        items = []
+        for index, child in enumerate(value):
+            items.extend(_flatten(child, f"{prefix}[{index}]"))
+        return items
+    if isinstance(value, list):
+        return [(prefix, ", ".join(str(item) for item in value))]
+    return [(prefix, value)]
+
+
+def render_payload(payload: Dict[str, Any], fmt: str = PROMPT_FORMAT) -> str:
+    """Render one source payload compactly."""
+    if "error" in payload:
+        return f"unavailable ({payload.get('status', 'error')})"
+    if fmt == "digest":
+        return "; ".join(f"{key}={value}" for key, value in _flatten(payload))
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def render_field(field: str, value: Any, fmt: str = PROMPT_FORMAT) -> str:
+    """Render one top-level field exactly as it appears inside render_payload."""
+    if fmt == "digest":
+        return "; ".join(f"{key}={item}" for key, item in _flatten(value, field))
+    dumps = json.dumps
+    return (dumps(field, ensure_ascii=False) + ":"
+            + dumps(value, separators=(",", ":"), ensure_ascii=False, default=str))
+
+
+def rank_fields(source: str, emergency_type: str, payload: Dict[str, Any]) -> List[str]:
+    """Payload keys ordered from most to least important."""
+    priorities = FIELD_PRIORITY.get(source, {})
+    order = priorities.get(emergency_type, priorities.get("default", []))
+    listed = [field for field in order if field in payload]
+    rest = [field for field in payload if field not in listed and field not in DROP_FIELDS]
+    return listed + rest
+
+
+def render_sources(
+    sources: Dict[str, Dict[str, Any]],
+    emergency_type: str,
+    budget: int,
+    fmt: str = PROMPT_FORMAT
+) -> Dict[str, str]:
+    """
+    Render every source so that together they fit in `budget` tokens.
+    """
+    ranked = {
+        name: {field: payload[field] for field in rank_fields(name, emergency_type, payload)}
+        if isinstance(payload, dict) and "error" not in payload else payload
+        for name, payload in sources.items()
+    }
+
+    def render_all(payloads: Dict[str, Any]) -> Dict[str, str]:
+        return {
+            name: render_payload(payload, fmt) if isinstance(payload, dict) else str(payload)
+            for name, payload in payloads.items()
+        }
+
+    def total(rendered: Dict[str, str]) -> int:
+        return sum(estimate_tokens(text) for text in rendered.values())
+
+    rendered = render_all(ranked)
+    if total(rendered) <= budget:
+        return rendered
+
+    # Pass 1: strip nested noise and long lists
+    compacted = {
+        name: _strip_noise(payload, LIST_LIMIT) if isinstance(payload, dict) and "error" not in payload else payload
+        for name, payload in ranked.items()
+    }
+    rendered = render_all(compacted)
+    used = total(rendered)
+    if used <= budget:
+        return rendered
+
+    # Pass 2: drop fields, least important first, always keeping each source's top field.
+    # A dropped field is rendered once to measure it: its separator costs one
+    # token (punctuation never merges with its neighbours), so dropping it
+    # saves exactly its own tokens plus one and the source is re-rendered once.
+    candidates = []
+    for name, payload in compacted.items():
+        if isinstance(payload, dict) and "error" not in payload:
+            for rank, field in enumerate(list(payload)[1:], start=1):
+                candidates.append((rank, name, field))
+    candidates.sort(key=lambda item: -item[0])
+
+    trimmed = set()
+    for rank, name, field in candidates:
+        if used <= budget:
+            break
+        text = render_field(field, compacted[name].pop(field), fmt)
+        used -= estimate_tokens(text) + 1 if text else 0
+        trimmed.add(name)
+
+    for name in trimmed:
+        rendered[name] = render_payload(compacted[name], fmt)
+
+    return rendered
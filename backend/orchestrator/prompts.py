@@ -2,6 +2,49 @@
 LLM prompt templates for different scenarios.
 """
 
+from prompt_format import (
+    render_sources,
+    estimate_tokens,
+    DECISION_PROMPT_TOKENS,
+    RESPONSE_PROMPT_TOKENS
+)
+
+
+def procedures_block(guidance: str) -> str:
+    """Retrieved procedure sections as a prompt block, or nothing."""
+    if not guidance:
+        return ""
+    return f"=== RELEVANT EMERGENCY PROCEDURES ===\n{guidance}\n\n"
+
+
+def fit_intelligence(
+    template: str,
+    budget: int,
+    emergency_type: str,
+    weather_data: dict,
+    maps_data: dict,
+    news_data: dict,
+    social_data: dict,
+    resource_data: dict
+) -> dict:
+    """
+    Render the five sources compactly within what is left of the token budget
+    once the fixed template text is accounted for.
+    """
+    remaining = max(budget - estimate_tokens(template), 0)
+    return render_sources(
+        {
+            "weather": weather_data,
+            "maps": maps_data,
+            "news": news_data,
+            "social": social_data,
+            "resource": resource_data
+        },
+        emergency_type,
+        remaining
+    )
+
+
 # ============================================
 # STAGE 1: DECISION MODEL (Small, Fast)
 # ============================================
@@ -34,22 +77,36 @@ def build_decision_prompt(
     maps_data: dict,
     news_data: dict,
     social_data: dict,
-    resource_data: dict
+    resource_data: dict,
+    emergency_type: str = "none"
 ) -> str:
     """Quick triage prompt for Stage 1 decision model."""
-    return f"""QUICK TRIAGE ASSESSMENT
+    def render(weather="", maps="", news="", social="", resource=""):
+        return f"""QUICK TRIAGE ASSESSMENT
 
 Scenario: {scenario}
 Location: {location}
 
 INTELLIGENCE DATA:
-Weather: {str(weather_data)[:200]}...
-Maps: {str(maps_data)[:200]}...
-News: {str(news_data)[:200]}...
-Social: {str(social_data)[:200]}...
-Resources: {str(resource_data)[:200]}...
+Weather: {weather}
+Maps: {maps}
+News: {news}
+Social: {social}
+Resources: {resource}
 
 Is this a real emergency requiring evacuation? Decide NOW."""
+    
+    sources = fit_intelligence(
+        render(),
+        DECISION_PROMPT_TOKENS,
+        emergency_type,
+        weather_data,
+        maps_data,
+        news_data,
+        social_data,
+        resource_data
+    )
+    return render(**sources)
 
 
 # ============================================
@@ -151,12 +208,18 @@ def build_false_alarm_prompt(
     maps_data: dict,
     news_data: dict,
     social_data: dict,
-    resource_data: dict
+    resource_data: dict,
+    emergency_type: str = "none",
+    guidance: str = ""
 ) -> str:
     """
     Constructs the full prompt for false alarm analysis.
+    
+    `guidance` is retrieved procedure text (knowledge.retrieve_guidance);
+    it is placed before the task and counts against the token budget.
     """
-    prompt = f"""EMERGENCY ANALYSIS REQUEST
+    def render(weather="", maps="", news="", social="", resource=""):
+        return f"""EMERGENCY ANALYSIS REQUEST
 
 Scenario: {scenario}
 Location: {location}
@@ -164,21 +227,21 @@ Location: {location}
 DATA FROM INTELLIGENCE SOURCES:
 
 === WEATHER CONDITIONS ===
-{str(weather_data)}
+{weather}
 
 === GEOGRAPHIC & NAVIGATION DATA ===
-{str(maps_data)}
+{maps}
 
 === NEWS & OFFICIAL REPORTS ===
-{str(news_data)}
+{news}
 
 === SOCIAL MEDIA ANALYSIS ===
-{str(social_data)}
+{social}
 
 === EMERGENCY RESOURCES ===
-{str(resource_data)}
+{resource}
 
-TASK:
+{procedures_block(guidance)}TASK:
 Analyze all the above data to determine if this is a false alarm. Consider:
 1. Are weather conditions normal or threatening?
 2. Are there any official emergency reports?
@@ -190,6 +253,18 @@ If the evidence suggests this is a false alarm (e.g., routine fire drill, schedu
 
 Generate a complete JSON response following the required format."""
     
+    sources = fit_intelligence(
+        render(),
+        RESPONSE_PROMPT_TOKENS,
+        emergency_type,
+        weather_data,
+        maps_data,
+        news_data,
+        social_data,
+        resource_data
+    )
+    prompt = render(**sources)
+    
     return prompt
 
 
@@ -201,12 +276,17 @@ def build_emergency_prompt(
     maps_data: dict,
     news_data: dict,
     social_data: dict,
-    resource_data: dict
+    resource_data: dict,
+    guidance: str = ""
 ) -> str:
     """
     Constructs the full prompt for emergency evacuation planning.
+    
+    `guidance` is retrieved procedure text (knowledge.retrieve_guidance);
+    it is placed before the task and counts against the token budget.
     """
-    prompt = f"""ACTIVE EMERGENCY SITUATION
+    def render(weather="", maps="", news="", social="", resource=""):
+        return f"""ACTIVE EMERGENCY SITUATION
 
 Emergency Type: {emergency_type.upper()}
 Location: {location}
@@ -215,21 +295,21 @@ Scenario: {scenario}
 REAL-TIME INTELLIGENCE DATA:
 
 === WEATHER CONDITIONS ===
-{str(weather_data)}
+{weather}
 
 === GEOGRAPHIC DATA & EVACUATION ROUTES ===
-{str(maps_data)}
+{maps}
 
 === OFFICIAL EMERGENCY REPORTS ===
-{str(news_data)}
+{news}
 
 === SOCIAL MEDIA - LIVE UPDATES ===
-{str(social_data)}
+{social}
 
 === EMERGENCY RESOURCES AVAILABLE ===
-{str(resource_data)}
+{resource}
 
-EVACUATION PLANNING TASK:
+{procedures_block(guidance)}EVACUATION PLANNING TASK:
 
 Based on the above data, you must create a detailed 5-step evacuation plan.
 
@@ -252,6 +332,18 @@ Consider the emergency type ({emergency_type}) when writing warnings and instruc
 
 Generate the complete JSON evacuation plan now."""
     
+    sources = fit_intelligence(
+        render(),
+        RESPONSE_PROMPT_TOKENS,
+        emergency_type,
+        weather_data,
+        maps_data,
+        news_data,
+        social_data,
+        resource_data
+    )
+    prompt = render(**sources)
+    
     return prompt
 
 
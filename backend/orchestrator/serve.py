@@ -0,0 +1,45 @@
+"""
+Run the orchestrator as several uvicorn worker processes sharing one cache.
+
+    python serve.py --workers 4
+    python serve.py --workers 4 --cache /var/lib/crisisvision/cache.db
+
+SHARED_CACHE_URL is set before the workers start (unless it already is), so
+every worker opens the same SQLite shared cache: LLM completions and MCP
+payloads fetched by one worker are hits for all of them, and identical
+concurrent generations run once per host instead of once per worker.
+"""
+
+import argparse
+import os
+import tempfile
+import uvicorn
+
+DEFAULT_CACHE_PATH = os.path.join(tempfile.gettempdir(), "crisisvision-shared-cache.db")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Multi-worker CrisisVision orchestrator")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("ORCHESTRATOR_WORKERS", str(os.cpu_count() or 1))))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("ORCHESTRATOR_PORT", "8000")))
+    parser.add_argument("--cache", help=f"SQLite shared cache file (default: $SHARED_CACHE_URL or {DEFAULT_CACHE_PATH})")
+    args = parser.parse_args()
+
+    if args.cache:
+        os.environ["SHARED_CACHE_URL"] = f"sqlite:///{os.path.abspath(args.cache)}"
+    else:
+        os.environ.setdefault("SHARED_CACHE_URL", f"sqlite:///{DEFAULT_CACHE_PATH}")
+
+    print(f"🚀 Starting {args.workers} orchestrator workers on port {args.port} (shared cache: {os.environ['SHARED_CACHE_URL']})")
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        app_dir=os.path.dirname(os.path.abspath(__file__))
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+Cache shared by every orchestrator worker process on a host.
+
+In-process caches and single-flight tables only help the worker that owns
+them, so with N uvicorn workers the hit rate falls roughly N-fold and the
+same NIM generation can run N times at once. `SharedCache` adds a store all
+workers see, with TTL expiry and an atomic get-or-compute: the first worker
+to miss takes a lease on the key and computes; workers arriving meanwhile
+wait for its value instead of computing their own. A lease that outlives
+SHARED_CACHE_LEASE_SECONDS (crashed or hung worker) is taken over.
+
+The backend is chosen by SHARED_CACHE_URL; `sqlite:///path/to/cache.db`
+uses SQLite in WAL mode (concurrent readers, one writer, no daemon). A
+networked store implements the same abstract primitives (get, set, claim,
+peek, fulfil, abandon, prune) and inherits get_or_compute; one missing a
+primitive fails when it is constructed.
+
+Values are JSON-serializable. They are stored as compact JSON, zlib
+compressed above SHARED_CACHE_COMPRESS_BYTES.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+from singleflight import SingleFlight
+
+# e.g. sqlite:////tmp/crisisvision-cache.db; empty disables the shared cache
+SHARED_CACHE_URL = os.getenv("SHARED_CACHE_URL", "")
+
+# How long a worker may hold a key while computing before others take over
+SHARED_CACHE_LEASE_SECONDS = float(os.getenv("SHARED_CACHE_LEASE_SECONDS", "60"))
+
+# Polling interval bounds while another worker computes a key
+SHARED_CACHE_POLL_MIN = 0.02
+SHARED_CACHE_POLL_MAX = 0.25
+
+SHARED_CACHE_COMPRESS_BYTES = int(os.getenv("SHARED_CACHE_COMPRESS_BYTES", "1024"))
+
+# Expired rows are deleted after this many writes (and on startup)
+SHARED_CACHE_PRUNE_EVERY = int(os.getenv("SHARED_CACHE_PRUNE_EVERY", "500"))
+
+# claim() outcomes
+HIT = "hit"
+LEAD = "lead"
+WAIT = "wait"
+
+
+def encode_value(value: Any) -> bytes:
+    """One format byte ("j" plain JSON, "z" zlib-compressed JSON) plus the body."""
+    raw = json.dumps(value, separators=(",", ":")).encode("utf-8")
+    if len(raw) > SHARED_CACHE_COMPRESS_BYTES:
+        return b"z" + zlib.compress(raw, 1)
+    return b"j" + raw
+
+
+def decode_value(blob: bytes) -> Any:
+    body = blob[1:]
+    if blob[:1] == b"z":
+        body = zlib.decompress(body)
+    return json.loads(body)
+
+
+class SharedCache(ABC):
+    """
+    Backend-independent part of the shared cache: the get-or-compute
+    protocol on top of seven storage primitives.
+    """
+
+    def __init__(self, lease_seconds: float):
+        self.lease_seconds = lease_seconds
+        # Callers in this worker share one claim/wait per key
+        self._local = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.computed = 0
+        self.waited = 0
+        self.takeovers = 0
+
+    @abstractmethod
+    async def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Live value or None."""
+
+    @abstractmethod
+    async def set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        """Store a value for ttl seconds."""
+
+    @abstractmethod
+    async def claim(self, namespace: str, key: str, owner: str) -> Tuple[str, Optional[Any]]:
+        """
+        Atomically: (HIT, value) if a live value exists, else (LEAD, None)
+        after taking the key's lease, or (WAIT, None) if another owner holds
+        a live lease.
+        """
+
+    @abstractmethod
+    async def peek(self, namespace: str, key: str) -> Tuple[Optional[Any], bool]:
+        """(live value or None, whether a live lease is held on the key)."""
+
+    @abstractmethod
+    async def fulfil(self, namespace: str, key: str, owner: str, value: Any, ttl: float) -> None:
+        """Store the value and drop the owner's lease in one step."""
+
+    @abstractmethod
+    async def abandon(self, namespace: str, key: str, owner: str) -> None:
+        """Drop the owner's lease without storing anything."""
+
+    @abstractmethod
+    def prune(self) -> int:
+        """Delete expired values and leases; returns how many values were removed."""
+
+    async def get_or_compute(
+        self,
+        namespace: str,
+        key: str,
+        ttl: float,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """
+        Return the cached value for (namespace, key), or compute it exactly
+        once across all workers. Results for which `cacheable` returns False
+        (errors, fallbacks) are returned to their caller but not stored, and
+        waiting workers then compute their own.
+        """
+        return await self._local.do(
+            (namespace, key),
+            lambda: self._get_or_compute(namespace, key, ttl, compute, cacheable)
+        )
+
+    async def _get_or_compute(
+        self,
+        namespace: str,
+        key: str,
+        ttl: float,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]]
+    ) -> Any:
+        owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        delay = SHARED_CACHE_POLL_MIN
+        waited = False
+        while True:
+            state, value = await self.claim(namespace, key, owner)
+            if state == HIT:
+                if waited:
+                    self.waited += 1
+                else:
+                    self.hits += 1
+                return value
+
+            if state == LEAD:
+                self.misses += 1
+                self.computed += 1
+                try:
+                    value = await compute()
+                except BaseException:
+                    await asyncio.shield(self.abandon(namespace, key, owner))
+                    raise
+                if cacheable is None or cacheable(value):
+                    await self.fulfil(namespace, key, owner, value, ttl)
+                else:
+                    await self.abandon(namespace, key, owner)
+                return value
+
+            # Another worker is computing: poll until its value lands or its lease goes away
+            waited = True
+            deadline = time.monotonic() + self.lease_seconds
+            while True:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, SHARED_CACHE_POLL_MAX)
+                value, leased = await self.peek(namespace, key)
+                if value is not None:
+                    self.waited += 1
+                    return value
+                if not leased or time.monotonic() > deadline:
+                    # Leader failed, declined to store, or hung: try to lead
+                    if leased:
+                        self.takeovers += 1
+                    break
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.waited
+        return {
+            "enabled": True,
+            "hits": self.hits,
+            "misses": self.misses,
+            "computed": self.computed,
+            "waited_for_other_worker": self.waited,
+            "lease_takeovers": self.takeovers,
+            "coalesced_in_worker": self._local.followers,
+            "hit_ratio": round((self.hits + self.waited) / lookups, 3) if lookups else 0.0
+        }
+
+
+class SQLiteSharedCache(SharedCache):
+    """
+    SharedCache on one SQLite database in WAL mode. Each thread gets its own
+    connection; blocking calls run in the default executor.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS entries ("
+        " namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, expires_at REAL NOT NULL,"
+        " PRIMARY KEY (namespace, key)) WITHOUT ROWID",
+        "CREATE INDEX IF NOT EXISTS entries_expiry ON entries (expires_at)",
+        "CREATE TABLE IF NOT EXISTS leases ("
+        " namespace TEXT NOT NULL, key TEXT NOT NULL, owner TEXT NOT NULL, expires_at REAL NOT NULL,"
+        " PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+    )
+
+    def __init__(self, path: str, lease_seconds: float):
+        super().__init__(lease_seconds)
+        self.path = path
+        self._thread_local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        for statement in self.SCHEMA:
+            connection.execute(statement)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._thread_local, "connection", None)
+        if connection is None:
+            # Autocommit mode; multi-statement steps use explicit BEGIN IMMEDIATE
+            connection = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._thread_local.connection = connection
+        return connection
+
+    def _read(self, connection: sqlite3.Connection, namespace: str, key: str, now: float) -> Optional[Any]:
+        row = connection.execute(
+            "SELECT value FROM entries WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, key, now)
+        ).fetchone()
+        return decode_value(row[0]) if row else None
+
+    def _get(self, namespace: str, key: str) -> Optional[Any]:
+        return self._read(self._connection(), namespace, key, time.time())
+
+    def _set(self, namespace: str, key: str, blob: bytes, ttl: float) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, blob, time.time() + ttl)
+        )
+        self._count_write()
+
+    def _claim(self, namespace: str, key: str, owner: str) -> Tuple[str, Optional[Any]]:
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            value = self._read(connection, namespace, key, now)
+            if value is not None:
+                return HIT, value
+            row = connection.execute(
+                "SELECT owner FROM leases WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, now)
+            ).fetchone()
+            if row is not None and row[0] != owner:
+                return WAIT, None
+            connection.execute(
+                "INSERT OR REPLACE INTO leases (namespace, key, owner, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, owner, now + self.lease_seconds)
+            )
+            return LEAD, None
+        finally:
+            connection.execute("COMMIT")
+
+    def _peek(self, namespace: str, key: str) -> Tuple[Optional[Any], bool]:
+        connection = self._connection()
+        now = time.time()
+        value = self._read(connection, namespace, key, now)
+        if value is not None:
+            return value, False
+        row = connection.execute(
+            "SELECT 1 FROM leases WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, key, now)
+        ).fetchone()
+        return None, row is not None
+
+    def _fulfil(self, namespace: str, key: str, owner: str, blob: bytes, ttl: float) -> None:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, blob, time.time() + ttl)
+            )
+            connection.execute(
+                "DELETE FROM leases WHERE namespace = ? AND key = ? AND owner = ?",
+                (namespace, key, owner)
+            )
+        finally:
+            connection.execute("COMMIT")
+        self._count_write()
+
+    def _abandon(self, namespace: str, key: str, owner: str) -> None:
+        self._connection().execute(
+            "DELETE FROM leases WHERE namespace = ? AND key = ? AND owner = ?",
+            (namespace, key, owner)
+        )
+
+    def _count_write(self) -> None:
+        self._writes += 1
+        if self._writes % SHARED_CACHE_PRUNE_EVERY == 0:
+            self.prune()
+
+    async def get(self, namespace: str, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self._get, namespace, key)
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        await asyncio.to_thread(self._set, namespace, key, encode_value(value), ttl)
+
+    async def claim(self, namespace: str, key: str, owner: str) -> Tuple[str, Optional[Any]]:
+        return await asyncio.to_thread(self._claim, namespace, key, owner)
+
+    async def peek(self, namespace: str, key: str) -> Tuple[Optional[Any], bool]:
+        return await asyncio.to_thread(self._peek, namespace, key)
+
+    async def fulfil(self, namespace: str, key: str, owner: str, value: Any, ttl: float) -> None:
+        await asyncio.to_thread(self._fulfil, namespace, key, owner, encode_value(value), ttl)
+
+    async def abandon(self, namespace: str, key: str, owner: str) -> None:
+        await asyncio.to_thread(self._abandon, namespace, key, owner)
+
+    def prune(self) -> int:
+        """Delete expired entries and leases; returns how many entries were removed."""
+        connection = self._connection()
+        now = time.time()
+        removed = connection.execute("DELETE FROM entries WHERE expires_at <= ?", (now,)).rowcount
+        connection.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["backend"] = "sqlite"
+        stats["path"] = self.path
+        return stats
+
+
+def open_shared_cache(url: str) -> Optional[SharedCache]:
+    """Backend for SHARED_CACHE_URL, or None when it is empty."""
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteSharedCache(url[len("sqlite:///"):], SHARED_CACHE_LEASE_SECONDS)
+    raise ValueError(f"Unsupported SHARED_CACHE_URL scheme: {url}")
+
+
+shared_cache = open_shared_cache(SHARED_CACHE_URL)
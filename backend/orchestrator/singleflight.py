@@ -0,0 +1,84 @@
+"""
+Single-flight coalescing of identical concurrent work.
+
+When an alarm goes off many people submit the same report within a second.
+The first caller for a key (the leader) starts the pipeline; everyone else
+arriving while it runs (followers) awaits the same task and receives the same
+result. A waiter that goes away only drops its reference: the shared task is
+cancelled once nobody is waiting for it any more.
+"""
+
+import asyncio
+from typing import Dict, Any, Callable, Awaitable, Hashable
+
+# Buckets for the followers-per-leader distribution
+FOLLOWER_BUCKETS = [(0, "0"), (1, "1"), (5, "2-5"), (20, "6-20"), (100, "21-100")]
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls that share a key.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self._followers: Dict[Hashable, int] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.max_followers = 0
+        self.distribution: Dict[str, int] = {}
+
+    def _record_flight(self, followers: int) -> None:
+        self.max_followers = max(self.max_followers, followers)
+        label = next((name for bound, name in FOLLOWER_BUCKETS if followers <= bound), "100+")
+        self.distribution[label] = self.distribution.get(label, 0) + 1
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn() for the first caller of a key and share its outcome (result
+        or exception) with every caller that arrives before it finishes.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._tasks[key] = task
+            self._waiters[key] = 0
+            self._followers[key] = 0
+            self.leaders += 1
+
+            def finished(done: asyncio.Task, key=key) -> None:
+                if self._tasks.get(key) is done:
+                    del self._tasks[key]
+                    del self._waiters[key]
+                    self._record_flight(self._followers.pop(key))
+                if not done.cancelled():
+                    done.exception()
+
+            task.add_done_callback(finished)
+        else:
+            self._followers[key] += 1
+            self.followers += 1
+
+        self._waiters[key] += 1
+        try:
+            # shield: one waiter being cancelled must not cancel the shared run
+            return await asyncio.shield(task)
+        finally:
+            if self._tasks.get(key) is task:
+                self._waiters[key] -= 1
+                if self._waiters[key] == 0 and not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._tasks),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "avg_followers_per_leader": round(self.followers / self.leaders, 3) if self.leaders else 0.0,
+            "max_followers": self.max_followers,
+            "followers_per_leader": dict(self.distribution)
+        }
+
+
+analysis_flights = SingleFlight()
@@ -0,0 +1,67 @@
+"""
+Speculative stage-2 generation.
+
+The request's emergency_type hint plus the raw intelligence usually predict
+the triage outcome. When speculation is enabled the orchestrator starts the
+stage-2 generation for the predicted branch while stage 1 is still running,
+keeps it if triage agrees and cancels it otherwise.
+"""
+
+import os
+from typing import Dict, Any, Optional, Tuple
+
+SPECULATIVE_STAGE2 = os.getenv("SPECULATIVE_STAGE2", "false").lower() == "true"
+
+
+def predict_branch(emergency_type: str, intelligence_data: Dict[str, Any]) -> Optional[Tuple[bool, str]]:
+    """
+    Predict (is_emergency, emergency_type) from the request hint and the MCP
+    payloads, or None when the evidence is mixed and speculation would likely
+    be wasted.
+    """
+    weather = intelligence_data.get("weather", {})
+    news = intelligence_data.get("news", {})
+
+    official_warning = bool(weather.get("warnings")) or weather.get("red_flag_warning") is True
+    breaking_news = news.get("breaking_news") is True
+
+    if emergency_type != "none" and (official_warning or breaking_news):
+        return True, emergency_type
+    if emergency_type == "none" and not official_warning and not breaking_news:
+        return False, "none"
+    return None
+
+
+def branch_matches(predicted: Tuple[bool, str], is_emergency: bool, emergency_type: str) -> bool:
+    """
+    A speculative plan is reusable only if it was generated for the branch
+    triage chose; emergency plans are also type-specific.
+    """
+    predicted_emergency, predicted_type = predicted
+    if predicted_emergency != is_emergency:
+        return False
+    return not is_emergency or predicted_type == emergency_type
+
+
+class SpeculationStats:
+    """
+    Hit/miss counters for speculative stage-2 generations.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        attempts = self.hits + self.misses
+        return {
+            "enabled": SPECULATIVE_STAGE2,
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "hit_ratio": round(self.hits / attempts, 3) if attempts else 0.0
+        }
+
+
+speculation_stats = SpeculationStats()
@@ -0,0 +1,248 @@
+"""
+Lightweight per-request tracing.
+
+span() opens a timed span under whatever span is current in the calling
+context (contextvars, so tasks spawned inside a span inherit it as parent).
+A trace completes when its root span ends and is kept in a bounded ring
+buffer for GET /debug/traces. Trace context goes out to the MCP servers as a
+W3C `traceparent` header and is picked up from incoming requests, and each
+finished trace can optionally be appended to a local file as OTLP/JSON, so no
+collector is needed.
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Iterator
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+
+# Append finished traces as OTLP/JSON lines to this file (disabled when empty)
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", "")
+
+SERVICE_NAME = "crisisvision-orchestrator"
+TRACEPARENT_HEADER = "traceparent"
+
+WATERFALL_WIDTH = 40
+
+
+class Span:
+    """
+    One timed operation within a trace.
+    """
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = "ok"
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace.trace_id}-{self.span_id}-01"
+
+
+class _NoopSpan:
+    """Stand-in yielded when tracing is disabled."""
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+
+class Trace:
+    """
+    All spans sharing one trace ID, in the order they started.
+    """
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List[Span] = []
+        self.root: Optional[Span] = None
+
+    def summary(self) -> Dict[str, Any]:
+        root = self.root
+        return {
+            "trace_id": self.trace_id,
+            "name": root.name if root else None,
+            "start": root.start_ns / 1e9 if root else None,
+            "duration_ms": round(root.duration_ms, 2) if root else None,
+            "status": root.status if root else None,
+            "spans": len(self.spans)
+        }
+
+    def waterfall(self) -> Dict[str, Any]:
+        """Spans ordered by start with offset, depth and a text bar relative to the root."""
+        origin = min(span.start_ns for span in self.spans)
+        total_ms = max(self.root.duration_ms if self.root else 0.0, 1e-3)
+        depths: Dict[str, int] = {}
+        rows = []
+        for span in sorted(self.spans, key=lambda s: s.start_ns):
+            depth = depths[span.parent_id] + 1 if span.parent_id in depths else 0
+            depths[span.span_id] = depth
+            offset_ms = (span.start_ns - origin) / 1e6
+            begin = min(WATERFALL_WIDTH - 1, int(offset_ms / total_ms * WATERFALL_WIDTH))
+            length = max(1, int(span.duration_ms / total_ms * WATERFALL_WIDTH))
+            rows.append({
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "name": span.name,
+                "depth": depth,
+                "offset_ms": round(offset_ms, 2),
+                "duration_ms": round(span.duration_ms, 2),
+                "status": span.status,
+                "attributes": span.attributes,
+                "bar": (" " * begin + "█" * length)[:WATERFALL_WIDTH].ljust(WATERFALL_WIDTH)
+            })
+        return {**self.summary(), "waterfall": rows}
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """OTLP/JSON ExportTraceServiceRequest for this trace."""
+        def attribute(key: str, value: Any) -> Dict[str, Any]:
+            if isinstance(value, bool):
+                return {"key": key, "value": {"boolValue": value}}
+            if isinstance(value, int):
+                return {"key": key, "value": {"intValue": str(value)}}
+            if isinstance(value, float):
+                return {"key": key, "value": {"doubleValue": value}}
+            return {"key": key, "value": {"stringValue": str(value)}}
+
+        spans = [
+            {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns if span.end_ns is not None else span.start_ns),
+                "attributes": [attribute(key, value) for key, value in span.attributes.items()],
+                "status": {"code": 2 if span.status != "ok" else 1}
+            }
+            for span in self.spans
+        ]
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": "crisisvision.tracing"}, "spans": spans}]
+            }]
+        }
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple]:
+    """(trace_id, parent_span_id) from a W3C traceparent header, or None."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16)
+        int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2]
+
+
+class Tracer:
+    """
+    Creates spans and keeps the most recent finished traces.
+    """
+
+    def __init__(self, buffer_size: int, export_file: str):
+        self.finished: deque = deque(maxlen=buffer_size)
+        self.export_file = export_file
+        self._current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+    def current(self) -> Optional[Span]:
+        return self._current.get()
+
+    def traceparent(self) -> Optional[str]:
+        """Header value carrying the current span to a downstream service."""
+        current = self._current.get()
+        return current.traceparent() if current is not None else None
+
+    @contextmanager
+    def span(self, name: str, traceparent: Optional[str] = None, **attributes: Any) -> Iterator[Any]:
+        """
+        Time the enclosed block as a span. With no current span this starts a
+        new trace, continuing the caller's when `traceparent` is given.
+        """
+        if not TRACING_ENABLED:
+            yield _NoopSpan()
+            return
+
+        parent = self._current.get()
+        if parent is not None:
+            trace, parent_id = parent.trace, parent.span_id
+        else:
+            remote = parse_traceparent(traceparent)
+            trace = Trace(remote[0] if remote else f"{random.getrandbits(128):032x}")
+            parent_id = remote[1] if remote else None
+
+        span = Span(trace, name, parent_id, attributes)
+        if parent is None:
+            trace.root = span
+        trace.spans.append(span)
+
+        self._current.set(span)
+        try:
+            yield span
+        except (asyncio.CancelledError, GeneratorExit):
+            span.status = "cancelled"
+            raise
+        except BaseException as e:
+            span.status = "error"
+            span.attributes["error"] = str(getattr(e, "detail", e))[:200]
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            # Restore explicitly: generators may resume this block from another context
+            self._current.set(parent)
+            if span is trace.root:
+                self._finish(trace)
+
+    def _finish(self, trace: Trace) -> None:
+        self.finished.append(trace)
+        if self.export_file:
+            line = json.dumps(trace.to_otlp(), separators=(",", ":"))
+            try:
+                asyncio.get_running_loop().run_in_executor(None, self._export, line)
+            except RuntimeError:
+                self._export(line)
+
+    def _export(self, line: str) -> None:
+        try:
+            with open(self.export_file, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            print(f"⚠️  Trace export failed: {e}")
+
+    def recent(self, limit: int) -> List[Dict[str, Any]]:
+        return [trace.summary() for trace in list(self.finished)[::-1][:limit]]
+
+    def slowest(self, limit: int) -> List[Dict[str, Any]]:
+        traces = sorted(self.finished, key=lambda trace: trace.root.duration_ms, reverse=True)
+        return [trace.summary() for trace in traces[:limit]]
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        return next((trace for trace in self.finished if trace.trace_id == trace_id), None)
+
+
+tracer = Tracer(TRACE_BUFFER_SIZE, TRACE_EXPORT_FILE)
@@ -0,0 +1,233 @@
+"""
+Deterministic rule-based triage.
+
+Many triage questions are already answered explicitly by the MCP payloads: a
+red flag warning from the weather service, an evacuation order in the news
+timeline, fire units actively responding. Each rule in TRIAGE_RULES inspects
+the intelligence and, when it fires, adds a weighted vote for "emergency" or
+"false alarm". If the emergency side clears the threshold the decision is
+returned in the same shape as the stage-1 LLM output and the model call is
+skipped; otherwise the case goes to the LLM.
+
+The payloads can confirm an emergency but cannot rule one out: quiet news
+and weather only mean nobody else has reported it yet, and the rules never
+read the report itself. False-alarm votes therefore only discount the
+emergency score. Deciding a false alarm without the model is opt-in
+(RULES_TRIAGE_FALSE_ALARMS), and even then any danger word in the scenario
+("flames", "trapped", ...) sends the case to the LLM.
+
+Rules are plain (name, side, weight, predicate) tuples so deployments can
+extend the table with register_rule() without touching the engine.
+"""
+
+import os
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+RULES_TRIAGE_ENABLED = os.getenv("RULES_TRIAGE_ENABLED", "true").lower() == "true"
+
+# Minimum confidence for the rules to short-circuit the stage-1 LLM
+RULES_TRIAGE_THRESHOLD = float(os.getenv("RULES_TRIAGE_THRESHOLD", "0.85"))
+
+# Let the rules also settle false alarms (never when the scenario mentions danger)
+RULES_TRIAGE_FALSE_ALARMS = os.getenv("RULES_TRIAGE_FALSE_ALARMS", "false").lower() == "true"
+
+EMERGENCY = "emergency"
+FALSE_ALARM = "false_alarm"
+
+Rule = Tuple[str, str, float, Callable[[Dict[str, Any]], bool]]
+
+# Words in a report that keep the rules from calling it a false alarm
+DANGER_WORDS = (
+    "fire", "flame", "smoke", "burn", "explo", "trapped", "injur", "bleed", "unconscious",
+    "collaps", "flood", "gas leak", "shoot", "gun", "weapon", "help", "emergency", "evacuat",
+    "scream", "can't breathe", "cannot breathe"
+)
+
+
+def _text(items: Any) -> str:
+    """Flatten a list of strings or dicts into one lowercase string."""
+    if not isinstance(items, list):
+        return ""
+    parts = []
+    for item in items:
+        if isinstance(item, dict):
+            parts.extend(str(value) for value in item.values())
+        else:
+            parts.append(str(item))
+    return " ".join(parts).lower()
+
+
+def red_flag_warning(intel: Dict[str, Any]) -> bool:
+    return intel.get("weather", {}).get("red_flag_warning") is True
+
+
+def weather_warnings(intel: Dict[str, Any]) -> bool:
+    return bool(intel.get("weather", {}).get("warnings"))
+
+
+def evacuation_ordered(intel: Dict[str, Any]) -> bool:
+    news = intel.get("news", {})
+    return "evacuation" in _text(news.get("timeline")) or "evacuat" in _text(news.get("reports"))
+
+
+def verified_breaking_news(intel: Dict[str, Any]) -> bool:
+    news = intel.get("news", {})
+    reports = news.get("reports") or []
+    return news.get("breaking_news") is True and any(
+        isinstance(report, dict) and report.get("verified") for report in reports
+    )
+
+
+def responders_active(intel: Dict[str, Any]) -> bool:
+    services = intel.get("resource", {}).get("emergency_services", {})
+    statuses = " ".join(
+        str(service.get("status", "")) for service in services.values() if isinstance(service, dict)
+    ).lower()
+    return any(marker in statuses for marker in ("actively responding", "active operations", "full activation"))
+
+
+def shelters_occupied(intel: Dict[str, Any]) -> bool:
+    shelters = intel.get("resource", {}).get("shelters") or []
+    return any(isinstance(shelter, dict) and shelter.get("current_occupancy", 0) > 0 for shelter in shelters)
+
+
+def urgent_social_volume(intel: Dict[str, Any]) -> bool:
+    social = intel.get("social", {})
+    sentiment = social.get("sentiment", {})
+    return social.get("total_posts", 0) >= 500 and sentiment.get("urgent", 0) >= 50
+
+
+def no_breaking_news(intel: Dict[str, Any]) -> bool:
+    news = intel.get("news", {})
+    return "error" not in news and news.get("breaking_news") is False
+
+
+def no_weather_warnings(intel: Dict[str, Any]) -> bool:
+    weather = intel.get("weather", {})
+    return "error" not in weather and not weather.get("warnings") and not weather.get("red_flag_warning")
+
+
+def drill_or_test_reported(intel: Dict[str, Any]) -> bool:
+    text = _text(intel.get("news", {}).get("reports")) + " " + _text(intel.get("social", {}).get("posts"))
+    return any(marker in text for marker in ("drill", "alarm test", "routine", "no emergency"))
+
+
+def no_eyewitnesses(intel: Dict[str, Any]) -> bool:
+    eyewitness = intel.get("social", {}).get("eyewitness_reports", {})
+    return eyewitness.get("reporting_emergency") == 0
+
+
+TRIAGE_RULES: List[Rule] = [
+    ("red_flag_warning", EMERGENCY, 0.30, red_flag_warning),
+    ("weather_warnings", EMERGENCY, 0.20, weather_warnings),
+    ("evacuation_ordered", EMERGENCY, 0.35, evacuation_ordered),
+    ("verified_breaking_news", EMERGENCY, 0.25, verified_breaking_news),
+    ("responders_active", EMERGENCY, 0.30, responders_active),
+    ("shelters_occupied", EMERGENCY, 0.15, shelters_occupied),
+    ("urgent_social_volume", EMERGENCY, 0.15, urgent_social_volume),
+    ("no_breaking_news", FALSE_ALARM, 0.30, no_breaking_news),
+    ("no_weather_warnings", FALSE_ALARM, 0.20, no_weather_warnings),
+    ("drill_or_test_reported", FALSE_ALARM, 0.35, drill_or_test_reported),
+    ("no_eyewitnesses", FALSE_ALARM, 0.20, no_eyewitnesses),
+]
+
+
+class TriageStats:
+    """
+    How often the rules settled triage versus deferring to the LLM.
+    """
+
+    def __init__(self):
+        self.rule_decisions = 0
+        self.llm_fallbacks = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        total = self.rule_decisions + self.llm_fallbacks
+        return {
+            "enabled": RULES_TRIAGE_ENABLED,
+            "threshold": RULES_TRIAGE_THRESHOLD,
+            "false_alarms": RULES_TRIAGE_FALSE_ALARMS,
+            "rule_decisions": self.rule_decisions,
+            "llm_fallbacks": self.llm_fallbacks,
+            "rule_ratio": round(self.rule_decisions / total, 3) if total else 0.0
+        }
+
+
+triage_stats = TriageStats()
+
+
+def register_rule(name: str, side: str, weight: float, predicate: Callable[[Dict[str, Any]], bool]) -> None:
+    """Add a rule to the table (side is EMERGENCY or FALSE_ALARM)."""
+    if side not in (EMERGENCY, FALSE_ALARM):
+        raise ValueError(f"Unknown rule side: {side}")
+    TRIAGE_RULES.append((name, side, weight, predicate))
+
+
+def score_intelligence(intelligence_data: Dict[str, Any], rules: Optional[List[Rule]] = None) -> Dict[str, Any]:
+    """
+    Evaluate every rule and return the fired rule names and per-side scores
+    (capped at 1.0). A rule that raises on malformed data simply does not fire.
+    """
+    scores = {EMERGENCY: 0.0, FALSE_ALARM: 0.0}
+    fired = {EMERGENCY: [], FALSE_ALARM: []}
+    for name, side, weight, predicate in (rules if rules is not None else TRIAGE_RULES):
+        try:
+            matched = predicate(intelligence_data)
+        except (AttributeError, TypeError, ValueError):
+            matched = False
+        if matched:
+            scores[side] += weight
+            fired[side].append(name)
+    return {
+        "scores": {side: min(score, 1.0) for side, score in scores.items()},
+        "fired": fired
+    }
+
+
+def mentions_danger(scenario: str) -> bool:
+    """True when the report itself describes danger (fire, injuries, people trapped...)."""
+    text = scenario.lower()
+    return any(word in text for word in DANGER_WORDS)
+
+
+def rule_based_decision(
+    scenario: str,
+    emergency_type: str,
+    intelligence_data: Dict[str, Any],
+    threshold: float = RULES_TRIAGE_THRESHOLD,
+    allow_false_alarm: bool = RULES_TRIAGE_FALSE_ALARMS
+) -> Optional[Dict[str, Any]]:
+    """
+    Return a stage-1 style decision when the evidence is clear-cut, else None.
+
+    Confidence is the winning side's score discounted by the opposing score,
+    so mixed evidence never clears the threshold. A false alarm is only
+    returned with allow_false_alarm and a scenario free of danger words.
+    """
+    result = score_intelligence(intelligence_data)
+    emergency_score = result["scores"][EMERGENCY]
+    false_alarm_score = result["scores"][FALSE_ALARM]
+
+    if emergency_score > false_alarm_score:
+        side, confidence = EMERGENCY, emergency_score - false_alarm_score
+    else:
+        side, confidence = FALSE_ALARM, false_alarm_score - emergency_score
+
+    if confidence < threshold:
+        return None
+
+    is_emergency = side == EMERGENCY
+    # The emergency type is only trusted when the caller supplied one
+    if is_emergency and emergency_type == "none":
+        return None
+    # Missing evidence is not proof of safety; the report itself decides
+    if not is_emergency and (not allow_false_alarm or mentions_danger(scenario)):
+        return None
+
+    return {
+        "is_emergency": is_emergency,
+        "emergency_type": emergency_type if is_emergency else "none",
+        "confidence": round(confidence, 2),
+        "reasoning": f"Rule-based triage: {', '.join(result['fired'][side])}",
+        "source": "rules"
+    }
@@ -0,0 +1,46 @@
+"""
+Shared fixtures for the orchestrator unit tests.
+
+    pytest tests
+"""
+
+import importlib.util
+import os
+import sys
+from typing import Any, Dict
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, os.path.join(BACKEND_DIR, "orchestrator"))
+
+
+def load_mcp_server(name: str) -> Any:
+    """Import mcp_servers/<name>/server.py under a unique module name."""
+    directory = os.path.join(BACKEND_DIR, "mcp_servers", name)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    path = os.path.join(directory, "server.py")
+    spec = importlib.util.spec_from_file_location(f"{name}_server", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def intelligence() -> Dict[str, Dict[str, Any]]:
+    """What the MCP servers report for the library, per emergency type."""
+    handlers = {
+        "weather": load_mcp_server("weather").get_weather,
+        "maps": load_mcp_server("maps").get_location_info,
+        "news": load_mcp_server("news").get_news,
+        "social": load_mcp_server("social").get_social_data,
+        "resource": load_mcp_server("resource").get_resources
+    }
+    return {
+        emergency_type: {
+            name: handler(location="Santa Clara University Library", emergency_type=emergency_type)
+            for name, handler in handlers.items()
+        }
+        for emergency_type in ("fire", "hurricane", "flood", "none")
+    }
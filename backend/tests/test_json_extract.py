@@ -0,0 +1,59 @@
+"""
+Recovering JSON objects from fenced, chatty and truncated LLM output.
+"""
+
+import pytest
+from json_extract import JSONExtractError, StreamingJSONParser, extract_json
+
+
+def test_object_in_prose_and_fences():
+    text = 'Here is the decision:\n```json\n{"is_emergency": true, "confidence": 0.9}\n```\nStay safe.'
+    assert extract_json(text) == {"is_emergency": True, "confidence": 0.9}
+
+
+def test_truncated_inside_first_value():
+    assert extract_json('{"is_emergency": tru') == {"is_emergency": True}
+    assert extract_json('{"is_emergency": fal') == {"is_emergency": False}
+
+
+def test_truncated_value_cut_back_to_last_complete_field():
+    assert extract_json('{"is_emergency": true, "confidence": 0.') == {"is_emergency": True}
+    assert extract_json('{"is_emergency": true, "emergency_ty') == {"is_emergency": True}
+
+
+def test_truncated_inside_nested_containers():
+    text = '{"severity": "high", "steps": [{"order": 1}, {"order": 2, "note": "Exit via the st'
+    assert extract_json(text) == {
+        "severity": "high",
+        "steps": [{"order": 1}, {"order": 2, "note": "Exit via the st"}]
+    }
+
+
+def test_truncated_inside_first_key_returns_empty_object():
+    assert extract_json('{"is_emerg') == {}
+
+
+def test_unbalanced_brace_in_prose_before_object():
+    text = 'Plan {draft, see below:\n{"is_emergency": false, "confidence": 0.4}'
+    assert extract_json(text) == {"is_emergency": False, "confidence": 0.4}
+
+
+def test_unbalanced_brace_before_truncated_object():
+    text = 'Replace {location} with the site. {"is_emergency": true, "severity": "hi'
+    assert extract_json(text) == {"is_emergency": True, "severity": "hi"}
+
+
+def test_no_object_raises():
+    with pytest.raises(JSONExtractError):
+        extract_json("I cannot help with that {request")
+
+
+def test_streaming_parser_reports_fields_and_items():
+    parser = StreamingJSONParser()
+    events = []
+    for chunk in ['{"severity": "hi', 'gh", "steps": [{"order": 1}', ', {"order": 2}], "done": tr', "ue}"]:
+        events.extend(parser.feed(chunk))
+    assert ("field", "severity", "high") in events
+    assert ("item", "steps", 0, {"order": 1}) in events
+    assert ("item", "steps", 1, {"order": 2}) in events
+    assert parser.result()["done"] is True
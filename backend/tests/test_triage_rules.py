@@ -0,0 +1,66 @@
+"""
+Rules-based triage: which rules fire, the confidence threshold, and when a
+false alarm may be decided without the model.
+"""
+
+from triage_rules import EMERGENCY, FALSE_ALARM, rule_based_decision, score_intelligence
+
+FIRE_SCENARIO = "I see flames coming out of the library windows and people are trapped inside"
+BENIGN_SCENARIO = "The library alarm went off during the scheduled afternoon drill"
+
+
+def test_rules_fire_on_emergency_intelligence(intelligence):
+    result = score_intelligence(intelligence["fire"])
+    assert "red_flag_warning" in result["fired"][EMERGENCY]
+    assert "evacuation_ordered" in result["fired"][EMERGENCY]
+    assert result["fired"][FALSE_ALARM] == []
+    assert result["scores"][EMERGENCY] == 1.0
+
+
+def test_rules_fire_on_quiet_intelligence(intelligence):
+    result = score_intelligence(intelligence["none"])
+    assert result["fired"][EMERGENCY] == []
+    assert "drill_or_test_reported" in result["fired"][FALSE_ALARM]
+
+
+def test_malformed_intelligence_fires_nothing():
+    result = score_intelligence({"weather": None, "news": "unavailable", "social": [], "resource": 3})
+    assert result["scores"] == {EMERGENCY: 0.0, FALSE_ALARM: 0.0}
+
+
+def test_clear_emergency_short_circuits(intelligence):
+    decision = rule_based_decision(FIRE_SCENARIO, "fire", intelligence["fire"], threshold=0.85)
+    assert decision["is_emergency"] is True
+    assert decision["emergency_type"] == "fire"
+    assert decision["confidence"] == 1.0
+    assert decision["source"] == "rules"
+
+
+def test_below_threshold_defers_to_model(intelligence):
+    # Flood evidence scores 0.9
+    assert rule_based_decision(FIRE_SCENARIO, "flood", intelligence["flood"], threshold=0.85) is not None
+    assert rule_based_decision(FIRE_SCENARIO, "flood", intelligence["flood"], threshold=0.95) is None
+
+
+def test_emergency_without_type_defers_to_model(intelligence):
+    assert rule_based_decision(FIRE_SCENARIO, "none", intelligence["fire"], threshold=0.85) is None
+
+
+def test_false_alarm_is_off_by_default(intelligence):
+    assert rule_based_decision(BENIGN_SCENARIO, "none", intelligence["none"], threshold=0.85) is None
+
+
+def test_false_alarm_when_enabled(intelligence):
+    decision = rule_based_decision(
+        BENIGN_SCENARIO, "none", intelligence["none"], threshold=0.85, allow_false_alarm=True
+    )
+    assert decision["is_emergency"] is False
+    assert decision["emergency_type"] == "none"
+
+
+def test_danger_in_scenario_vetoes_false_alarm(intelligence):
+    # Quiet feeds are not proof of safety when the caller reports flames
+    decision = rule_based_decision(
+        FIRE_SCENARIO, "none", intelligence["none"], threshold=0.85, allow_false_alarm=True
+    )
+    assert decision is None